@@ -12,6 +12,10 @@ extends statistcs for base approach testcase bci
 # Imports
 # ====================================================================
 import os
+import hashlib
+from collections import namedtuple
+
+import numpy as np
 
 # ====================================================================
 # Imports - Local
@@ -22,8 +26,21 @@ import stk.valf.signal_defs as sd
 from stk.valf import BaseComponentInterface as bci
 
 import fct.acc.common.acc_global_defs as acc_gd
-from fct.acc.common.observer_dispatcher import ObserverDispatcher
-from fct.acc.common.acc_meas_statistics_extractor import find_nearest
+# framework free computations, names also importable from here as before
+from fct.acc.acc_performance.approach_core import SPEED_THRESHOLD, TIMEGAP_THRESHOLD, DIST_EXT, DIST_THRESHOLD, \
+    NOT_CROSSED, TUNNEL_STATE_TUNNEL, TimegapThreshold, DistanceThreshold, ThresholdSet, DEFAULT_THRESHOLDS, \
+    CONDITION_NAMES, RLE_MIN_CYCLES, SweepResult, TimestampIndex, ApproachEventTable, threshold_grid, \
+    find_first_crossings, crossing_indexes, crossings_to_indexes, scene_begin_timestamps, calc_timegap, \
+    index_relative_to_object, check_test_criteria, event_crossing_indexes, analyze_approach_events, \
+    sweep_approach_thresholds
+from fct.acc.acc_performance.approach_result_cache import ApproachResultCache, DEFAULT_MAX_SIZE
+from fct.acc.acc_performance.approach_instrumentation import Instrumentation, NullInstrumentation
+from fct.acc.acc_performance.approach_rules import default_rule_engine
+from fct.acc.acc_performance.approach_stats import ApproachStatistics
+from fct.acc.acc_performance.approach_export import ApproachResultWriter
+from fct.acc.acc_performance.approach_object_cache import ObjectCache
+from fct.acc.acc_performance.approach_signal_store import SignalStore
+from fct.acc.acc_performance.approach_result import ApproachResult, ERROR_RESULT, attach_result
 
 # ====================================================================
 # Global Constant Declarations
@@ -31,10 +48,45 @@ from fct.acc.common.acc_meas_statistics_extractor import find_nearest
 GENERATOR_VERSION_STRING = "$Revision: 1.4 $"
 GENERATOR_MODULE_REPORT = os.path.basename("%s" % __file__)
 
-SPEED_THRESHOLD = 70.0  # [km/h]
-TIMEGAP_THRESHOLD = 4.0  # [s]
-DIST_EXT = 20.0  # [m]
-DIST_THRESHOLD = 90.0  # [m]
+# data port with the ApproachEventResult list of the current recording
+APPROACH_RESULTS_PORT_NAME = "ApproachAnalyzer441Results"
+# optional config ports: directory and size limit [byte] of the persistent result cache (no directory: no cache)
+RESULT_CACHE_DIR_PORT_NAME = "ApproachAnalyzer441ResultCacheDir"
+RESULT_CACHE_SIZE_PORT_NAME = "ApproachAnalyzer441ResultCacheSize"
+# optional config port: size limit [byte] of the per recording object cache (see approach_object_cache)
+OBJECT_CACHE_SIZE_PORT_NAME = "ApproachAnalyzer441ObjectCacheSize"
+# layout version of the cache entries (results and scene begins per event), part of the cache key
+RESULT_CACHE_FORMAT = 2
+# optional config port: enables timers/counters and diagnostic logging,
+# True: summary only logged in Terminate, file path: summary also written there as json
+INSTRUMENTATION_PORT_NAME = "ApproachAnalyzer441Instrumentation"
+# optional config port: list of ThresholdSet to sweep, results as SweepResult on THRESHOLD_SWEEP_RESULTS_PORT_NAME
+THRESHOLD_SWEEP_PORT_NAME = "ApproachAnalyzer441ThresholdSweep"
+THRESHOLD_SWEEP_RESULTS_PORT_NAME = "ApproachAnalyzer441ThresholdSweepResults"
+# optional config port: RecordingPrefetcher, LoadData publishes the prefetched ports of the current file on the bus
+PREFETCH_PORT_NAME = "ApproachAnalyzer441Prefetcher"
+# optional config port: enables the fleet statistics, True: only published on STATISTICS_RESULTS_PORT_NAME
+# in Terminate, file path: also written there as json (see approach_stats)
+STATISTICS_PORT_NAME = "ApproachAnalyzer441Statistics"
+STATISTICS_RESULTS_PORT_NAME = "ApproachAnalyzer441StatisticsResults"
+# optional config port on the global bus: SignalStore shared by the analyzer components of the run,
+# recording level ports (timestamps, TunnelDtct) are decoded once per bus and read as views of the store.
+# True: the first analyzer creates the store, publishes it on the port and closes it in Terminate,
+# a SignalStore set by other code is used as is and closed by its creator
+SIGNAL_STORE_PORT_NAME = "ApproachAnalyzer441SignalStore"
+# optional config port: False attaches the ApproachResult record instead of the legacy event attributes
+# (event_applicable, tunnel_state_of_scene, stat_approach_condition) for campaigns whose reports read the record,
+# default: legacy attributes only
+LEGACY_ATTRIBUTES_PORT_NAME = "ApproachAnalyzer441LegacyAttributes"
+# optional config port: base path of the columnar result export (see approach_export), one writer per export
+EXPORT_PORT_NAME = "ApproachAnalyzer441Export"
+
+# object signals the analysis depends on
+OBJ_SIGNALS_USED = ("Timestamp", sd.OBJ_DISTX, "DTR_ObjPreSelect", "DTR_Obj_ObstclDtct", "Observed_Class")
+
+# per event outcome, as written to the event attributes
+ApproachEventResult = namedtuple('ApproachEventResult', ['start_index', 'stop_index', 'event_applicable',
+                                                         'tunnel_state_of_scene', 'stat_approach_condition'])
 
 #############################################################################
 
@@ -42,6 +94,71 @@ DIST_THRESHOLD = 90.0  # [m]
 # =============================================================================
 # Class
 # =============================================================================
+class LazyPlotSignal(object):
+    """ plot signal entry: reference to the source signal plus gain and window
+
+    behaves like the list of gain scaled values it replaces, the values are only built on first read
+    (as python list, so report code gets the same types as before)
+    """
+    __slots__ = ('__source', '__gain', '__start', '__stop', '__values')
+
+    def __init__(self, source, gain, start, stop):
+        """ Class initialisation.
+        @Param source:   complete object signal (list or array)
+        @Param gain:   factor the values get scaled with
+        @Param start:   first index of the window
+        @Param stop:   index behind the window
+        """
+        self.__source = source
+        self.__gain = gain
+        self.__start = start
+        self.__stop = stop
+        self.__values = None
+
+    def materialize(self):
+        """ return the gain scaled window as list """
+        if self.__values is None:
+            values = self.__source[self.__start:self.__stop]
+            if self.__gain != 1:
+                values = self.__gain * np.asarray(values)
+            self.__values = values if isinstance(values, list) else np.asarray(values).tolist()
+        return self.__values
+
+    @property
+    def is_materialized(self):
+        return self.__values is not None
+
+    def __len__(self):
+        start, stop, _ = slice(self.__start, self.__stop).indices(len(self.__source))
+        return max(0, stop - start)
+
+    def __getitem__(self, idx):
+        return self.materialize()[idx]
+
+    def __iter__(self):
+        return iter(self.materialize())
+
+    def __eq__(self, other):
+        if isinstance(other, LazyPlotSignal):
+            other = other.materialize()
+        return self.materialize() == other
+
+    def __ne__(self, other):
+        return not self == other
+
+    __hash__ = None
+
+    def __array__(self, dtype=None, copy=None):
+        return np.asarray(self.materialize(), dtype=dtype)
+
+    def tolist(self):
+        return list(self.materialize())
+
+    def __reduce__(self):
+        # pickled plot data is the plain list of values (all pickle protocols, no reference to the source signal)
+        return list, (self.materialize(),)
+
+
 class ApproachAnalyzer441(bci):
     def __init__(self, data_manager, component_name, bus_name, version=GENERATOR_VERSION_STRING):
         """ Class initialisation.
@@ -54,6 +171,7 @@ class ApproachAnalyzer441(bci):
 
         self.__algo_version = None
         self.__timestamp = []
+        self.__timestamp_index = TimestampIndex([])
         self.__acc_event_list = []
 
         self.__DataBaseObjectsConnections = None
@@ -70,12 +188,68 @@ class ApproachAnalyzer441(bci):
         self.__OutputDir = None
         self.__lstDeveloperDetails = []
         self.observer_dispatcher = None
+        self.__result_cache = None
+        self.__instr = NullInstrumentation()
+        self.__instr_output = None
+        self.__sweep_grid = None
+        self.__prefetcher = None
+        self.__stats = None
+        self.__stats_output = None
+        self.__result_writer = None
+        self.__signal_store = None
+        self.__owns_signal_store = False
+        self.__legacy_attributes = True
+        # derived data of the event objects, shared by the events of one recording
+        self.__object_cache = ObjectCache()
+        # compiled A-E rules, testcase variants can set an engine of their own rule table
+        self.rule_engine = default_rule_engine()
 
     def Initialize(self):
         """ Initialize. Called once. """
         self._logger.debug()
-        project_name = self._data_manager.GetDataPort(acc_gd.PROJECT_PORT_NAME)
-        self.observer_dispatcher = ObserverDispatcher(project_name, self._logger)
+        instr_config = self._data_manager.GetDataPort(INSTRUMENTATION_PORT_NAME, self._bus_name)
+        if instr_config:
+            self.__instr = Instrumentation()
+            self.__instr_output = instr_config if isinstance(instr_config, basestring) else None
+
+        with self.__instr.timer("Initialize"):
+            # observer framework only imported once the component runs
+            from fct.acc.common.observer_dispatcher import ObserverDispatcher
+            project_name = self._data_manager.GetDataPort(acc_gd.PROJECT_PORT_NAME)
+            self.observer_dispatcher = ObserverDispatcher(project_name, self._logger)
+
+            self.__sweep_grid = self._data_manager.GetDataPort(THRESHOLD_SWEEP_PORT_NAME, self._bus_name)
+            self.__prefetcher = self._data_manager.GetDataPort(PREFETCH_PORT_NAME, self._bus_name)
+            stats_config = self._data_manager.GetDataPort(STATISTICS_PORT_NAME, self._bus_name)
+            if stats_config:
+                self.__stats = ApproachStatistics()
+                self.__stats_output = stats_config if isinstance(stats_config, basestring) else None
+
+            legacy_attributes = self._data_manager.GetDataPort(LEGACY_ATTRIBUTES_PORT_NAME, self._bus_name)
+            self.__legacy_attributes = legacy_attributes is None or bool(legacy_attributes)
+
+            signal_store = self._data_manager.GetDataPort(SIGNAL_STORE_PORT_NAME)
+            if signal_store is True:
+                signal_store = SignalStore()
+                self._data_manager.SetDataPort(SIGNAL_STORE_PORT_NAME, signal_store)
+                self.__owns_signal_store = True
+            if isinstance(signal_store, SignalStore):
+                self.__signal_store = signal_store
+
+            object_cache_size = self._data_manager.GetDataPort(OBJECT_CACHE_SIZE_PORT_NAME, self._bus_name)
+            if object_cache_size:
+                self.__object_cache = ObjectCache(object_cache_size)
+
+            export_path = self._data_manager.GetDataPort(EXPORT_PORT_NAME, self._bus_name)
+            if export_path:
+                self.__result_writer = ApproachResultWriter(export_path, (None,) + tuple(self.rule_engine.conditions))
+            if self.__prefetcher is not None:
+                self.__prefetcher.start()
+
+            cache_dir = self._data_manager.GetDataPort(RESULT_CACHE_DIR_PORT_NAME, self._bus_name)
+            if cache_dir:
+                cache_size = self._data_manager.GetDataPort(RESULT_CACHE_SIZE_PORT_NAME, self._bus_name)
+                self.__result_cache = ApproachResultCache(cache_dir, cache_size or DEFAULT_MAX_SIZE)
         return sd.RET_VAL_OK
 
     def PostInitialize(self):
@@ -86,31 +260,109 @@ class ApproachAnalyzer441(bci):
     def LoadData(self):
         """ LoadData. Called for each file. """
         self._logger.debug()
-        self.__timestamp = self._data_manager.GetDataPort(sd.TIMESTAMP_PORT_NAME, self._bus_name)
+        with self.__instr.timer("LoadData"):
+            if self.__prefetcher is not None:
+                with self.__instr.timer("LoadData.prefetch_wait"):
+                    ports = self.__prefetcher.load(self._data_manager.GetDataPort(sd.CURRENT_FILE_PORT_NAME))
+                for port_name, port_value in ports.items():
+                    self._data_manager.SetDataPort(port_name, port_value, self._bus_name)
+            self.__timestamp = self._get_signal_port(sd.TIMESTAMP_PORT_NAME)
+            self.__timestamp_index = TimestampIndex(self.__timestamp)
+            # objects of the previous recording are not referenced anymore
+            self.__object_cache.clear()
         return sd.RET_VAL_OK
 
     def ProcessData(self):
         """ ProcessData. Called for each file. """
         self._logger.debug()
+        with self.__instr.timer("ProcessData"):
+            try:
+                self._process_data()
+            finally:
+                self.__object_cache.clear()
+        return sd.RET_VAL_OK
+
+    def _process_data(self):
         current_rec_file = self._data_manager.GetDataPort(sd.CURRENT_FILE_PORT_NAME)
         if not self.observer_dispatcher.is_configured_to_run(self._component_name, current_rec_file):
-            return sd.RET_VAL_OK
-
-        self.__acc_event_list = self._data_manager.GetDataPort(sd.ACC_EVENTS_PORT_NAME, self._bus_name)
-        self._logger.info("number of ACC events: %d" % len(self.__acc_event_list))
+            return
+
+        instr = self.__instr
+        instr.count("recordings")
+        with instr.timer("ProcessData.fetch_events"):
+            self.__acc_event_list = self._data_manager.GetDataPort(sd.ACC_EVENTS_PORT_NAME, self._bus_name)
+        self._logger.info("number of ACC events: %d", len(self.__acc_event_list))
+        error_events = []
+        approach_events = []
         for ev in self.__acc_event_list:
             if ev.GetTestcaseErrorType() != acc_gd.TESTCASE_ERROR_TYPES.NONE:
-                ev.AddAttribute('event_applicable', False, '', 'boolean')
-                ev.AddAttribute('tunnel_state_of_scene', None, '', 'int')
-                ev.AddAttribute('stat_approach_condition', None, '', 'string')
+                attach_result(ev, ERROR_RESULT, self.__legacy_attributes)
+                error_events.append(ev)
                 continue
             if ev.GetType() == acc_gd.EVENT_TYPE_APPROACH_TESTCASE:
-                self.analyze_event(ev)
-                typename = acc_gd.EVENT_TYPE_STAT_APPROACH_TESTCASE
-                ev.SetType(typename)
-
+                approach_events.append(ev)
+        instr.count("error_events", len(error_events))
+
+        cache_key = cached_results = None
+        if self.__result_cache is not None:
+            with instr.timer("ProcessData.result_cache"):
+                cache_key = self.get_result_cache_key(self.__acc_event_list)
+                cached_results = self.__result_cache.get(cache_key)
+
+        if cached_results is None:
+            approach_results, scene_begin = self._analyze_events(approach_events)
+            event_results = dict((id(ev), (False, None, None)) for ev in error_events)
+            event_results.update(zip([id(ev) for ev in approach_events], approach_results))
+            scene_begin = dict(zip([id(ev) for ev in approach_events], scene_begin))
+            ordered_results = [event_results.get(id(ev)) for ev in self.__acc_event_list]
+            ordered_scene_begin = [scene_begin.get(id(ev)) for ev in self.__acc_event_list]
+            if cache_key is not None:
+                self.__result_cache.put(cache_key, (ordered_results, ordered_scene_begin))
+        else:
+            # same inputs analyzed before: only replay the results
+            instr.count("cached_events", len(approach_events))
+            ordered_results, ordered_scene_begin = cached_results
+            for ev, result in zip(self.__acc_event_list, ordered_results):
+                if result is not None and ev.GetTestcaseErrorType() == acc_gd.TESTCASE_ERROR_TYPES.NONE:
+                    self.add_event_result(ev, *result)
+                    self.add_event_plot_data(ev, ev.GetEventObject().get_object())
+        instr.count("events", len(approach_events))
+
+        if self.__stats is not None:
+            self.__stats.add_recording(len(error_events))
+            self.__stats.update([ev.GetEgoKinematics().GetSpeed()[0] for ev in approach_events],
+                                [result for ev, result in zip(self.__acc_event_list, ordered_results)
+                                 if ev.GetTestcaseErrorType() == acc_gd.TESTCASE_ERROR_TYPES.NONE and
+                                 result is not None])
+
+        if self.__result_writer is not None:
+            with instr.timer("ProcessData.export"):
+                exported = [(ev.GetStartIndex(), ev.GetStopIndex(), begin) + tuple(result)
+                            for ev, result, begin in zip(self.__acc_event_list, ordered_results, ordered_scene_begin)
+                            if result is not None]
+                if exported:
+                    start_index, stop_index, begin, applicable, tunnel_state, condition = zip(*exported)
+                    self.__result_writer.append(current_rec_file, start_index, stop_index, begin, tunnel_state,
+                                                applicable, condition)
+                    # results of every finished recording survive an aborted run
+                    self.__result_writer.flush()
+
+        if self.__sweep_grid:
+            with instr.timer("ProcessData.threshold_sweep"):
+                self._data_manager.SetDataPort(THRESHOLD_SWEEP_RESULTS_PORT_NAME,
+                                               self.sweep_thresholds(self.__sweep_grid, approach_events),
+                                               self._bus_name)
+
+        typename = acc_gd.EVENT_TYPE_STAT_APPROACH_TESTCASE
+        for ev in approach_events:
+            ev.SetType(typename)
+
+        self._data_manager.SetDataPort(APPROACH_RESULTS_PORT_NAME,
+                                       [ApproachEventResult(ev.GetStartIndex(), ev.GetStopIndex(), *result)
+                                        for ev, result in zip(self.__acc_event_list, ordered_results)
+                                        if result is not None],
+                                       self._bus_name)
         self.__acc_event_list = []
-        return sd.RET_VAL_OK
 
     def PostProcessData(self):
         """ PostProcessData. Called for each file. """
@@ -120,101 +372,188 @@ class ApproachAnalyzer441(bci):
     def PreTerminate(self):
         """ PreTerminate. Called once. """
         self._logger.debug()
+        if self.__prefetcher is not None:
+            self.__prefetcher.cancel()
+            self.__prefetcher = None
         return sd.RET_VAL_OK
 
     def Terminate(self):
         """ Terminate. Called once. """
         self._logger.debug()
+        if self.__result_writer is not None:
+            self.__result_writer.close()
+            self._logger.info("approach results exported to %s" % self.__result_writer.path)
+        if self.__instr.enabled:
+            self._logger.info("object cache: %s" % str(self.__object_cache.stats()))
+        if self.__result_cache is not None:
+            self._logger.info("result cache: %s" % str(self.__result_cache.stats()))
+        if self.__signal_store is not None:
+            self._logger.info("signal store: %s" % str(self.__signal_store.stats()))
+            if self.__owns_signal_store:
+                self.__signal_store.close()
+        if self.__stats is not None:
+            self._logger.info("approach statistics: %d recordings, %d events, pass rate %s"
+                              % (self.__stats.recordings, self.__stats.events, str(self.__stats.pass_rate())))
+            self._data_manager.SetDataPort(STATISTICS_RESULTS_PORT_NAME, self.__stats, self._bus_name)
+            if self.__stats_output:
+                self.__stats.save(self.__stats_output)
+        if self.__instr.enabled:
+            self._logger.info("instrumentation: %s" % str(self.__instr.summary()))
+            if self.__instr_output:
+                self.__instr.export(self.__instr_output)
         return sd.RET_VAL_OK
 
+    def _get_signal_port(self, port_name):
+        """ recording level signal port of the bus, a read-only view of the signal store if one is configured """
+        if self.__signal_store is None:
+            return self._data_manager.GetDataPort(port_name, self._bus_name)
+        return self.__signal_store.get(self._data_manager.GetDataPort(sd.CURRENT_FILE_PORT_NAME),
+                                       (self._bus_name, port_name),
+                                       lambda: self._data_manager.GetDataPort(port_name, self._bus_name))
+
+    def get_result_cache_key(self, events):
+        """ content hash over everything the results of a recording depend on:
+        analyzer version, thresholds and rule table, timestamps, TunnelDtct, event boundaries, ego speed and
+        the used object signals
+        :param events: all ACC events of the recording
+        :return: hex digest
+        """
+        hasher = hashlib.sha1()
+        # rule engines of testcase variants must not replay the results of other rules
+        rules = [(rule.condition, rule.in_tunnel, sorted(rule.allowed.items()), sorted(rule.forbidden.items()))
+                 for rule in self.rule_engine.rules]
+        hasher.update(repr((GENERATOR_VERSION_STRING, RESULT_CACHE_FORMAT, SPEED_THRESHOLD, TIMEGAP_THRESHOLD,
+                            DIST_EXT, DIST_THRESHOLD, rules)).encode())
+        self._hash_signal(hasher, self.__timestamp)
+        self._hash_signal(hasher, self._get_signal_port("TunnelDtct"))
+
+        hashed_objects = {}
+        for ev in events:
+            hasher.update(repr((ev.GetType(), ev.GetTestcaseErrorType())).encode())
+            if ev.GetTestcaseErrorType() != acc_gd.TESTCASE_ERROR_TYPES.NONE or \
+                    ev.GetType() != acc_gd.EVENT_TYPE_APPROACH_TESTCASE:
+                continue
+            hasher.update(repr((ev.GetStartIndex(), ev.GetStopIndex(), ev.GetStopTime(),
+                                ev.GetRelativeObjectIndexes())).encode())
+            self._hash_signal(hasher, ev.GetEgoKinematics().GetSpeed())
+
+            # objects shared by several events are hashed once, afterwards only referenced by position
+            obj = ev.GetEventObject().get_object()
+            if id(obj) in hashed_objects:
+                hasher.update(repr(("obj", hashed_objects[id(obj)])).encode())
+                continue
+            hashed_objects[id(obj)] = len(hashed_objects)
+            hasher.update(repr(("obj", obj["Index"])).encode())
+            for signal_name in OBJ_SIGNALS_USED:
+                self._hash_signal(hasher, obj[signal_name])
+        return hasher.hexdigest()
+
+    @staticmethod
+    def _hash_signal(hasher, values):
+        values = np.asarray(values)
+        hasher.update(repr((values.dtype.str, values.shape)).encode())
+        if values.dtype.hasobject:
+            hasher.update(repr(values.tolist()).encode())
+        else:
+            hasher.update(np.ascontiguousarray(values).tobytes())
+
     def analyze_event(self, event):
+        """ analyze a single approach event, see analyze_events """
+        return self.analyze_events([event])[0]
+
+    def analyze_events(self, events):
+        """ analyze the approach events of the recording together, see _analyze_events
+        :return: list of (event_applicable, tunnel_state_of_scene, test_result) per event
         """
-        get event object
-        get timestamp of Timegap4s+20m
-          if this is before object lifetime:  event attribute states -> failed   (was not stable over the time)
-        from this timestamp till end of TC
-         create slices of the respective signals:
-          -PreSelect
-          -ObstclDtct
-          -ObservedClass
-        check TunnelDetect at timestamp of Timegap4s+20m
-        check for each slice according to criteria if state given for whole slice
+        return self._analyze_events(events)[0]
+
+    def _analyze_events(self, events):
         """
-        self._logger.info("length of bsig timestamp: %s" % str(len(self.__timestamp)))
+        for all events of the recording together:
+        get the event objects and signals, analyze them (approach_core.analyze_approach_events),
+        log the per event diagnostics and write plot data and results to the events
 
-        tunnel_detect = self._data_manager.GetDataPort("TunnelDtct", self._bus_name)
-        vego = event.GetEgoKinematics().GetSpeed()
+        returns list of (event_applicable, tunnel_state_of_scene, test_result) per event
+        and list of the scene begin timestamps per event
+        """
+        if not events:
+            return [], []
+        instr = self.__instr
+
+        with instr.timer("analyze.fetch"):
+            table = self._event_table(events)
+            tunnel_detect = self._get_signal_port("TunnelDtct")
+        analysis = analyze_approach_events(table, self.__timestamp, tunnel_detect, self.rule_engine,
+                                           self.__object_cache, instr, self.__timestamp_index)
+        for i, obj in enumerate(table.objects):
+            event_applicable, tunnel_state, test_result = analysis.results[i]
+            self._log_event_result(obj, analysis.timestamp_of_ext_pud[i], analysis.timestamp_of_dist[i],
+                                   event_applicable, tunnel_state, test_result)
+
+        with instr.timer("analyze.plot_data"):
+            for ev, obj in zip(events, table.objects):
+                self.add_event_plot_data(ev, obj)
+
+        with instr.timer("analyze.write_back"):
+            for ev, result in zip(events, analysis.results):
+                self.add_event_result(ev, *result)
+        return analysis.results, analysis.scene_begin
 
-        obj = event.GetEventObject().get_object()
-        self._logger.info("object lifetime: %s" % str(len(obj["Timestamp"])))
-
-        # get timestamp of when Timegap=4s+20m ('extended PUD')
-        timestamp_of_ext_pud = self.get_timestamp_of_pud(event, timegap_threshold=TIMEGAP_THRESHOLD,
-                                                         dist_delta=DIST_EXT)
-        # get timestamp of when Timegap=4s ('PUD')
-        timestamp_of_pud = self.get_timestamp_of_pud(event, timegap_threshold=TIMEGAP_THRESHOLD)
-        self._logger.info("timestamp when distance gets below pud: %s" % str(timestamp_of_ext_pud))
-        # get timestamp when object comes closer than 90m
-        timestamp_of_dist = self.get_timestamp_of_dist(event, dist_threshold=DIST_THRESHOLD)
-        self._logger.info("timestamp when object gets below 90m: %s" % str(timestamp_of_dist))
-
-        if timestamp_of_ext_pud == obj["Timestamp"][0]:
-            # TODO: this scene not applicable according to my interpretation of the requirement
-            # TODO: has to be regarded as attribute, so that it either can be counted as faild or not counted at all
+    @staticmethod
+    def _event_table(events):
+        """ ApproachEventTable (approach_core) of the object signals and boundaries of the events """
+        objects = [ev.GetEventObject().get_object() for ev in events]
+        relative_indexes = [ev.GetRelativeObjectIndexes() for ev in events]
+        return ApproachEventTable(objects, [obj[sd.OBJ_DISTX] for obj in objects],
+                                  [indexes[0] for indexes in relative_indexes],
+                                  [indexes[1] for indexes in relative_indexes],
+                                  [ev.GetStartIndex() for ev in events], [ev.GetStopIndex() for ev in events],
+                                  [ev.GetStopTime() for ev in events],
+                                  [ev.GetEgoKinematics().GetSpeed() for ev in events])
+
+    def _log_event_result(self, obj, timestamp_of_ext_pud, timestamp_of_dist, event_applicable, tunnel_state,
+                          test_result):
+        """ per event diagnostics, formatted by the logger only if its level is enabled """
+        self._logger.info("length of bsig timestamp: %s", len(self.__timestamp))
+        self._logger.info("object lifetime: %s", len(obj["Timestamp"]))
+        self._logger.info("timestamp when distance gets below pud: %s", timestamp_of_ext_pud)
+        self._logger.info("timestamp when object gets below 90m: %s", timestamp_of_dist)
+        if not event_applicable:
             self._logger.warning("object only comes to life under the threshold")
-            event_applicable = False
-        else:
-            event_applicable = True
-
-        abs_idx = self.__timestamp.index(timestamp_of_ext_pud)
-        tunnel_state_of_scene = tunnel_detect[abs_idx]
-        self._logger.info("tunnel state at begin of scene: %s" % str(tunnel_state_of_scene))
-
-        # distinguish slower and high speed approaches (e.g. 0-70 and 70-120km/h)
-        if vego[0] < SPEED_THRESHOLD/3.6:
-            timestamp_of_scene_begin = timestamp_of_pud
-        else:
-            # take maximum of timestamps (equivalent to minimum of distances during an approach)
-            timestamp_of_scene_begin = max(timestamp_of_dist, timestamp_of_pud)
-
-        # from this timestamp till end of TC
-        #  create slices of the respective signals:
-        #   -PreSelect
-        #   -ObstclDtct
-        #   -ObservedClass
-        obj_idx_pud = self.get_index_relative_to_object_for_ts(obj, timestamp_of_scene_begin, self.__timestamp)
-        tc_end = event.GetStopTime()  # TODO clarify if good enough since after TC detector this might be not TC endtime
-        obj_idx_tc_end = self.get_index_relative_to_object_for_ts(obj, tc_end, self.__timestamp)
-
-        observed_class_slice = obj["Observed_Class"][obj_idx_pud:obj_idx_tc_end + 1]
-        obstacle_detect_slice = obj["DTR_Obj_ObstclDtct"][obj_idx_pud:obj_idx_tc_end + 1]
-        preselect_slice = obj["DTR_ObjPreSelect"][obj_idx_pud:obj_idx_tc_end + 1]
-
-        test_result = self.check_test_criteria(tunnel_state_of_scene, preselect_slice, obstacle_detect_slice,
-                                               observed_class_slice)
-        self._logger.info("Test Result: condition %s met." % str(test_result))
-
-        # adding obstcldtct/observed class to plot
+        self._logger.info("tunnel state at begin of scene: %s", tunnel_state)
+        self._logger.info("Test Result: condition %s met.", test_result)
+
+    def sweep_thresholds(self, grid, events=None):
+        """ analyze the events for every point of a threshold grid, see approach_core.sweep_approach_thresholds
+        :param grid: list of ThresholdSet, see threshold_grid
+        :param events: approach events, default: all approach testcase events without error of the recording
+        :return: SweepResult
+        """
+        if events is None:
+            events = [ev for ev in self._data_manager.GetDataPort(sd.ACC_EVENTS_PORT_NAME, self._bus_name)
+                      if ev.GetTestcaseErrorType() == acc_gd.TESTCASE_ERROR_TYPES.NONE and
+                      ev.GetType() == acc_gd.EVENT_TYPE_APPROACH_TESTCASE]
+        return sweep_approach_thresholds(self._event_table(events), grid, self.__timestamp,
+                                         self._get_signal_port("TunnelDtct"), self.rule_engine, self.__object_cache,
+                                         self.__timestamp_index)
+
+    def add_event_result(self, event, event_applicable, tunnel_state_of_scene, test_result):
+        """ attach the approach result to the event as legacy attributes or record (see approach_result) """
+        attach_result(event, ApproachResult(event_applicable, tunnel_state_of_scene, test_result),
+                      self.__legacy_attributes)
+
+    def add_event_plot_data(self, event, obj):
+        """ adding obstcldtct/observed class to plot """
+        # TODO: ensure that signals will be aligned to other event signals (even if object starts before the event)
         self.add_objsignal_to_plot_data(event, "ObstclDtct", obj["DTR_Obj_ObstclDtct"], gain=10)
         self.add_objsignal_to_plot_data(event, "ObsClass", obj["Observed_Class"], gain=10)
-        # TODO: ensure that signals will be aligned to other event signals (even if object starts before the event)
-        # obstcldtct = [10*v for v in obj["DTR_Obj_ObstclDtct"]]
-        # obsrvdcls = [10*v for v in obj["Observed_Class"]]
-
-        # plotdata = event.GetPlotData()
-        # plotdata["SignalValueList"].append(obstcldtct)
-        # plotdata["SignalsNameList"].append("ObstclDtct")
-        # plotdata["SignalValueList"].append(obsrvdcls)
-        # plotdata["SignalsNameList"].append("ObsClass")
-
-        event.AddAttribute('event_applicable', event_applicable, '', 'boolean')
-        event.AddAttribute('tunnel_state_of_scene', tunnel_state_of_scene, '', 'int')
-        event.AddAttribute('stat_approach_condition', test_result, '', 'string')
 
     @staticmethod
     # TODO put it as method into PlotData class
     def add_objsignal_to_plot_data(event, name, signalvalue, gain=1):
-        signalvalue = [gain * v for v in signalvalue]
+        """ add the plot window of an object signal to the event plot data,
+        stored as LazyPlotSignal: scaling/copying only happens when a report reads the values
+        """
         obj = event.GetEventObject().get_object()
         plotdata = event.GetPlotData()
 
@@ -227,9 +566,8 @@ class ApproachAnalyzer441(bci):
         # Calculate the object relative indexes.
         obj_rel_start = ind_start - obj["Index"]
         obj_rel_end = ind_stop - obj["Index"]
-        signalvalue = signalvalue[obj_rel_start:obj_rel_end]
 
-        plotdata["SignalValueList"].append(signalvalue)
+        plotdata["SignalValueList"].append(LazyPlotSignal(signalvalue, gain, obj_rel_start, obj_rel_end))
         plotdata["SignalsNameList"].append(name)
 
     @staticmethod
@@ -299,56 +637,53 @@ class ApproachAnalyzer441(bci):
                 return 'E'
         return None
 
+    @staticmethod
+    def check_test_criteria_array(tunnel, preselect, obstacle_detect, observed_class):
+        """ array based variant of check_test_criteria, returns the same 'A'..'E' or None result
+        evaluated by the compiled rule engine of approach_rules, see approach_core.check_test_criteria
+        :param tunnel: tunnel detect state at begin of scene
+        :param preselect: numpy array (or buffer) of DTR_ObjPreSelect over the scene
+        :param obstacle_detect: numpy array (or buffer) of DTR_Obj_ObstclDtct over the scene
+        :param observed_class: numpy array (or buffer) of Observed_Class over the scene
+        :return: met condition 'A'..'E' or None
+        """
+        return check_test_criteria(tunnel, np.asarray(preselect), np.asarray(obstacle_detect),
+                                   np.asarray(observed_class), default_rule_engine())
+
+    # crossing search of approach_core, kept as static method for existing callers
+    find_first_crossings = staticmethod(find_first_crossings)
+
+    def get_crossing_indexes(self, ev, threshold_specs):
+        """ return the recording indexes when the event object gets below the given thresholds
+        thresholds that are never crossed fall back to the last cycle of the event
+        :param ev: event
+        :param threshold_specs: list of TimegapThreshold / DistanceThreshold
+        :return: list of recording indexes, one per threshold spec
+        """
+        obj = ev.GetEventObject().get_object()
+        obj_rel_start, obj_rel_end, _ = ev.GetRelativeObjectIndexes()
+        return event_crossing_indexes(obj, obj[sd.OBJ_DISTX], obj_rel_start, obj_rel_end,
+                                      ev.GetEgoKinematics().GetSpeed(), ev.GetStartIndex(), threshold_specs,
+                                      self.__object_cache)
+
     def get_timestamp_of_pud(self, ev, timegap_threshold, dist_delta=0.0):
         """ return the timestamp, when object is closer than a given timegap_threshold
         :param ev: event
         :param timegap_threshold: given timegap in [s] that the event object has to be closer than
         :param dist_delta: distance in [m] that the timegap gets extended by """
-        obj_rel_start, obj_rel_end, length = ev.GetRelativeObjectIndexes()
-        vego = ev.GetEgoKinematics().GetSpeed()
-        distx = ev.GetEventObject().get_object()[sd.OBJ_DISTX][obj_rel_start:obj_rel_end]
-
-        timegap_over_event = []
-        for i, v in enumerate(vego):
-            timegap_over_event.append(self.calc_timegap(distx[i], v))
-
-        dist_via_tg_over_event = []
-        for v in vego:
-            cur_dist_in_m = timegap_threshold * v + dist_delta
-            dist_via_tg_over_event.append(cur_dist_in_m)
-        i = 0
-        for i in range(length):
-            if distx[i] < dist_via_tg_over_event[i]:
-                break
-        index_when_timegap_reached = ev.GetStartIndex() + i
+        index_when_timegap_reached, = self.get_crossing_indexes(ev, [TimegapThreshold(timegap_threshold,
+                                                                                      dist_delta)])
         return self.__timestamp[index_when_timegap_reached]
 
     def get_timestamp_of_dist(self, ev, dist_threshold):
         """ return the timestamp, when object is closer than given distance threshold
         :param ev: event
         :param dist_threshold: given timegap in [s] that the event object has to be closer than """
-        obj_rel_start, obj_rel_end, length = ev.GetRelativeObjectIndexes()
-        distx = ev.GetEventObject().get_object()[sd.OBJ_DISTX][obj_rel_start:obj_rel_end]
-        i = 0
-        for i, v in enumerate(distx):
-            if v < dist_threshold:
-                break
-        index_when_dist_reached = ev.GetStartIndex() + i
+        index_when_dist_reached, = self.get_crossing_indexes(ev, [DistanceThreshold(dist_threshold)])
         return self.__timestamp[index_when_dist_reached]
 
-    @staticmethod
-    def calc_timegap(distx, speed):
-        """ calculate the timegap for given distance and ego speed
-          returns 10000 if egospeed lower than 1 m/s
-        :param distx: distance in [m]
-        :param speed: ego speed in [m/s]
-        :return: calculated timegap value
-        """
-        if speed > 1.0:
-            timegap = distx / speed
-        else:
-            timegap = 10000
-        return timegap
+    # timegap of approach_core, kept as static method for existing callers
+    calc_timegap = staticmethod(calc_timegap)
 
     @staticmethod
     def get_index_relative_to_object_for_ts(obj, timestamp, timestamp_list):
@@ -356,14 +691,7 @@ class ApproachAnalyzer441(bci):
         (start timestamp of object will return 0)
         :param obj: obj dictionary
         :param timestamp: single timestamp to look up
-        :param timestamp_list: list of all timestamps of the recording/bsig
+        :param timestamp_list: TimestampIndex (or list of all timestamps) of the recording/bsig
         :return index
         """
-
-        nearest_timestamp = find_nearest(timestamp_list, timestamp)
-        print "get_index_relative_to_object_for_ts: ", timestamp, nearest_timestamp, abs(timestamp - nearest_timestamp)
-        idx = timestamp_list.index(nearest_timestamp)
-        obj_startidx = obj["Index"]
-        return idx - obj_startidx
-
-
+        return index_relative_to_object(timestamp_list, obj["Index"], timestamp)
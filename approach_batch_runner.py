@@ -0,0 +1,228 @@
+"""
+approach_batch_runner.py
+-------------------
+
+runs ApproachAnalyzer441 over many recordings in parallel worker processes
+
+every worker hosts its own analyzer instance against a LocalDataManager, the recordings are
+handed out in chunks, results come back in the order of the given recording list.
+a failing recording is reported with its error and does not stop the other recordings, a chunk whose
+analyzer does not start or whose worker process dies reports all its recordings as failed.
+
+usage:
+    runner = ApproachBatchRunner(my_loader, project_name="MFC4xx", max_workers=32, chunk_size=4)
+    for rec_result in runner.run(recordings):
+        ...
+    runner.statistics  # fleet statistics of the run, merged from the workers (ApproachStatistics)
+
+the loader has to be picklable (module level function), it gets called in the worker with a
+recording and returns a dict {port name: value} of the bus ports the analyzer reads
+(sd.TIMESTAMP_PORT_NAME, "TunnelDtct", sd.ACC_EVENTS_PORT_NAME).
+with prefetch_depth > 0 every worker loads the next recordings of its chunk in a background thread
+while the current one is analyzed (see approach_prefetch).
+the process pool is concurrent.futures, on python 2 it needs the "futures" backport package. it is only
+imported by run() with worker processes, LocalDataManager and max_workers=0 work without it.
+
+
+:author:        Sahajhaksh Hariharan
+
+"""
+# ====================================================================
+# Imports
+# ====================================================================
+import sys
+import argparse
+import importlib
+import json
+import traceback
+from collections import namedtuple
+
+# ====================================================================
+# Global Constant Declarations
+# ====================================================================
+GLOBAL_BUS_NAME = "Global"
+DEFAULT_BUS_NAME = "Bus#1"
+DEFAULT_COMPONENT_NAME = "ApproachAnalyzer441"
+DEFAULT_PREFETCH_DEPTH = 1
+
+# result of one recording: list of ApproachEventResult, or error text if the recording failed
+RecordingResult = namedtuple('RecordingResult', ['recording', 'events', 'error'])
+
+#############################################################################
+
+
+# =============================================================================
+# Class
+# =============================================================================
+class LocalDataManager(object):
+    """ minimal stand-in for the valf data manager: data ports stored per bus in a dict """
+    def __init__(self):
+        self.__ports = {}
+
+    def GetDataPort(self, port_name, bus_name=GLOBAL_BUS_NAME):
+        return self.__ports.get(bus_name, {}).get(port_name)
+
+    def SetDataPort(self, port_name, port_value, bus_name=GLOBAL_BUS_NAME):
+        self.__ports.setdefault(bus_name, {})[port_name] = port_value
+
+    def ExistsDataPort(self, port_name, bus_name=GLOBAL_BUS_NAME):
+        return port_name in self.__ports.get(bus_name, {})
+
+    def ClearBus(self, bus_name):
+        self.__ports.pop(bus_name, None)
+
+
+class ApproachBatchRunner(object):
+    def __init__(self, loader, project_name, bus_name=DEFAULT_BUS_NAME, component_name=DEFAULT_COMPONENT_NAME,
+                 max_workers=None, chunk_size=1, prefetch_depth=DEFAULT_PREFETCH_DEPTH):
+        """ Class initialisation.
+        @Param loader:   picklable callable, loader(recording) -> dict {port name: value} for the bus
+        @Param project_name:   project name for the observer dispatcher
+        @Param bus_name:   bus name the analyzer runs on
+        @Param component_name:   component name the analyzer runs with
+        @Param max_workers:   number of worker processes, None: number of cpus, 0: run in this process
+        @Param chunk_size:   number of recordings handed to a worker at once
+        @Param prefetch_depth:   number of recordings a worker loads ahead of the analysis, 0: no prefetch
+        """
+        if chunk_size < 1:
+            raise ValueError("chunk_size has to be at least 1")
+        self.__loader = loader
+        self.__project_name = project_name
+        self.__bus_name = bus_name
+        self.__component_name = component_name
+        self.__max_workers = max_workers
+        self.__chunk_size = chunk_size
+        self.__prefetch_depth = prefetch_depth
+        self.statistics = None
+
+    def run(self, recordings):
+        """ analyze all recordings
+        :param recordings: list of recordings (anything the loader accepts, e.g. file paths)
+        :return: list of RecordingResult in the order of recordings, the merged statistics are kept in statistics
+        """
+        from fct.acc.acc_performance.approach_stats import merge_statistics
+
+        recordings = list(recordings)
+        chunks = [recordings[i:i + self.__chunk_size] for i in range(0, len(recordings), self.__chunk_size)]
+        config = (self.__loader, self.__project_name, self.__bus_name, self.__component_name,
+                  self.__prefetch_depth)
+
+        if self.__max_workers == 0:
+            chunk_results = [analyze_recordings(chunk, config) for chunk in chunks]
+        else:
+            # python 2: "futures" backport
+            from concurrent.futures import ProcessPoolExecutor
+            with ProcessPoolExecutor(max_workers=self.__max_workers) as executor:
+                # results in submit order, independent of which worker finishes first
+                futures = [executor.submit(analyze_recordings, chunk, config) for chunk in chunks]
+                chunk_results = []
+                for chunk, future in zip(chunks, futures):
+                    try:
+                        chunk_results.append(future.result())
+                    except Exception:
+                        # e.g. BrokenProcessPool of a crashed worker: fails the chunks not finished before
+                        error = traceback.format_exc()
+                        chunk_results.append(([RecordingResult(rec, None, error) for rec in chunk], None))
+
+        self.statistics = merge_statistics(stats for _, stats in chunk_results if stats is not None)
+        return [rec_result for chunk_result, _ in chunk_results for rec_result in chunk_result]
+
+
+# =============================================================================
+# Functions
+# =============================================================================
+def analyze_recordings(recordings, config):
+    """ worker: run one analyzer instance over a chunk of recordings
+    :param recordings: list of recordings
+    :param config: tuple (loader, project_name, bus_name, component_name, prefetch_depth)
+    :return: (list of RecordingResult, ApproachStatistics of the chunk or None if the analyzer did not start)
+    """
+    # framework imports only in the worker
+    import stk.valf.signal_defs as sd
+    import fct.acc.common.acc_global_defs as acc_gd
+    from fct.acc.acc_performance.acc_approach_analyzer441 import ApproachAnalyzer441, APPROACH_RESULTS_PORT_NAME, \
+        PREFETCH_PORT_NAME, OBJ_SIGNALS_USED, STATISTICS_PORT_NAME, STATISTICS_RESULTS_PORT_NAME
+    from fct.acc.acc_performance.approach_prefetch import RecordingPrefetcher, materialize_event_objects
+
+    loader, project_name, bus_name, component_name, prefetch_depth = config
+    data_manager = LocalDataManager()
+    data_manager.SetDataPort(acc_gd.PROJECT_PORT_NAME, project_name)
+    data_manager.SetDataPort(STATISTICS_PORT_NAME, True, bus_name)
+    prefetcher = None
+    if prefetch_depth:
+        prefetcher = RecordingPrefetcher(loader, recordings, prefetch_depth,
+                                         lambda ports: materialize_event_objects(ports.get(sd.ACC_EVENTS_PORT_NAME),
+                                                                                 OBJ_SIGNALS_USED))
+        data_manager.SetDataPort(PREFETCH_PORT_NAME, prefetcher, bus_name)
+    try:
+        analyzer = ApproachAnalyzer441(data_manager, component_name, bus_name)
+        if analyzer.Initialize() != sd.RET_VAL_OK or analyzer.PostInitialize() != sd.RET_VAL_OK:
+            raise RuntimeError("analyzer initialisation failed")
+    except Exception:
+        if prefetcher is not None:
+            prefetcher.cancel()
+        error = traceback.format_exc()
+        return [RecordingResult(rec, None, error) for rec in recordings], None
+
+    results = []
+    for rec in recordings:
+        data_manager.ClearBus(bus_name)
+        try:
+            if prefetcher is None:
+                for port_name, port_value in loader(rec).items():
+                    data_manager.SetDataPort(port_name, port_value, bus_name)
+            # with prefetch the analyzer publishes the ports in LoadData
+            data_manager.SetDataPort(sd.CURRENT_FILE_PORT_NAME, rec)
+            for step in (analyzer.LoadData, analyzer.ProcessData, analyzer.PostProcessData):
+                if step() != sd.RET_VAL_OK:
+                    raise RuntimeError("%s failed" % step.__name__)
+            events = data_manager.GetDataPort(APPROACH_RESULTS_PORT_NAME, bus_name) or []
+            results.append(RecordingResult(rec, [tuple(ev) for ev in events], None))
+        except Exception:
+            results.append(RecordingResult(rec, None, traceback.format_exc()))
+
+    analyzer.PreTerminate()
+    analyzer.Terminate()
+    return results, data_manager.GetDataPort(STATISTICS_RESULTS_PORT_NAME, bus_name)
+
+
+def _import_loader(loader_path):
+    """ import loader given as 'package.module:function' """
+    module_name, func_name = loader_path.split(":")
+    return getattr(importlib.import_module(module_name), func_name)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="run ApproachAnalyzer441 over many recordings in parallel")
+    parser.add_argument("loader", help="recording loader as 'package.module:function'")
+    parser.add_argument("reclist", help="text file with one recording per line")
+    parser.add_argument("output", help="json file for the per event results")
+    parser.add_argument("--project", required=True, help="project name")
+    parser.add_argument("--bus", default=DEFAULT_BUS_NAME, help="bus name")
+    parser.add_argument("--workers", type=int, default=None, help="number of worker processes (0: no pool)")
+    parser.add_argument("--chunk-size", type=int, default=1, help="recordings per worker task")
+    parser.add_argument("--statistics", help="json file for the merged fleet statistics")
+    parser.add_argument("--prefetch", type=int, default=DEFAULT_PREFETCH_DEPTH,
+                        help="recordings loaded ahead per worker (0: no prefetch)")
+    args = parser.parse_args(argv)
+
+    with open(args.reclist) as reclist:
+        recordings = [line.strip() for line in reclist if line.strip()]
+
+    runner = ApproachBatchRunner(_import_loader(args.loader), args.project, bus_name=args.bus,
+                                 max_workers=args.workers, chunk_size=args.chunk_size,
+                                 prefetch_depth=args.prefetch)
+    results = runner.run(recordings)
+    with open(args.output, "w") as out:
+        json.dump([rec_result._asdict() for rec_result in results], out, indent=1)
+    if args.statistics:
+        runner.statistics.save(args.statistics)
+
+    failed = [rec_result.recording for rec_result in results if rec_result.error is not None]
+    for rec in failed:
+        sys.stderr.write("failed: %s\n" % rec)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,545 @@
+"""
+approach_core.py
+-------------------
+
+framework free computations of the 441 approach testcase
+
+crossing search of the PUD / distance thresholds, timegap, timestamp to index mapping, the A-E criteria and
+the analysis of all approach events of a recording (analyze_approach_events, sweep_approach_thresholds)
+on plain lists / numpy arrays and object dicts. only numpy and the framework free helper modules of this
+package are imported, so worker processes and tools that do not run the valf component do not pay the
+stk / fct import cost.
+ApproachAnalyzer441 (acc_approach_analyzer441) is the valf adapter: it fetches the ports and events,
+builds the ApproachEventTable and writes the results back to the events.
+the enum values of the default A-E rules are framework definitions: the rules are passed in as compiled
+RuleEngine (approach_rules), which is picklable, e.g. built once by the caller and sent to the workers.
+
+
+:author:        Sahajhaksh Hariharan
+
+"""
+# ====================================================================
+# Imports
+# ====================================================================
+import itertools
+from collections import namedtuple
+
+import numpy as np
+
+# ====================================================================
+# Imports - Local
+# ====================================================================
+from fct.acc.acc_performance.approach_instrumentation import NullInstrumentation, nbytes
+from fct.acc.acc_performance.approach_object_cache import ObjectCache, first_below_table
+from fct.acc.acc_performance.approach_rle import RleSignal
+
+# ====================================================================
+# Global Constant Declarations
+# ====================================================================
+SPEED_THRESHOLD = 70.0  # [km/h]
+TIMEGAP_THRESHOLD = 4.0  # [s]
+DIST_EXT = 20.0  # [m]
+DIST_THRESHOLD = 90.0  # [m]
+
+# timegap returned by calc_timegap for (almost) standing ego
+TIMEGAP_STANDSTILL = 10000
+# TunnelDtct state of a tunnel
+TUNNEL_STATE_TUNNEL = 2
+
+# first crossing index of a threshold which is never crossed
+NOT_CROSSED = -1
+
+# threshold specs for the crossing search:
+#  distance below timegap * vego + offset, e.g. PUD (TIMEGAP_THRESHOLD) or extended PUD (TIMEGAP_THRESHOLD, DIST_EXT)
+TimegapThreshold = namedtuple('TimegapThreshold', ['timegap', 'offset'])
+#  distance below an absolute value, e.g. DIST_THRESHOLD
+DistanceThreshold = namedtuple('DistanceThreshold', ['distance'])
+
+# one point of a threshold sweep
+ThresholdSet = namedtuple('ThresholdSet', ['speed_threshold', 'timegap_threshold', 'dist_ext', 'dist_threshold'])
+DEFAULT_THRESHOLDS = ThresholdSet(SPEED_THRESHOLD, TIMEGAP_THRESHOLD, DIST_EXT, DIST_THRESHOLD)
+
+# condition as small int code: index in CONDITION_NAMES, 0 is no condition met
+CONDITION_NAMES = (None, 'A', 'B', 'C', 'D', 'E')
+
+# object signals the criteria refer to, order of the arguments of RuleEngine.evaluate
+PRESELECT = "DTR_ObjPreSelect"
+OBSTACLE_DETECT = "DTR_Obj_ObstclDtct"
+OBSERVED_CLASS = "Observed_Class"
+RULE_SIGNALS = (PRESELECT, OBSTACLE_DETECT, OBSERVED_CLASS)
+
+# object lifetime in cycles from which the enum signals get run-length encoded for the criteria evaluation
+RLE_MIN_CYCLES = 2048
+
+# result of analyze_approach_events: results list of (event_applicable, tunnel_state_of_scene, condition),
+# scene_begin list of timestamps, timestamps of the extended PUD and distance crossings for the diagnostics
+EventAnalysis = namedtuple('EventAnalysis', ['results', 'scene_begin', 'timestamp_of_ext_pud', 'timestamp_of_dist'])
+
+# threshold sweep output, all arrays with shape (number of events, number of thresholds),
+# condition codes index condition_names (CONDITION_NAMES for the default rules)
+SweepResult = namedtuple('SweepResult', ['thresholds', 'start_index', 'event_applicable', 'tunnel_state_of_scene',
+                                         'scene_begin', 'condition', 'condition_names'])
+
+#############################################################################
+
+
+# =============================================================================
+# Class
+# =============================================================================
+class TimestampIndex(object):
+    """ sorted lookup index over the timestamp vector of one recording
+
+    built once per recording, nearest and exact lookups are binary searches instead of
+    the O(n) scans of find_nearest / list.index
+    """
+    def __init__(self, timestamps):
+        """ Class initialisation.
+        @Param timestamps:   timestamps of the recording/bsig (list or array)
+        """
+        self.__timestamps = np.asarray(timestamps)
+        if len(self.__timestamps) > 1 and np.any(np.diff(self.__timestamps) < 0):
+            # stable sort, so duplicated timestamps resolve to their first position like list.index
+            self.__order = np.argsort(self.__timestamps, kind='mergesort')
+            self.__sorted = self.__timestamps[self.__order]
+        else:
+            self.__order = None
+            self.__sorted = self.__timestamps
+
+    def __len__(self):
+        return len(self.__timestamps)
+
+    def __getitem__(self, idx):
+        return self.__timestamps[idx]
+
+    def index(self, timestamp):
+        """ return the index of the given timestamp, raises ValueError if not contained (like list.index)
+        :param timestamp: single timestamp to look up
+        :return: index
+        """
+        pos = np.searchsorted(self.__sorted, timestamp, side='left')
+        if pos >= len(self.__sorted) or self.__sorted[pos] != timestamp:
+            raise ValueError("timestamp %s not in recording" % str(timestamp))
+        if self.__order is None:
+            return int(pos)
+        return int(self.__order[pos])
+
+    def nearest_index(self, timestamp):
+        """ return the index of the timestamp closest to the given one,
+        on a tie the smaller timestamp wins (same as find_nearest)
+        :param timestamp: single timestamp to look up
+        :return: index
+        """
+        return int(self.nearest_indexes([timestamp])[0])
+
+    def nearest_indexes(self, timestamps):
+        """ vectorized nearest_index for an array of timestamps
+        :param timestamps: timestamps to look up
+        :return: array of indexes
+        """
+        if not len(self.__sorted):
+            raise ValueError("empty timestamp index")
+        timestamps = np.asarray(timestamps)
+        pos = np.searchsorted(self.__sorted, timestamps, side='left')
+        lower = np.clip(pos - 1, 0, len(self.__sorted) - 1)
+        upper = np.clip(pos, 0, len(self.__sorted) - 1)
+        pos = np.where(timestamps - self.__sorted[lower] <= self.__sorted[upper] - timestamps, lower, upper)
+        # first position of the nearest value
+        pos = np.searchsorted(self.__sorted, self.__sorted[pos], side='left')
+        if self.__order is None:
+            return pos
+        return self.__order[pos]
+
+
+class ApproachEventTable(object):
+    """ structure of arrays over the approach testcase events of one recording
+
+    every column holds one entry per event, so scene begins, tunnel states and index mappings
+    can be calculated for all events together
+    """
+    def __init__(self, objects, distx, obj_rel_start, obj_rel_end, start_index, stop_index, stop_time, vego):
+        """ Class initialisation.
+        @Param objects:   object dict per event ("Index", "Timestamp" and RULE_SIGNALS), the same dict for
+                          events of the same object
+        @Param distx:   complete object distance signal in [m] per event
+        @Param obj_rel_start:   first event cycle relative to the object per event
+        @Param obj_rel_end:   cycle behind the event relative to the object per event
+        @Param start_index:   recording index of the event start per event
+        @Param stop_index:   recording index of the event stop per event
+        @Param stop_time:   timestamp of the event stop per event
+        @Param vego:   ego speed in [m/s] over the event per event
+        """
+        self.objects = list(objects)
+        self.distx = list(distx)
+        self.obj_rel_start = list(obj_rel_start)
+        self.obj_rel_end = list(obj_rel_end)
+        self.vego = list(vego)
+        self.start_index = np.array(start_index, dtype=int)
+        self.stop_index = np.array(stop_index, dtype=int)
+        self.stop_time = np.array(stop_time)
+        self.obj_start_index = np.array([obj["Index"] for obj in self.objects], dtype=int)
+        self.obj_start_time = np.array([obj["Timestamp"][0] for obj in self.objects])
+        self.vego_at_start = np.array([speed[0] for speed in self.vego], dtype=float)
+
+        # recording indexes of the first crossings, filled by analyze_approach_events
+        self.ext_pud_index = np.zeros(len(self.objects), dtype=int)
+        self.pud_index = np.zeros(len(self.objects), dtype=int)
+        self.dist_index = np.zeros(len(self.objects), dtype=int)
+
+    def __len__(self):
+        return len(self.objects)
+
+
+# =============================================================================
+# Functions
+# =============================================================================
+def threshold_grid(speed_thresholds=(SPEED_THRESHOLD,), timegap_thresholds=(TIMEGAP_THRESHOLD,),
+                   dist_exts=(DIST_EXT,), dist_thresholds=(DIST_THRESHOLD,)):
+    """ all combinations of the given threshold values as list of ThresholdSet """
+    return [ThresholdSet(*values) for values in itertools.product(speed_thresholds, timegap_thresholds, dist_exts,
+                                                                  dist_thresholds)]
+
+
+def find_first_crossings(distx, vego, threshold_specs):
+    """ search the first cycle the object distance gets below each of the given thresholds, in one pass
+    :param distx: object distance in [m] over the event
+    :param vego: ego speed in [m/s] over the event
+    :param threshold_specs: list of TimegapThreshold / DistanceThreshold
+    :return: array with the first crossing index per threshold spec, NOT_CROSSED if never crossed
+    """
+    distx = np.asarray(distx, dtype=float)
+    if not len(distx):
+        return np.full(len(threshold_specs), NOT_CROSSED, dtype=int)
+    vego = np.asarray(vego, dtype=float)[:len(distx)]
+    if len(vego) < len(distx):
+        # no ego speed -> no timegap limit (nan never compares true)
+        vego = np.concatenate((vego, np.full(len(distx) - len(vego), np.nan)))
+
+    limits = np.empty((len(threshold_specs), len(distx)))
+    for row, spec in enumerate(threshold_specs):
+        if isinstance(spec, TimegapThreshold):
+            limits[row] = spec.timegap * vego + spec.offset
+        elif isinstance(spec, DistanceThreshold):
+            limits[row] = spec.distance
+        else:
+            raise ValueError("unknown threshold spec %s" % str(spec))
+
+    below = distx[np.newaxis, :] < limits
+    return np.where(below.any(axis=1), below.argmax(axis=1), NOT_CROSSED)
+
+
+def crossing_indexes(distx, vego, threshold_specs, start_index=0):
+    """ recording indexes of the first crossings, thresholds never crossed fall back to the last cycle
+    :param distx: object distance in [m] over the event
+    :param vego: ego speed in [m/s] over the event
+    :param threshold_specs: list of TimegapThreshold / DistanceThreshold
+    :param start_index: recording index of the first event cycle
+    :return: list of recording indexes, one per threshold spec
+    """
+    return crossings_to_indexes(find_first_crossings(distx, vego, threshold_specs), len(distx), start_index)
+
+
+def crossings_to_indexes(first_crossings, n_cycles, start_index=0):
+    """ recording indexes of first crossings (see find_first_crossings), NOT_CROSSED falls back to the last cycle
+    :param first_crossings: first crossing index per threshold spec, relative to the event
+    :param n_cycles: number of event cycles
+    :param start_index: recording index of the first event cycle
+    :return: list of recording indexes
+    """
+    first_crossings = np.where(first_crossings == NOT_CROSSED, max(n_cycles - 1, 0), first_crossings)
+    return [start_index + int(i) for i in first_crossings]
+
+
+def scene_begin_timestamps(vego_at_start, timestamp_of_pud, timestamp_of_dist, speed_threshold=SPEED_THRESHOLD):
+    """ begin of the scene per event: PUD for slower approaches, for high speed approaches the later one of
+    PUD and distance threshold (equivalent to the minimum of the distances)
+    :param vego_at_start: ego speed in [m/s] at event start
+    :param timestamp_of_pud: timestamps of the PUD crossing
+    :param timestamp_of_dist: timestamps of the distance threshold crossing
+    :param speed_threshold: speed in [km/h] separating slower and high speed approaches
+    :return: array of timestamps
+    """
+    timestamp_of_pud = np.asarray(timestamp_of_pud)
+    return np.where(np.asarray(vego_at_start) < speed_threshold / 3.6, timestamp_of_pud,
+                    np.maximum(timestamp_of_dist, timestamp_of_pud))
+
+
+def calc_timegap(distx, speed):
+    """ calculate the timegap for given distance and ego speed
+      returns TIMEGAP_STANDSTILL (10000) if egospeed lower than 1 m/s
+    :param distx: distance in [m]
+    :param speed: ego speed in [m/s]
+    :return: calculated timegap value
+    """
+    if speed > 1.0:
+        timegap = distx / speed
+    else:
+        timegap = TIMEGAP_STANDSTILL
+    return timegap
+
+
+def index_relative_to_object(timestamp_index, obj_start_index, timestamps):
+    """ for given absolute timestamps, return the indexes relative to the object signals
+    (start timestamp of the object gives 0)
+    :param timestamp_index: TimestampIndex (or list of all timestamps) of the recording/bsig
+    :param obj_start_index: recording index of the first object cycle (scalar or array)
+    :param timestamps: single timestamp or array of timestamps to look up
+    :return: index, array of indexes for array input
+    """
+    if not isinstance(timestamp_index, TimestampIndex):
+        timestamp_index = TimestampIndex(timestamp_index)
+    if np.ndim(timestamps) == 0:
+        return timestamp_index.nearest_index(timestamps) - obj_start_index
+    return timestamp_index.nearest_indexes(timestamps) - obj_start_index
+
+
+def check_test_criteria(tunnel, preselect, obstacle_detect, observed_class, rule_engine):
+    """ condition A-E met for the whole scene
+    the rule table is passed in: the enum values of the default A-E rules come from the framework definitions
+    (approach_rules.default_rule_engine), the core does not import them
+    :param tunnel: tunnel detect state at begin of scene
+    :param preselect: DTR_ObjPreSelect over the scene (list, array or RleSignal)
+    :param obstacle_detect: DTR_Obj_ObstclDtct over the scene (list, array or RleSignal)
+    :param observed_class: Observed_Class over the scene (list, array or RleSignal)
+    :param rule_engine: compiled RuleEngine of approach_rules
+    :return: met condition 'A'..'E' or None
+    """
+    return rule_engine.evaluate(tunnel, preselect, obstacle_detect, observed_class)
+
+
+def event_crossing_indexes(obj, distx, obj_rel_start, obj_rel_end, vego, start_index, threshold_specs,
+                           object_cache=None):
+    """ recording indexes when the event object gets below the given thresholds
+    thresholds that are never crossed fall back to the last cycle of the event
+    :param obj: object dict of the event, key of the object cache
+    :param distx: complete object distance signal in [m]
+    :param obj_rel_start: first event cycle relative to the object
+    :param obj_rel_end: cycle behind the event relative to the object
+    :param vego: ego speed in [m/s] over the event
+    :param start_index: recording index of the event start
+    :param threshold_specs: list of TimegapThreshold / DistanceThreshold
+    :param object_cache: ObjectCache of the recording, None: nothing shared with other events
+    :return: list of recording indexes, one per threshold spec
+    """
+    if object_cache is None:
+        object_cache = ObjectCache()
+    shared_object = object_cache.has(obj, "distx")
+    distx = object_cache.get(obj, "distx", lambda: np.asarray(distx, dtype=float))
+    # same window as distx[obj_rel_start:obj_rel_end]
+    start, stop, _ = slice(obj_rel_start, obj_rel_end).indices(len(distx))
+    stop = max(start, stop)
+
+    # timegap thresholds depend on the ego speed of the event: searched in the event window.
+    # distance thresholds only depend on the object: for objects shared by several events
+    # looked up in a crossing table built once per object and distance
+    table_rows = [row for row, spec in enumerate(threshold_specs)
+                  if shared_object and isinstance(spec, DistanceThreshold) and stop > start]
+    search_rows = [row for row in range(len(threshold_specs)) if row not in table_rows]
+    first_crossings = np.full(len(threshold_specs), NOT_CROSSED, dtype=int)
+    if search_rows:
+        first_crossings[search_rows] = find_first_crossings(distx[start:stop], vego,
+                                                            [threshold_specs[row] for row in search_rows])
+    for row in table_rows:
+        distance = threshold_specs[row].distance
+        first_below = object_cache.get(obj, ("first_below", distance), lambda: first_below_table(distx, distance))
+        if first_below[start] < stop:
+            first_crossings[row] = first_below[start] - start
+    return crossings_to_indexes(first_crossings, stop - start, start_index)
+
+
+def _table_crossing_indexes(table, threshold_specs, object_cache):
+    """ event_crossing_indexes of all events of the table, array (events, threshold specs) """
+    crossings = np.zeros((len(table), len(threshold_specs)), dtype=int)
+    for i, obj in enumerate(table.objects):
+        crossings[i] = event_crossing_indexes(obj, table.distx[i], table.obj_rel_start[i], table.obj_rel_end[i],
+                                              table.vego[i], table.start_index[i], threshold_specs, object_cache)
+    return crossings
+
+
+def enum_signals(obj, object_cache=None):
+    """ enum signals of RULE_SIGNALS of an object: RleSignal for signals already encoded or long enough for
+    the encoding to pay off (cached per object), else the object's own signal (only a reference, not cached)
+    :param obj: object dict
+    :param object_cache: ObjectCache of the recording, None: encoded again on every call
+    :return: list of signals in the order of RULE_SIGNALS
+    """
+    signals = []
+    for name in RULE_SIGNALS:
+        values = obj[name]
+        if not isinstance(values, RleSignal) and len(values) >= RLE_MIN_CYCLES:
+            if object_cache is None:
+                values = RleSignal.from_dense(values)
+            else:
+                values = object_cache.get(obj, ("rle", name), lambda: RleSignal.from_dense(obj[name]))
+        signals.append(values)
+    return signals
+
+
+def analyze_approach_events(table, timestamps, tunnel_detect, rule_engine, object_cache=None, instr=None,
+                            timestamp_index=None):
+    """
+    for all events of the recording together:
+    get timestamp of Timegap4s+20m
+      if this is before object lifetime:  event not applicable   (was not stable over the time)
+    from this timestamp till end of TC
+     create slices of the respective signals:
+      -PreSelect
+      -ObstclDtct
+      -ObservedClass
+    check TunnelDetect at timestamp of Timegap4s+20m
+    check for each slice according to criteria if state given for whole slice
+
+    :param table: ApproachEventTable of the events
+    :param timestamps: timestamps of the recording
+    :param tunnel_detect: TunnelDtct of the recording
+    :param rule_engine: compiled RuleEngine of approach_rules
+    :param object_cache: ObjectCache of the recording, None: nothing shared between the events
+    :param instr: Instrumentation for timers and counters, None: not instrumented
+    :param timestamp_index: TimestampIndex of timestamps, None: built here
+    :return: EventAnalysis
+    """
+    if not len(table):
+        return EventAnalysis([], [], np.zeros(0), np.zeros(0))
+    instr = NullInstrumentation() if instr is None else instr
+    timestamps = np.asarray(timestamps)
+    tunnel_detect = np.asarray(tunnel_detect)
+    if timestamp_index is None:
+        timestamp_index = TimestampIndex(timestamps)
+
+    # get indexes of when Timegap=4s+20m ('extended PUD'), Timegap=4s ('PUD')
+    # and when object comes closer than 90m, one pass per event
+    with instr.timer("analyze.crossing_search"):
+        crossings = _table_crossing_indexes(table, [TimegapThreshold(TIMEGAP_THRESHOLD, DIST_EXT),
+                                                    TimegapThreshold(TIMEGAP_THRESHOLD, 0.0),
+                                                    DistanceThreshold(DIST_THRESHOLD)], object_cache)
+        table.ext_pud_index, table.pud_index, table.dist_index = crossings.T
+
+    with instr.timer("analyze.timestamp_lookup"):
+        timestamp_of_ext_pud = timestamps[table.ext_pud_index]
+        timestamp_of_pud = timestamps[table.pud_index]
+        timestamp_of_dist = timestamps[table.dist_index]
+
+        # TODO: this scene not applicable according to my interpretation of the requirement
+        # TODO: has to be regarded as attribute, so that it either can be counted as faild or not counted at all
+        event_applicable = timestamp_of_ext_pud != table.obj_start_time
+
+        tunnel_state_of_scene = tunnel_detect[table.ext_pud_index].tolist()
+
+        # distinguish slower and high speed approaches (e.g. 0-70 and 70-120km/h)
+        # for high speed take maximum of timestamps (equivalent to minimum of distances during an approach)
+        timestamp_of_scene_begin = scene_begin_timestamps(table.vego_at_start, timestamp_of_pud, timestamp_of_dist)
+
+        # TODO clarify if stop time good enough since after TC detector this might be not TC endtime
+        idx_of_scene_begin = timestamp_index.nearest_indexes(timestamp_of_scene_begin)
+        obj_idx_pud = idx_of_scene_begin - table.obj_start_index
+        obj_idx_tc_end = timestamp_index.nearest_indexes(table.stop_time) - table.obj_start_index
+        if instr.enabled:
+            instr.maximum("max_scene_begin_lookup_deviation",
+                          float(np.max(np.abs(timestamps[idx_of_scene_begin] - timestamp_of_scene_begin))))
+
+    results = []
+    with instr.timer("analyze.criteria"):
+        # enum signals of long-lived objects are run-length encoded once per object,
+        # their criteria are evaluated over the runs instead of the cycles
+        for i, obj in enumerate(table.objects):
+            begin, end = int(obj_idx_pud[i]), int(obj_idx_tc_end[i]) + 1
+            preselect_slice, obstacle_detect_slice, observed_class_slice = \
+                [signal[begin:end] for signal in enum_signals(obj, object_cache)]
+
+            tunnel_state = tunnel_state_of_scene[i]
+            test_result = rule_engine.evaluate(tunnel_state, preselect_slice, obstacle_detect_slice,
+                                               observed_class_slice)
+            if instr.enabled:
+                # views / run slices of the object signals, not copies
+                instr.count("bytes_sliced", nbytes(observed_class_slice) + nbytes(obstacle_detect_slice) +
+                            nbytes(preselect_slice))
+            results.append((bool(event_applicable[i]), tunnel_state, test_result))
+    return EventAnalysis(results, timestamp_of_scene_begin.tolist(), timestamp_of_ext_pud, timestamp_of_dist)
+
+
+def sweep_approach_thresholds(table, grid, timestamps, tunnel_detect, rule_engine, object_cache=None,
+                              timestamp_index=None):
+    """ analyze the events for every point of a threshold grid
+    signals, crossing search (all distinct thresholds in one pass per event) and criteria per cycle are
+    shared between the grid points, every grid point only costs a few array lookups per event
+    :param table: ApproachEventTable of the events
+    :param grid: list of ThresholdSet, see threshold_grid
+    :param timestamps: timestamps of the recording
+    :param tunnel_detect: TunnelDtct of the recording
+    :param rule_engine: compiled RuleEngine of approach_rules
+    :param object_cache: ObjectCache of the recording, None: nothing shared between the events
+    :param timestamp_index: TimestampIndex of timestamps, None: built here
+    :return: SweepResult
+    """
+    grid = list(grid)
+    timestamps = np.asarray(timestamps)
+    tunnel_detect = np.asarray(tunnel_detect)
+    if timestamp_index is None:
+        timestamp_index = TimestampIndex(timestamps)
+    if object_cache is None:
+        object_cache = ObjectCache()
+
+    # distinct crossing thresholds of the grid, grid point -> column in the crossing table
+    threshold_specs = []
+    columns = []
+    for thresholds in grid:
+        specs = (TimegapThreshold(thresholds.timegap_threshold, thresholds.dist_ext),
+                 TimegapThreshold(thresholds.timegap_threshold, 0.0),
+                 DistanceThreshold(thresholds.dist_threshold))
+        for spec in specs:
+            if spec not in threshold_specs:
+                threshold_specs.append(spec)
+        columns.append([threshold_specs.index(spec) for spec in specs])
+    ext_pud_col, pud_col, dist_col = np.array(columns, dtype=int).reshape(len(grid), 3).T
+
+    crossings = _table_crossing_indexes(table, threshold_specs, object_cache)
+    ext_pud_index = crossings[:, ext_pud_col]
+
+    # all following arrays: (events, grid points)
+    event_applicable = timestamps[ext_pud_index] != table.obj_start_time[:, np.newaxis]
+    tunnel_state_of_scene = tunnel_detect[ext_pud_index]
+    timestamp_of_pud = timestamps[crossings[:, pud_col]]
+    speed_limits = np.array([thresholds.speed_threshold / 3.6 for thresholds in grid])
+    scene_begin = np.where(table.vego_at_start[:, np.newaxis] < speed_limits[np.newaxis, :], timestamp_of_pud,
+                           np.maximum(timestamps[crossings[:, dist_col]], timestamp_of_pud))
+
+    obj_idx_begin = timestamp_index.nearest_indexes(scene_begin.ravel()).reshape(scene_begin.shape) - \
+        table.obj_start_index[:, np.newaxis]
+    obj_idx_end = timestamp_index.nearest_indexes(table.stop_time) - table.obj_start_index + 1
+
+    condition = np.zeros(scene_begin.shape, dtype=np.int8)
+    rules = rule_engine.rules
+    for i, obj in enumerate(table.objects):
+        counts = object_cache.get(obj, ("invalid_cycle_counts", id(rule_engine)),
+                                  lambda: invalid_cycle_counts(obj, rule_engine))
+        length = counts.shape[1] - 1
+        # same window as the slice obj[...][begin:end]
+        begin = _slice_bound(obj_idx_begin[i], length)
+        end = _slice_bound(np.full(len(grid), obj_idx_end[i]), length)
+        valid = (counts[:, np.maximum(begin, end)] - counts[:, begin] == 0) & (end > begin)
+        in_tunnel = tunnel_state_of_scene[i] == TUNNEL_STATE_TUNNEL
+        # first rule of the matching tunnel case wins: assign in reverse order
+        for bit in reversed(range(len(rules))):
+            condition[i, valid[bit] & (in_tunnel if rules[bit].in_tunnel else ~in_tunnel)] = bit + 1
+
+    return SweepResult(grid, table.start_index, event_applicable, tunnel_state_of_scene, scene_begin, condition,
+                       (None,) + tuple(rule_engine.conditions))
+
+
+def _slice_bound(idx, length):
+    """ python slice semantics for an array of slice bounds """
+    return np.where(idx < 0, np.maximum(idx + length, 0), np.minimum(idx, length))
+
+
+def invalid_cycle_counts(obj, rule_engine):
+    """ cumulated number of cycles each rule is violated, array (rules, cycles + 1)
+    number of violations in obj cycles [begin:end] is counts[:, end] - counts[:, begin]
+    :param obj: object dict with the RULE_SIGNALS
+    :param rule_engine: compiled RuleEngine of approach_rules
+    :return: int array
+    """
+    cycle_masks = rule_engine.cycle_masks(obj[PRESELECT], obj[OBSTACLE_DETECT], obj[OBSERVED_CLASS])
+    bits = np.arange(len(rule_engine.rules), dtype=cycle_masks.dtype)
+    violated = (cycle_masks[np.newaxis, :] >> bits[:, np.newaxis]) & 1 == 0
+    counts = np.zeros((len(bits), len(cycle_masks) + 1), dtype=int)
+    np.cumsum(violated, axis=1, out=counts[:, 1:])
+    return counts
@@ -0,0 +1,192 @@
+"""
+approach_export.py
+-------------------
+
+append-only columnar export of the per event approach results
+
+every column of RESULT_DTYPE is stored in its own file (<path>.<column>) as plain little endian values
+without header, so a column is opened zero-copy with numpy.memmap and scanned contiguously without
+reading the other columns. a json sidecar (<path>.json) keeps the format version, the column dtypes,
+the recording names (index = recording_id) and the condition names (index = condition code).
+the sidecar is rewritten before a new recording id is written, so the ids in the columns are always resolvable.
+usage:
+    columns, meta = open_results("approach_results")
+    rates = np.bincount(columns["condition"], minlength=len(meta["condition_names"]))
+
+
+:author:        Sahajhaksh Hariharan
+
+"""
+# ====================================================================
+# Imports
+# ====================================================================
+import os
+import json
+
+import numpy as np
+
+# ====================================================================
+# Imports - Local
+# ====================================================================
+from fct.acc.acc_performance.approach_core import CONDITION_NAMES
+
+# ====================================================================
+# Global Constant Declarations
+# ====================================================================
+EXPORT_FORMAT_VERSION = 2
+SIDECAR_EXT = ".json"
+
+# value of tunnel_state / scene_begin if not known (error events)
+UNKNOWN = -1
+
+# one column file per field
+RESULT_DTYPE = np.dtype([('recording_id', '<u4'),
+                         ('start_index', '<i8'),
+                         ('stop_index', '<i8'),
+                         ('scene_begin', '<i8'),
+                         ('tunnel_state', '<i1'),
+                         ('applicable', '<u1'),
+                         ('condition', '<u1')])
+
+#############################################################################
+
+
+# =============================================================================
+# Class
+# =============================================================================
+class ApproachResultWriter(object):
+    def __init__(self, path, condition_names=CONDITION_NAMES):
+        """ Class initialisation, an existing export is continued.
+        @Param path:   base path of the export, column files and sidecar are written next to it
+        @Param condition_names:   condition per code, code 0 (None) is no condition met
+        """
+        self.__path = path
+        self.__recordings = []
+        self.__recording_ids = {}
+        self.__condition_codes = dict((name, code) for code, name in enumerate(condition_names))
+        self.__condition_names = list(condition_names)
+        if os.path.exists(path + SIDECAR_EXT):
+            meta = read_sidecar(path)
+            if meta["condition_names"] != self.__condition_names:
+                raise ValueError("export %s was written with conditions %s" % (path, meta["condition_names"]))
+            self.__recordings = meta["recordings"]
+            self.__recording_ids = dict((name, rec_id) for rec_id, name in enumerate(self.__recordings))
+            self._truncate_partial()
+        elif any(os.path.exists(column_path(path, name)) and os.path.getsize(column_path(path, name))
+                 for name in RESULT_DTYPE.names):
+            raise ValueError("export %s has no sidecar %s" % (path, path + SIDECAR_EXT))
+        self._write_sidecar()
+        self.__files = [open(column_path(path, name), "ab") for name in RESULT_DTYPE.names]
+
+    @property
+    def path(self):
+        return self.__path
+
+    def _truncate_partial(self):
+        """ drop the records of an interrupted run that did not reach all columns """
+        counts = [column_count(self.__path, name) for name in RESULT_DTYPE.names]
+        for name, count in zip(RESULT_DTYPE.names, counts):
+            file_path = column_path(self.__path, name)
+            size = min(counts) * RESULT_DTYPE[name].itemsize
+            if os.path.exists(file_path) and os.path.getsize(file_path) != size:
+                with open(file_path, "r+b") as column_file:
+                    column_file.truncate(size)
+        if min(counts):
+            recording_ids = np.memmap(column_path(self.__path, "recording_id"), dtype=RESULT_DTYPE["recording_id"],
+                                      mode='r', shape=(min(counts),))
+            if int(recording_ids.max()) >= len(self.__recordings):
+                raise ValueError("export %s has recording ids missing in its sidecar" % self.__path)
+
+    def recording_id(self, recording):
+        """ id of a recording, new recordings get the next free id and are written to the sidecar at once """
+        recording = str(recording)
+        rec_id = self.__recording_ids.get(recording)
+        if rec_id is None:
+            rec_id = self.__recording_ids[recording] = len(self.__recordings)
+            self.__recordings.append(recording)
+            self._write_sidecar()
+        return rec_id
+
+    def append(self, recording, start_index, stop_index, scene_begin, tunnel_state, applicable, condition):
+        """ append the results of the events of one recording, one entry per event in every argument
+        :param recording: recording name
+        :param start_index: event start indexes
+        :param stop_index: event stop indexes
+        :param scene_begin: scene begin timestamps, None if unknown
+        :param tunnel_state: tunnel state of scene, None if unknown
+        :param applicable: event applicability
+        :param condition: condition name or None
+        :return: number of written records
+        """
+        if not len(start_index):
+            return 0
+        columns = {'recording_id': [self.recording_id(recording)] * len(start_index),
+                   'start_index': start_index,
+                   'stop_index': stop_index,
+                   'scene_begin': [UNKNOWN if value is None else value for value in scene_begin],
+                   'tunnel_state': [UNKNOWN if value is None else value for value in tunnel_state],
+                   'applicable': [bool(value) for value in applicable],
+                   'condition': [self.__condition_codes[name] for name in condition]}
+        for name, column_file in zip(RESULT_DTYPE.names, self.__files):
+            column_file.write(np.asarray(columns[name], dtype=RESULT_DTYPE[name]).tobytes())
+        return len(start_index)
+
+    def flush(self):
+        """ write the buffered records """
+        for column_file in self.__files:
+            column_file.flush()
+
+    def close(self):
+        for column_file in self.__files:
+            column_file.close()
+
+    def _write_sidecar(self):
+        tmp_path = self.__path + SIDECAR_EXT + ".tmp"
+        with open(tmp_path, "w") as out:
+            json.dump({"version": EXPORT_FORMAT_VERSION, "dtype": RESULT_DTYPE.descr,
+                       "recordings": self.__recordings, "condition_names": self.__condition_names}, out, indent=1)
+        if os.path.exists(self.__path + SIDECAR_EXT):
+            # os.rename does not replace on windows
+            os.remove(self.__path + SIDECAR_EXT)
+        os.rename(tmp_path, self.__path + SIDECAR_EXT)
+
+
+# =============================================================================
+# Functions
+# =============================================================================
+def column_path(path, name):
+    """ file of one result column """
+    return "%s.%s" % (path, name)
+
+
+def column_count(path, name):
+    """ number of complete values in a column file """
+    if not os.path.exists(column_path(path, name)):
+        return 0
+    return os.path.getsize(column_path(path, name)) // RESULT_DTYPE[name].itemsize
+
+
+def read_sidecar(path):
+    """ meta data of an export: dict with version, dtype, recordings and condition_names """
+    with open(path + SIDECAR_EXT) as sidecar:
+        meta = json.load(sidecar)
+    if meta.get("version") != EXPORT_FORMAT_VERSION:
+        raise ValueError("unsupported export format version %s" % str(meta.get("version")))
+    return meta
+
+
+def open_results(path):
+    """ open the columns of an export zero-copy
+    :param path: base path of the export
+    :return: (dict {column name: read-only array}, sidecar meta data)
+    """
+    meta = read_sidecar(path)
+    # columns of an export being written can be ahead of each other by a partial append
+    count = min(column_count(path, name) for name in RESULT_DTYPE.names)
+    columns = {}
+    for name in RESULT_DTYPE.names:
+        if count:
+            columns[name] = np.memmap(column_path(path, name), dtype=RESULT_DTYPE[name], mode='r', shape=(count,))
+        else:
+            columns[name] = np.zeros(0, dtype=RESULT_DTYPE[name])
+    return columns, meta
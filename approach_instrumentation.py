@@ -0,0 +1,123 @@
+"""
+approach_instrumentation.py
+-------------------
+
+opt-in timers and counters for the approach analyzer
+
+Instrumentation collects wall time per phase and counters, NullInstrumentation is the
+disabled variant with no-op methods, so instrumented code does not need any checks.
+
+
+:author:        Sahajhaksh Hariharan
+
+"""
+# ====================================================================
+# Imports
+# ====================================================================
+import json
+from timeit import default_timer
+
+#############################################################################
+
+
+# =============================================================================
+# Class
+# =============================================================================
+class _PhaseTimer(object):
+    """ context manager adding the elapsed time of its block to a phase """
+    __slots__ = ('__timers', '__phase', '__start')
+
+    def __init__(self, timers, phase):
+        self.__timers = timers
+        self.__phase = phase
+        self.__start = None
+
+    def __enter__(self):
+        self.__start = default_timer()
+        return self
+
+    def __exit__(self, exc_type, exc_value, tb):
+        elapsed = default_timer() - self.__start
+        entry = self.__timers.get(self.__phase)
+        if entry is None:
+            self.__timers[self.__phase] = [1, elapsed]
+        else:
+            entry[0] += 1
+            entry[1] += elapsed
+        return False
+
+
+class _NullTimer(object):
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, tb):
+        return False
+
+
+class Instrumentation(object):
+    enabled = True
+
+    def __init__(self):
+        """ Class initialisation. """
+        # phase -> [calls, total time in s]
+        self.__timers = {}
+        self.__counters = {}
+
+    def timer(self, phase):
+        """ context manager timing the enclosed block as phase """
+        return _PhaseTimer(self.__timers, phase)
+
+    def count(self, name, value=1):
+        """ add value to counter name """
+        self.__counters[name] = self.__counters.get(name, 0) + value
+
+    def maximum(self, name, value):
+        """ keep the maximum of value in counter name """
+        self.__counters[name] = max(self.__counters.get(name, value), value)
+
+    def total_time(self, phase):
+        return self.__timers.get(phase, [0, 0.0])[1]
+
+    def summary(self):
+        """ dict with timers, counters and the event rate """
+        process_time = self.total_time("ProcessData")
+        events = self.__counters.get("events", 0)
+        return {"timers": dict((phase, {"calls": calls, "total_s": total, "mean_s": total / calls})
+                               for phase, (calls, total) in self.__timers.items()),
+                "counters": dict(self.__counters),
+                "events_per_second": events / process_time if process_time else None}
+
+    def export(self, path):
+        """ write the summary as json file """
+        with open(path, "w") as out:
+            json.dump(self.summary(), out, indent=1, sort_keys=True)
+
+
+class NullInstrumentation(object):
+    """ disabled instrumentation, all methods are no-ops """
+    enabled = False
+    __null_timer = _NullTimer()
+
+    def timer(self, phase):
+        return self.__null_timer
+
+    def count(self, name, value=1):
+        pass
+
+    def maximum(self, name, value):
+        pass
+
+    def summary(self):
+        return {}
+
+    def export(self, path):
+        pass
+
+
+def nbytes(values):
+    """ size of a signal slice in [byte], lists are counted with one pointer per element """
+    size = getattr(values, "nbytes", None)
+    return size if size is not None else 8 * len(values)
@@ -0,0 +1,142 @@
+"""
+approach_object_cache.py
+-------------------
+
+per recording memoization of the derived data of event objects
+
+several approach events of a recording often share the same tracked object. ObjectCache keeps per object
+(keyed by identity and "Index") the values derived from it: array views of the signals, encoded enum signals,
+crossing tables, ..., so later events of the same object reuse them. the cache is cleared per recording,
+its size is capped by evicting the least recently used objects.
+usage:
+    distx = cache.get(obj, "distx", lambda: np.asarray(obj[sd.OBJ_DISTX], dtype=float))
+
+
+:author:        Sahajhaksh Hariharan
+
+"""
+# ====================================================================
+# Imports
+# ====================================================================
+from collections import OrderedDict
+
+import numpy as np
+
+# ====================================================================
+# Global Constant Declarations
+# ====================================================================
+DEFAULT_MAX_SIZE = 256 * 1024 * 1024  # [byte]
+
+#############################################################################
+
+
+# =============================================================================
+# Class
+# =============================================================================
+class ObjectCache(object):
+    def __init__(self, max_size=DEFAULT_MAX_SIZE):
+        """ Class initialisation.
+        @Param max_size:   size limit of the cached values in [byte]
+        """
+        self.__max_size = max_size
+        # (id, Index) -> [object, {name: value}, size], in order of last use
+        self.__entries = OrderedDict()
+        self.__size = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self.__entries)
+
+    @property
+    def size(self):
+        """ size of the cached values in [byte] """
+        return self.__size
+
+    @staticmethod
+    def _key(obj):
+        return id(obj), obj["Index"]
+
+    def has(self, obj, name):
+        """ True if value name of obj is cached (does not count as request) """
+        entry = self.__entries.get(self._key(obj))
+        return entry is not None and name in entry[1]
+
+    def get(self, obj, name, build):
+        """ value name derived from obj, built with build() on first request
+        :param obj: event object
+        :param name: name of the derived value
+        :param build: callable without arguments returning the value
+        :return: value
+        """
+        key = self._key(obj)
+        entry = self.__entries.get(key)
+        if entry is not None and name in entry[1]:
+            self.hits += 1
+            # move to the end: most recently used
+            del self.__entries[key]
+            self.__entries[key] = entry
+            return entry[1][name]
+
+        self.misses += 1
+        value = build()
+        if entry is None:
+            # the object is kept referenced, so its id can not be reused while it is cached
+            entry = self.__entries[key] = [obj, {}, 0]
+        else:
+            del self.__entries[key]
+            self.__entries[key] = entry
+        entry[1][name] = value
+        value_size = value_nbytes(value)
+        entry[2] += value_size
+        self.__size += value_size
+        self._evict(keep=key)
+        return value
+
+    def _evict(self, keep):
+        while self.__size > self.__max_size and len(self.__entries) > 1:
+            key = next(iter(self.__entries))
+            if key == keep:
+                break
+            self.__size -= self.__entries.pop(key)[2]
+            self.evictions += 1
+
+    def clear(self):
+        """ drop all entries (end of recording), the statistics are kept """
+        self.__entries.clear()
+        self.__size = 0
+
+    def stats(self):
+        """ dict with hits, misses, hit rate, evictions and current size """
+        requests = self.hits + self.misses
+        return {"hits": self.hits, "misses": self.misses, "evictions": self.evictions,
+                "hit_rate": float(self.hits) / requests if requests else None,
+                "entries": len(self.__entries), "size": self.__size}
+
+
+# =============================================================================
+# Functions
+# =============================================================================
+def value_nbytes(value):
+    """ approximate size of a cached value in [byte]
+    lists and tuples count their item references only (8 byte each, the items are not visited),
+    so a signal list costs no python loop over its values
+    """
+    if isinstance(value, (list, tuple)):
+        return 8 * len(value)
+    size = getattr(value, "nbytes", None)
+    return size if size is not None else 8
+
+
+def first_below_table(values, limit):
+    """ per position the first position at or after it with a value below limit, len(values) if none
+    the first crossing within values[start:stop] is then table[start] if table[start] < stop
+    :param values: signal (e.g. object distance)
+    :param limit: threshold
+    :return: int array with the length of values
+    """
+    values = np.asarray(values)
+    positions = np.where(values < limit, np.arange(len(values)), len(values))
+    # running minimum from the end
+    return np.minimum.accumulate(positions[::-1])[::-1]
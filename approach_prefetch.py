@@ -0,0 +1,187 @@
+"""
+approach_prefetch.py
+-------------------
+
+double buffered prefetch of the recording data ports for the approach analyzer
+
+RecordingPrefetcher loads (decodes) the ports of the next recordings in a background thread while the
+current recording is analyzed. the buffer is bounded by depth: at most depth loaded recordings wait
+in the queue, plus the one the thread is loading. cancel() stops the thread after its current load.
+
+usage:
+    prefetcher = RecordingPrefetcher(my_loader, recordings, depth=1, materialize=my_materialize)
+    data_manager.SetDataPort(PREFETCH_PORT_NAME, prefetcher, bus_name)
+    # ApproachAnalyzer441.LoadData publishes the ports of the next recording on the bus,
+    # PreTerminate cancels the prefetcher
+
+the loader is called with a recording and returns a dict {port name: value} of the bus ports,
+materialize (optional) is called with that dict in the background thread, e.g. to read lazily decoded signals.
+
+
+:author:        Sahajhaksh Hariharan
+
+"""
+# ====================================================================
+# Imports
+# ====================================================================
+import threading
+import traceback
+from collections import namedtuple
+
+try:
+    import queue
+except ImportError:
+    # python 2
+    import Queue as queue
+
+# ====================================================================
+# Global Constant Declarations
+# ====================================================================
+DEFAULT_DEPTH = 1
+# interval in [s] the background thread checks for cancellation while the buffer is full
+_POLL_INTERVAL = 0.1
+
+# ports of one recording, error is the traceback text if loading failed
+PrefetchedRecording = namedtuple('PrefetchedRecording', ['recording', 'ports', 'error'])
+
+#############################################################################
+
+
+class PrefetchError(StandardError):
+    """ loading a prefetched recording failed, or the prefetcher got out of sync or cancelled """
+    pass
+
+
+# =============================================================================
+# Class
+# =============================================================================
+class RecordingPrefetcher(object):
+    def __init__(self, loader, recordings, depth=DEFAULT_DEPTH, materialize=None):
+        """ Class initialisation, the background thread is started with start() or on first next().
+        @Param loader:   callable, loader(recording) -> dict {port name: value}
+        @Param recordings:   recordings in the order they get analyzed
+        @Param depth:   number of loaded recordings buffered ahead of the analysis
+        @Param materialize:   optional callable materialize(ports), run in the background thread after loading
+        """
+        if depth < 1:
+            raise ValueError("depth has to be at least 1")
+        self.__loader = loader
+        self.__recordings = list(recordings)
+        self.__materialize = materialize
+        self.__queue = queue.Queue(maxsize=depth)
+        self.__cancel = threading.Event()
+        self.__thread = None
+        self.__consumed = 0
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, tb):
+        self.cancel()
+        return False
+
+    @property
+    def cancelled(self):
+        return self.__cancel.is_set()
+
+    @property
+    def remaining(self):
+        """ number of recordings not yet taken with next() """
+        return len(self.__recordings) - self.__consumed
+
+    def start(self):
+        """ start loading in the background, no-op if already started """
+        if self.__thread is None:
+            self.__thread = threading.Thread(target=self._run, name="RecordingPrefetcher")
+            self.__thread.daemon = True
+            self.__thread.start()
+
+    def _run(self):
+        for rec in self.__recordings:
+            if self.__cancel.is_set():
+                return
+            try:
+                ports = self.__loader(rec)
+                if self.__materialize is not None:
+                    self.__materialize(ports)
+                item = PrefetchedRecording(rec, ports, None)
+            except Exception:
+                item = PrefetchedRecording(rec, None, traceback.format_exc())
+            while not self.__cancel.is_set():
+                try:
+                    self.__queue.put(item, timeout=_POLL_INTERVAL)
+                    break
+                except queue.Full:
+                    continue
+
+    def next(self):
+        """ ports of the next recording, blocks until it is loaded
+        :return: PrefetchedRecording
+        """
+        if self.__cancel.is_set():
+            raise PrefetchError("prefetcher cancelled")
+        if not self.remaining:
+            raise StopIteration
+        self.start()
+        item = self.__queue.get()
+        self.__consumed += 1
+        return item
+
+    __next__ = next
+
+    def __iter__(self):
+        return self
+
+    def load(self, recording=None):
+        """ ports of the next recording, raising PrefetchError if loading failed
+        :param recording: expected recording, None: do not check the order
+        :return: dict {port name: value}
+        """
+        if not self.remaining:
+            raise PrefetchError("no recordings left to prefetch")
+        item = self.next()
+        if recording is not None and item.recording != recording:
+            raise PrefetchError("prefetched %s, expected %s" % (item.recording, recording))
+        if item.error is not None:
+            raise PrefetchError("loading %s failed:\n%s" % (item.recording, item.error))
+        return item.ports
+
+    def cancel(self):
+        """ stop the background thread and drop the buffered recordings """
+        self.__cancel.set()
+        if self.__thread is not None:
+            # drain so a put blocked on the full buffer returns
+            while self.__thread.is_alive():
+                self._drain()
+                self.__thread.join(_POLL_INTERVAL)
+            self.__thread = None
+        self._drain()
+
+    def _drain(self):
+        try:
+            while True:
+                self.__queue.get_nowait()
+        except queue.Empty:
+            pass
+
+
+# =============================================================================
+# Functions
+# =============================================================================
+def materialize_event_objects(events, signal_names):
+    """ read the given object signals of all event objects, so lazily decoded signals are loaded
+    :param events: ACC events
+    :param signal_names: object signal names
+    """
+    seen = set()
+    for ev in events or []:
+        obj = ev.GetEventObject().get_object()
+        if id(obj) in seen:
+            continue
+        seen.add(id(obj))
+        for name in signal_names:
+            signal = obj[name]
+            materialize = getattr(signal, "materialize", None)
+            if materialize is not None:
+                materialize()
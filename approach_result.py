@@ -0,0 +1,130 @@
+"""
+approach_result.py
+-------------------
+
+compact approach result record attached to an event
+
+ApproachResult holds the result of one approach event in three slots (applicability, tunnel state,
+condition code). by default the event gets the three generic attributes event_applicable,
+tunnel_state_of_scene and stat_approach_condition the report code reads, as before. campaigns whose
+reports read the record attach it as the only attribute (RESULT_ATTRIBUTE_NAME) instead.
+the condition is kept as small int code (index in CONDITION_NAMES), the legacy values stay readable by name:
+    result = ApproachResult(True, 0, 'A')
+    result['stat_approach_condition']  # 'A'
+    for name, value, unit, type_string in result.attributes(): ...
+
+
+:author:        Sahajhaksh Hariharan
+
+"""
+# ====================================================================
+# Imports - Local
+# ====================================================================
+from fct.acc.acc_performance.approach_core import CONDITION_NAMES
+
+# ====================================================================
+# Global Constant Declarations
+# ====================================================================
+# event attribute holding the ApproachResult
+RESULT_ATTRIBUTE_NAME = 'approach_result'
+
+# condition codes, index in CONDITION_NAMES
+CONDITION_NONE, CONDITION_A, CONDITION_B, CONDITION_C, CONDITION_D, CONDITION_E = range(len(CONDITION_NAMES))
+CONDITION_CODES = dict((name, code) for code, name in enumerate(CONDITION_NAMES))
+
+# legacy event attributes: (name, slot, unit, type string)
+LEGACY_ATTRIBUTES = (('event_applicable', 'applicable', '', 'boolean'),
+                     ('tunnel_state_of_scene', 'tunnel_state', '', 'int'),
+                     ('stat_approach_condition', 'condition', '', 'string'))
+_LEGACY_SLOTS = dict((name, slot) for name, slot, _, _ in LEGACY_ATTRIBUTES)
+
+#############################################################################
+
+
+# =============================================================================
+# Class
+# =============================================================================
+class ApproachResult(object):
+    __slots__ = ('applicable', 'tunnel_state', 'condition_code')
+
+    def __init__(self, applicable, tunnel_state, condition=None):
+        """ Class initialisation.
+        @Param applicable:   event applicability
+        @Param tunnel_state:   TunnelDtct state at begin of scene, None if unknown (error events)
+        @Param condition:   met condition 'A'..'E' or None
+        """
+        self.applicable = applicable
+        self.tunnel_state = tunnel_state
+        self.condition_code = CONDITION_CODES[condition]
+
+    @property
+    def condition(self):
+        """ met condition 'A'..'E' or None """
+        return CONDITION_NAMES[self.condition_code]
+
+    def __getitem__(self, name):
+        """ value of a legacy attribute, e.g. result['stat_approach_condition'] """
+        try:
+            return getattr(self, _LEGACY_SLOTS[name])
+        except KeyError:
+            raise KeyError("no approach result attribute %s" % name)
+
+    def get(self, name, default=None):
+        """ value of a legacy attribute, default for other names """
+        if name not in _LEGACY_SLOTS:
+            return default
+        return self[name]
+
+    def attributes(self):
+        """ legacy attributes as list of (name, value, unit, type string), the AddAttribute arguments """
+        return [(name, getattr(self, slot), unit, type_string) for name, slot, unit, type_string in LEGACY_ATTRIBUTES]
+
+    def to_tuple(self):
+        """ (event_applicable, tunnel_state_of_scene, condition) """
+        return self.applicable, self.tunnel_state, self.condition
+
+    def __reduce__(self):
+        # compact pickle (no slot names), also for pickle protocols < 2
+        return _from_codes, (self.applicable, self.tunnel_state, self.condition_code)
+
+    def __eq__(self, other):
+        if not isinstance(other, ApproachResult):
+            return NotImplemented
+        return (self.applicable, self.tunnel_state, self.condition_code) == \
+            (other.applicable, other.tunnel_state, other.condition_code)
+
+    def __ne__(self, other):
+        result = self.__eq__(other)
+        return result if result is NotImplemented else not result
+
+    __hash__ = None
+
+    def __repr__(self):
+        return "ApproachResult(%r, %r, %r)" % self.to_tuple()
+
+
+# result of events with testcase error, shared by all of them (not to be modified)
+ERROR_RESULT = ApproachResult(False, None)
+
+
+# =============================================================================
+# Functions
+# =============================================================================
+def _from_codes(applicable, tunnel_state, condition_code):
+    result = ApproachResult(applicable, tunnel_state)
+    result.condition_code = condition_code
+    return result
+
+
+def attach_result(event, result, legacy_attributes=True):
+    """ attach an ApproachResult to the event, either as the three legacy attributes or as one record
+    :param event: ACC event
+    :param result: ApproachResult
+    :param legacy_attributes: True: the three legacy attributes (read by the existing reports),
+                              False: the record as only attribute
+    """
+    if not legacy_attributes:
+        event.AddAttribute(RESULT_ATTRIBUTE_NAME, result, '', 'object')
+        return
+    for name, value, unit, type_string in result.attributes():
+        event.AddAttribute(name, value, unit, type_string)
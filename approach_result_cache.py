@@ -0,0 +1,120 @@
+"""
+approach_result_cache.py
+-------------------
+
+on-disk cache for per recording approach analysis results
+
+entries are pickled files named by their key (content hash of the analyzer inputs),
+the cache directory is kept below a size limit by evicting the least recently used entries.
+
+
+:author:        Sahajhaksh Hariharan
+
+"""
+# ====================================================================
+# Imports
+# ====================================================================
+import os
+import pickle
+import tempfile
+from collections import OrderedDict
+
+# ====================================================================
+# Global Constant Declarations
+# ====================================================================
+CACHE_FILE_EXT = ".pkl"
+DEFAULT_MAX_SIZE = 1024 * 1024 * 1024  # [byte]
+
+#############################################################################
+
+
+# =============================================================================
+# Class
+# =============================================================================
+class ApproachResultCache(object):
+    def __init__(self, cache_dir, max_size=DEFAULT_MAX_SIZE):
+        """ Class initialisation.
+        @Param cache_dir:   directory of the cache files, created if not existing
+        @Param max_size:   size limit of all cache files in [byte]
+        """
+        self.__cache_dir = cache_dir
+        self.__max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        if not os.path.isdir(cache_dir):
+            os.makedirs(cache_dir)
+        # key -> file size, least recently used first
+        self.__entries = OrderedDict()
+        # modification time is the time of last use (get touches the file on a hit)
+        files = [(os.stat(os.path.join(cache_dir, f)), f) for f in os.listdir(cache_dir)
+                 if f.endswith(CACHE_FILE_EXT)]
+        for stat, name in sorted(files, key=lambda entry: (entry[0].st_mtime, entry[1])):
+            self.__entries[name[:-len(CACHE_FILE_EXT)]] = stat.st_size
+        self.__size = sum(self.__entries.values())
+
+    def _path(self, key):
+        return os.path.join(self.__cache_dir, key + CACHE_FILE_EXT)
+
+    def _touch(self, key):
+        self.__entries[key] = self.__entries.pop(key)
+        os.utime(self._path(key), None)
+
+    def get(self, key):
+        """ return the cached value for key, None on a miss """
+        if key in self.__entries:
+            try:
+                with open(self._path(key), "rb") as cache_file:
+                    value = pickle.load(cache_file)
+            except (IOError, OSError, EOFError, pickle.UnpicklingError):
+                # removed by another process or incomplete, treat as miss
+                self.__size -= self.__entries.pop(key)
+            else:
+                self._touch(key)
+                self.hits += 1
+                return value
+        self.misses += 1
+        return None
+
+    def put(self, key, value):
+        """ store value for key and evict least recently used entries above the size limit """
+        # write to a temporary file first, so concurrent readers never see a partial entry
+        fd, tmp_path = tempfile.mkstemp(dir=self.__cache_dir, suffix=".tmp")
+        with os.fdopen(fd, "wb") as cache_file:
+            pickle.dump(value, cache_file, pickle.HIGHEST_PROTOCOL)
+        if os.path.exists(self._path(key)):
+            os.remove(self._path(key))
+        os.rename(tmp_path, self._path(key))
+
+        self.__size -= self.__entries.pop(key, 0)
+        self.__entries[key] = os.path.getsize(self._path(key))
+        self.__size += self.__entries[key]
+        self._evict()
+
+    def _evict(self):
+        while self.__size > self.__max_size and len(self.__entries) > 1:
+            key, size = self.__entries.popitem(last=False)
+            self.__size -= size
+            self.evictions += 1
+            try:
+                os.remove(self._path(key))
+            except OSError:
+                pass
+
+    def __len__(self):
+        return len(self.__entries)
+
+    def __contains__(self, key):
+        return key in self.__entries
+
+    @property
+    def size(self):
+        """ size of all cache files in [byte] """
+        return self.__size
+
+    def stats(self):
+        """ return dict with hit/miss/eviction counters """
+        lookups = self.hits + self.misses
+        return {"hits": self.hits, "misses": self.misses, "evictions": self.evictions, "entries": len(self),
+                "size": self.__size, "hit_rate": float(self.hits) / lookups if lookups else 0.0}
@@ -0,0 +1,124 @@
+"""
+approach_rle.py
+-------------------
+
+run-length encoded storage for object enum signals
+
+enum signals like DTR_ObjPreSelect, DTR_Obj_ObstclDtct or Observed_Class only change state a few times
+over the object lifetime. RleSignal keeps one (start, value) entry per run, slicing is a binary search
+over the run starts, the dense per cycle array is only built on demand.
+
+
+:author:        Sahajhaksh Hariharan
+
+"""
+# ====================================================================
+# Imports
+# ====================================================================
+import numpy as np
+
+#############################################################################
+
+
+# =============================================================================
+# Class
+# =============================================================================
+class RleSignal(object):
+    __slots__ = ('__starts', '__values', '__length')
+
+    def __init__(self, run_starts, run_values, length):
+        """ Class initialisation.
+        @Param run_starts:   first cycle of each run, ascending, starting with 0
+        @Param run_values:   value of each run
+        @Param length:   number of cycles of the signal
+        """
+        self.__starts = np.asarray(run_starts, dtype=np.int64)
+        self.__values = np.asarray(run_values)
+        self.__length = length
+
+    @classmethod
+    def from_dense(cls, values):
+        """ encode a per cycle signal (list or array), RleSignal is returned as it is """
+        if isinstance(values, RleSignal):
+            return values
+        values = np.asarray(values)
+        if not len(values):
+            return cls(np.zeros(0, dtype=np.int64), values, 0)
+        run_starts = np.concatenate(([0], np.flatnonzero(values[1:] != values[:-1]) + 1))
+        return cls(run_starts, values[run_starts], len(values))
+
+    def __len__(self):
+        return self.__length
+
+    @property
+    def run_values(self):
+        """ value of each run """
+        return self.__values
+
+    @property
+    def run_starts(self):
+        """ first cycle of each run """
+        return self.__starts
+
+    @property
+    def run_lengths(self):
+        """ number of cycles of each run """
+        return np.diff(np.append(self.__starts, self.__length))
+
+    @property
+    def nbytes(self):
+        return self.__starts.nbytes + self.__values.nbytes
+
+    def iterruns(self):
+        """ iterate over (start, stop, value) of the runs """
+        stops = np.append(self.__starts[1:], self.__length)
+        for start, stop, value in zip(self.__starts, stops, self.__values):
+            yield int(start), int(stop), value
+
+    def _run_of(self, idx):
+        return np.searchsorted(self.__starts, idx, side='right') - 1
+
+    def __getitem__(self, key):
+        """ value of a cycle, or RleSignal of a slice (python slice semantics, step 1 only) """
+        if isinstance(key, slice):
+            start, stop, step = key.indices(self.__length)
+            if step != 1:
+                raise ValueError("RleSignal slicing only supports step 1")
+            if stop <= start:
+                return RleSignal(np.zeros(0, dtype=np.int64), self.__values[:0], 0)
+            first, last = self._run_of(start), self._run_of(stop - 1)
+            run_starts = self.__starts[first:last + 1] - start
+            run_starts[0] = 0
+            return RleSignal(run_starts, self.__values[first:last + 1], stop - start)
+
+        if key < 0:
+            key += self.__length
+        if not 0 <= key < self.__length:
+            raise IndexError("RleSignal index out of range")
+        return self.__values[self._run_of(key)]
+
+    def __iter__(self):
+        return iter(self.to_array())
+
+    def to_array(self):
+        """ expand to the dense per cycle array """
+        return np.repeat(self.__values, self.run_lengths)
+
+    def __array__(self, dtype=None, copy=None):
+        return np.asarray(self.to_array(), dtype=dtype)
+
+    def tolist(self):
+        return self.to_array().tolist()
+
+    def __eq__(self, other):
+        if not isinstance(other, RleSignal):
+            return NotImplemented
+        return self.__length == other.__length and np.array_equal(self.__starts, other.__starts) and \
+            np.array_equal(self.__values, other.__values)
+
+    def __ne__(self, other):
+        result = self.__eq__(other)
+        return result if result is NotImplemented else not result
+
+    def __repr__(self):
+        return "RleSignal(%d cycles, %d runs)" % (self.__length, len(self.__starts))
@@ -0,0 +1,203 @@
+"""
+approach_rules.py
+-------------------
+
+declarative rule table for the approach testcase conditions and its compiled lookup-table engine
+
+a rule names the condition, the tunnel case it applies to and per object signal the allowed
+and/or forbidden enum values, which have to hold for every cycle of the scene.
+RuleEngine compiles the table into one lookup table per signal: enum value -> bitmask of the rules
+the value is compatible with. a cycle costs one lookup per signal, a scene is the AND over its cycles.
+since AND is associative the signals can be reduced independently (or over runs instead of cycles).
+
+new testcase variants or conditions are added as rule table entries, e.g.:
+    rules = default_rules() + [Rule('F', True, {OBSTACLE_DETECT: (acc_gd.DTR_OBJ_OBSTCLDETECT_OBSTACLE,)}, {})]
+    engine = RuleEngine(rules)
+
+
+:author:        Sahajhaksh Hariharan
+
+"""
+# ====================================================================
+# Imports
+# ====================================================================
+from collections import namedtuple
+
+import numpy as np
+
+# ====================================================================
+# Imports - Local
+# ====================================================================
+# object signals the rules refer to (PRESELECT, OBSTACLE_DETECT, OBSERVED_CLASS), also importable from here
+from fct.acc.acc_performance.approach_core import TUNNEL_STATE_TUNNEL, PRESELECT, OBSTACLE_DETECT, OBSERVED_CLASS, \
+    RULE_SIGNALS
+
+# ====================================================================
+# Global Constant Declarations
+# ====================================================================
+# condition: name of the condition, in_tunnel: rule applies if TunnelDetect == 2 (True) or != 2 (False)
+# allowed / forbidden: dict signal name -> enum values, unconstrained signals are left out
+Rule = namedtuple('Rule', ['condition', 'in_tunnel', 'allowed', 'forbidden'])
+
+MASK_DTYPE = np.uint32
+# minimum lookup table size, all values of the usual 8 bit enums are looked up without range handling
+MIN_LUT_SIZE = 256
+
+#############################################################################
+
+
+def default_rules():
+    """ rule table of the 441 approach testcase, conditions A-E in priority order """
+    # enum definitions only imported here, the engine itself does not depend on the framework
+    import fct.acc.common.acc_global_defs as acc_gd
+    invalid_classes = (acc_gd.DTR_OBSERVED_CLASS_GUARDRAIL, acc_gd.DTR_OBSERVED_CLASS_CURVEENTRY,
+                       acc_gd.DTR_OBSERVED_CLASS_UNKNOWN)
+    return [
+        # A) TunnelDetect != 2 and ObjPreSelect = FIRST EGO for whole scene
+        Rule('A', False, {PRESELECT: (acc_gd.DTR_OBJECT_PRESELECT_FIRST_EGO_LANE,)}, {}),
+        # B) ObstclDtct = Obstacle and not Observed_Class in (Guardrail, Curve_Entry, Unknown)
+        Rule('B', False, {OBSTACLE_DETECT: (acc_gd.DTR_OBJ_OBSTCLDETECT_OBSTACLE,)},
+             {OBSERVED_CLASS: invalid_classes}),
+        # C) ObstclDtct in (Probably_Underdrivable, Probably_Overdrivable) and valid Observed_Class
+        Rule('C', False, {OBSTACLE_DETECT: (acc_gd.DTR_OBJ_OBSTCLDETECT_PROBABLY_UNDERDRIVABLE,
+                                            acc_gd.DTR_OBJ_OBSTCLDETECT_PROBABLY_OVERRIDABLE)},
+             {OBSERVED_CLASS: invalid_classes}),
+        # D) TunnelDetect == 2 and ObjPreSelect in (FIRST EGO, Fusion_Obstacle)
+        Rule('D', True, {PRESELECT: (acc_gd.DTR_OBJECT_PRESELECT_FIRST_EGO_LANE,
+                                     acc_gd.DTR_OBJECT_PRESELECT_FUSION_OBSTACLE)}, {}),
+        # E) TunnelDetect == 2 and ObstclDtct in (Probably_Underdrivable, Probably_Overdrivable, Obstacle)
+        #    and valid Observed_Class
+        Rule('E', True, {OBSTACLE_DETECT: (acc_gd.DTR_OBJ_OBSTCLDETECT_PROBABLY_UNDERDRIVABLE,
+                                           acc_gd.DTR_OBJ_OBSTCLDETECT_PROBABLY_OVERRIDABLE,
+                                           acc_gd.DTR_OBJ_OBSTCLDETECT_OBSTACLE)},
+             {OBSERVED_CLASS: invalid_classes}),
+    ]
+
+
+# =============================================================================
+# Class
+# =============================================================================
+class RuleEngine(object):
+    def __init__(self, rules):
+        """ Class initialisation, compiles the rule table.
+        @Param rules:   list of Rule in priority order (first met rule wins)
+        """
+        if len(rules) > np.iinfo(MASK_DTYPE).bits:
+            raise ValueError("too many rules for a %s bitmask" % np.dtype(MASK_DTYPE).name)
+        self.rules = list(rules)
+        self.conditions = [rule.condition for rule in self.rules]
+        self.all_mask = MASK_DTYPE((1 << len(self.rules)) - 1)
+        self.tunnel_mask = self._mask(i for i, rule in enumerate(self.rules) if rule.in_tunnel)
+        self.no_tunnel_mask = self._mask(i for i, rule in enumerate(self.rules) if not rule.in_tunnel)
+
+        # per signal: lookup table for 0..max(max mentioned value, MIN_LUT_SIZE - 1) and mask for all other values
+        self.__luts = {}
+        self.__default_masks = {}
+        for signal in RULE_SIGNALS:
+            values = set()
+            for rule in self.rules:
+                values.update(rule.allowed.get(signal, ()))
+                values.update(rule.forbidden.get(signal, ()))
+            if any(value < 0 for value in values):
+                raise ValueError("negative enum value in rules for %s" % signal)
+            self.__default_masks[signal] = self._mask(i for i, rule in enumerate(self.rules)
+                                                      if signal not in rule.allowed)
+            self.__luts[signal] = np.array([self._value_mask(signal, value)
+                                            for value in range(max(max(values) + 1 if values else 0,
+                                                                   MIN_LUT_SIZE))],
+                                           dtype=MASK_DTYPE)
+
+    @staticmethod
+    def _mask(bits):
+        mask = 0
+        for bit in bits:
+            mask |= 1 << bit
+        return MASK_DTYPE(mask)
+
+    def _value_mask(self, signal, value):
+        return self._mask(i for i, rule in enumerate(self.rules)
+                          if (signal not in rule.allowed or value in rule.allowed[signal]) and
+                          value not in rule.forbidden.get(signal, ()))
+
+    def lookup(self, signal, values):
+        """ per value bitmask of the rules it is compatible with
+        :param signal: signal name, one of RULE_SIGNALS
+        :param values: enum values (array or list)
+        :return: array of bitmasks
+        """
+        lut = self.__luts[signal]
+        values = np.asarray(values)
+        if values.dtype.kind == 'f':
+            # non-integral values equal no enum value (like the list comparison): out of range -> default mask
+            values = np.where(np.isfinite(values) & (values == np.floor(values)), values, -1).astype(np.int64)
+        elif values.dtype.kind not in 'iu':
+            values = values.astype(np.int64)
+        if not len(values) or (values.min() >= 0 and values.max() < len(lut)):
+            return lut[values]
+        inside = (values >= 0) & (values < len(lut))
+        return np.where(inside, lut[np.clip(values, 0, len(lut) - 1)], self.__default_masks[signal])
+
+    def lookup_value(self, signal, value):
+        """ bitmask for a single enum value """
+        lut = self.__luts[signal]
+        if 0 <= value < len(lut) and value == int(value):
+            return lut[int(value)]
+        return self.__default_masks[signal]
+
+    def signal_mask(self, signal, values):
+        """ AND of the bitmasks over all values of one signal,
+        run-length encoded signals (RleSignal) are reduced over their runs instead of their cycles
+        """
+        if not len(values):
+            return self.all_mask
+        return np.bitwise_and.reduce(self.lookup(signal, getattr(values, "run_values", values)))
+
+    def cycle_masks(self, preselect, obstacle_detect, observed_class):
+        """ per cycle bitmask of the met rules """
+        return self.lookup(PRESELECT, preselect) & self.lookup(OBSTACLE_DETECT, obstacle_detect) & \
+            self.lookup(OBSERVED_CLASS, observed_class)
+
+    def family_mask(self, tunnel):
+        """ rules applicable for the tunnel state """
+        return self.tunnel_mask if tunnel == TUNNEL_STATE_TUNNEL else self.no_tunnel_mask
+
+    def first_condition(self, mask):
+        """ condition of the lowest set bit (highest priority), None if no bit set """
+        mask = int(mask)
+        if not mask:
+            return None
+        return self.conditions[(mask & -mask).bit_length() - 1]
+
+    def evaluate_masks(self, tunnel, signal_masks):
+        """ condition met for the scene, given the AND reduced bitmask per signal """
+        mask = self.family_mask(tunnel)
+        for signal_mask in signal_masks:
+            mask &= signal_mask
+        return self.first_condition(mask)
+
+    def evaluate(self, tunnel, preselect, obstacle_detect, observed_class):
+        """ condition met for the scene, same interface and result as ApproachAnalyzer441.check_test_criteria
+        :param tunnel: tunnel detect state at begin of scene
+        :param preselect: DTR_ObjPreSelect over the scene (list, array or RleSignal)
+        :param obstacle_detect: DTR_Obj_ObstclDtct over the scene (list, array or RleSignal)
+        :param observed_class: Observed_Class over the scene (list, array or RleSignal)
+        :return: condition name or None
+        """
+        if len(preselect) != len(obstacle_detect) != len(observed_class):
+            raise ValueError("signal slices differ in length")
+        if not len(preselect):
+            return None
+        return self.evaluate_masks(tunnel, (self.signal_mask(PRESELECT, preselect),
+                                            self.signal_mask(OBSTACLE_DETECT, obstacle_detect),
+                                            self.signal_mask(OBSERVED_CLASS, observed_class)))
+
+
+_default_engine = None
+
+
+def default_rule_engine():
+    """ compiled engine of default_rules, built on first use """
+    global _default_engine
+    if _default_engine is None:
+        _default_engine = RuleEngine(default_rules())
+    return _default_engine
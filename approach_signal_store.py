@@ -0,0 +1,189 @@
+"""
+approach_signal_store.py
+-------------------
+
+recording signals decoded once and shared by several analyzer components
+
+SignalStore keeps per port of the current recording one contiguous read-only array. the first component
+asking for a port decodes it (load callback, e.g. GetDataPort), all others get a view of the same buffer.
+contiguous array ports are held without copy, list ports are converted once: the components share that
+array instead of converting the list each (the analyzer keeps the timestamps as array for the recording).
+entries are keyed by (bus name, port name): components on the same bus share a port, buses with their own
+data do not see each other's values. a new recording releases the buffers of the previous one.
+
+with shared=True the buffers are memory mapped files in a directory of the store, so components in
+other processes attach the buffers zero-copy:
+    store = SignalStore(shared=True)
+    store.get(rec, (bus_name, sd.TIMESTAMP_PORT_NAME), load_timestamps)
+    worker_store = SignalStore.attach(store.descriptor())  # in the other process
+
+the owner of the buffers (not an attached store) removes them in release() / close(), close() also
+removes the directory. files still mapped by views (windows does not remove them) are retried on the
+next release() / close().
+
+
+:author:        Sahajhaksh Hariharan
+
+"""
+# ====================================================================
+# Imports
+# ====================================================================
+import os
+import shutil
+import tempfile
+
+import numpy as np
+
+# ====================================================================
+# Global Constant Declarations
+# ====================================================================
+BACKEND_LOCAL = "local"
+BACKEND_FILE = "file"
+
+SEGMENT_FILE_EXT = ".sig"
+
+#############################################################################
+
+
+class SignalStoreError(StandardError):
+    """ request to an attached store for a recording it does not hold, or descriptor of a local store """
+    pass
+
+
+# =============================================================================
+# Class
+# =============================================================================
+class _FileSegment(object):
+    """ memory mapped file holding one buffer """
+    def __init__(self, nbytes=None, name=None, directory=None):
+        if name is None:
+            handle, name = tempfile.mkstemp(suffix=SEGMENT_FILE_EXT, dir=directory)
+            os.close(handle)
+        self.owner = nbytes is not None
+        self.name = name
+
+    def array(self, dtype, shape):
+        if not int(np.prod(shape)):
+            # empty files can not be mapped
+            return np.zeros(shape, dtype=dtype)
+        # written by the owner only
+        return np.memmap(self.name, dtype=dtype, mode='w+' if self.owner else 'r', shape=shape)
+
+    def unlink(self):
+        """ True if removed, False if the file is still mapped (windows) """
+        try:
+            if os.path.exists(self.name):
+                os.remove(self.name)
+        except OSError:
+            return False
+        return True
+
+
+class SignalStore(object):
+    def __init__(self, shared=False, tmp_dir=None):
+        """ Class initialisation.
+        @Param shared:   allocate the buffers in memory mapped files for other processes (see attach)
+        @Param tmp_dir:   parent directory of the buffer directory, default: system temp directory
+        """
+        self.__backend = BACKEND_FILE if shared else BACKEND_LOCAL
+        self.__directory = tempfile.mkdtemp(prefix="signal_store_", dir=tmp_dir) if shared else None
+        self.__attached = False
+        self.__recording = None
+        # key -> (read-only array, segment or None)
+        self.__entries = {}
+        # released segments of the owner not removed yet (still mapped)
+        self.__retired = []
+        self.loads = 0
+        self.hits = 0
+
+    @classmethod
+    def attach(cls, descriptor):
+        """ store with zero-copy views of the buffers described by descriptor (of a shared store)
+        :param descriptor: see descriptor()
+        :return: SignalStore
+        """
+        store = cls()
+        store.__backend = descriptor["backend"]
+        store.__attached = True
+        store.__recording = descriptor["recording"]
+        for key, (segment_name, dtype, shape) in descriptor["ports"].items():
+            segment = _FileSegment(name=segment_name)
+            values = segment.array(np.dtype(dtype), tuple(shape))
+            values.flags.writeable = False
+            store.__entries[key] = (values, segment)
+        return store
+
+    @property
+    def recording(self):
+        return self.__recording
+
+    @property
+    def backend(self):
+        return self.__backend
+
+    @property
+    def nbytes(self):
+        """ size of the held buffers in [byte] """
+        return sum(values.nbytes for values, _ in self.__entries.values())
+
+    def __contains__(self, key):
+        return key in self.__entries
+
+    def get(self, recording, key, load):
+        """ read-only array of a port of the recording, decoded with load() on first request
+        :param recording: current recording, the buffers of another recording are released first
+        :param key: key of the port, (bus name, port name)
+        :param load: callable without arguments returning the port values (list or array)
+        :return: read-only array
+        """
+        if recording != self.__recording:
+            if self.__attached:
+                raise SignalStoreError("store attached to recording %s, not %s" % (self.__recording, recording))
+            self.release()
+            self.__recording = recording
+        entry = self.__entries.get(key)
+        if entry is not None:
+            self.hits += 1
+            return entry[0]
+
+        # ports not shared by the owner are kept in this process only
+        self.loads += 1
+        values = np.ascontiguousarray(load())
+        segment = None
+        if self.__backend == BACKEND_FILE and not self.__attached and not values.dtype.hasobject:
+            segment = _FileSegment(nbytes=values.nbytes, directory=self.__directory)
+            shared_values = segment.array(values.dtype, values.shape)
+            shared_values[...] = values
+            values = shared_values
+        else:
+            # the loaded array can be the data manager's own one: only the store's view gets read-only
+            values = values.view()
+        values.flags.writeable = False
+        self.__entries[key] = (values, segment)
+        return values
+
+    def descriptor(self):
+        """ picklable description of the shared buffers for attach() in other processes """
+        if self.__backend == BACKEND_LOCAL:
+            raise SignalStoreError("local store can not be attached, create it with shared=True")
+        return {"backend": self.__backend, "recording": self.__recording,
+                "ports": dict((key, (segment.name, values.dtype.str, values.shape))
+                              for key, (values, segment) in self.__entries.items() if segment is not None)}
+
+    def release(self):
+        """ drop the buffers of the current recording, the owner removes the files not mapped anymore """
+        segments = [segment for _, segment in self.__entries.values() if segment is not None and segment.owner]
+        # drop the own views first, the mapping is closed with the last view
+        self.__entries = {}
+        self.__recording = None
+        self.__retired = [segment for segment in self.__retired + segments if not segment.unlink()]
+
+    def close(self):
+        """ release the buffers and remove the buffer directory of the owner """
+        self.release()
+        if self.__directory is not None and not self.__attached:
+            shutil.rmtree(self.__directory, ignore_errors=True)
+
+    def stats(self):
+        return {"backend": self.__backend, "recording": self.__recording, "ports": len(self.__entries),
+                "nbytes": self.nbytes, "loads": self.loads, "hits": self.hits}
@@ -0,0 +1,164 @@
+"""
+approach_stats.py
+-------------------
+
+mergeable fleet statistics of the approach testcase results
+
+ApproachStatistics counts the analyzed events per key (condition, speed bin, tunnel state, applicability),
+plus the number of recordings and error events. merging adds the counters, so it is associative and
+commutative: per process / per run statistics are reduced to fleet totals in any order, e.g.:
+    total = merge_statistics(ApproachStatistics.load(path) for path in stat_files)
+    total.pass_rate(speed_bin=total.speed_bin(25.0))
+
+
+:author:        Sahajhaksh Hariharan
+
+"""
+# ====================================================================
+# Imports
+# ====================================================================
+import bisect
+import json
+from collections import Counter, namedtuple
+
+# ====================================================================
+# Global Constant Declarations
+# ====================================================================
+# lower edges of the ego speed bins in [km/h] at event start, 70 km/h separates slow and high speed approaches
+DEFAULT_SPEED_BIN_EDGES = (0.0, 30.0, 50.0, 70.0, 90.0, 110.0, 130.0)
+
+STATS_FORMAT_VERSION = 1
+
+# counter key of one event: condition 'A'..'E' or None, index of the speed bin, TunnelDtct state, applicability
+StatisticsKey = namedtuple('StatisticsKey', ['condition', 'speed_bin', 'tunnel_state', 'applicable'])
+
+#############################################################################
+
+
+# =============================================================================
+# Class
+# =============================================================================
+class ApproachStatistics(object):
+    def __init__(self, speed_bin_edges=DEFAULT_SPEED_BIN_EDGES):
+        """ Class initialisation.
+        @Param speed_bin_edges:   ascending lower bin edges of the ego speed in [km/h]
+        """
+        self.speed_bin_edges = tuple(float(edge) for edge in speed_bin_edges)
+        if list(self.speed_bin_edges) != sorted(self.speed_bin_edges):
+            raise ValueError("speed bin edges have to be ascending")
+        self.counts = Counter()
+        self.recordings = 0
+        self.error_events = 0
+
+    def speed_bin(self, vego):
+        """ bin index of an ego speed in [m/s], speeds below the first edge go to bin 0 """
+        return max(bisect.bisect_right(self.speed_bin_edges, vego * 3.6) - 1, 0)
+
+    def add_recording(self, error_events=0):
+        """ count an analyzed recording and its events with testcase error """
+        self.recordings += 1
+        self.error_events += error_events
+
+    def update(self, vego_at_start, results):
+        """ count the results of analyzed approach events
+        :param vego_at_start: ego speed in [m/s] at event start per event
+        :param results: (event_applicable, tunnel_state_of_scene, condition) per event
+        """
+        for vego, (applicable, tunnel_state, condition) in zip(vego_at_start, results):
+            self.counts[StatisticsKey(condition, self.speed_bin(vego), tunnel_state, bool(applicable))] += 1
+
+    def merge(self, other):
+        """ add the counters of other statistics, returns self """
+        if other.speed_bin_edges != self.speed_bin_edges:
+            raise ValueError("statistics with different speed bins can not be merged")
+        self.counts.update(other.counts)
+        self.recordings += other.recordings
+        self.error_events += other.error_events
+        return self
+
+    def __add__(self, other):
+        return ApproachStatistics(self.speed_bin_edges).merge(self).merge(other)
+
+    def __eq__(self, other):
+        if not isinstance(other, ApproachStatistics):
+            return NotImplemented
+        return self.to_dict() == other.to_dict()
+
+    def __ne__(self, other):
+        result = self.__eq__(other)
+        return result if result is NotImplemented else not result
+
+    @property
+    def events(self):
+        """ number of counted approach events """
+        return sum(self.counts.values())
+
+    def count(self, **filters):
+        """ number of events matching all given key fields, e.g. count(condition='A', tunnel_state=2) """
+        return sum(number for key, number in self.counts.items()
+                   if all(getattr(key, field) == value for field, value in filters.items()))
+
+    def table(self, field, **filters):
+        """ event numbers grouped by one key field, e.g. table('condition', speed_bin=3)
+        :return: dict {field value: number}
+        """
+        grouped = Counter()
+        for key, number in self.counts.items():
+            if all(getattr(key, name) == value for name, value in filters.items()):
+                grouped[getattr(key, field)] += number
+        return dict(grouped)
+
+    def pass_rate(self, **filters):
+        """ share of the applicable events meeting any condition, None if there are none """
+        filters['applicable'] = True
+        applicable = self.count(**filters)
+        if not applicable:
+            return None
+        return 1.0 - float(self.count(condition=None, **filters)) / applicable
+
+    def to_dict(self):
+        """ json serializable representation, see from_dict """
+        return {"version": STATS_FORMAT_VERSION,
+                "speed_bin_edges": list(self.speed_bin_edges),
+                "recordings": self.recordings,
+                "error_events": self.error_events,
+                "counts": sorted([list(key) + [number] for key, number in self.counts.items()],
+                                 key=lambda entry: [str(value) for value in entry])}
+
+    @classmethod
+    def from_dict(cls, data):
+        if data.get("version") != STATS_FORMAT_VERSION:
+            raise ValueError("unsupported statistics format version %s" % str(data.get("version")))
+        stats = cls(data["speed_bin_edges"])
+        stats.recordings = data["recordings"]
+        stats.error_events = data["error_events"]
+        for entry in data["counts"]:
+            stats.counts[StatisticsKey(*entry[:-1])] += entry[-1]
+        return stats
+
+    def save(self, path):
+        """ write as json file """
+        with open(path, "w") as out:
+            json.dump(self.to_dict(), out, indent=1)
+
+    @classmethod
+    def load(cls, path):
+        with open(path) as stats_file:
+            return cls.from_dict(json.load(stats_file))
+
+
+# =============================================================================
+# Functions
+# =============================================================================
+def merge_statistics(statistics, speed_bin_edges=None):
+    """ reduce ApproachStatistics (e.g. of several processes or runs) to their total
+    :param statistics: iterable of ApproachStatistics
+    :param speed_bin_edges: bins of an empty result, default: bins of the first statistics or DEFAULT_SPEED_BIN_EDGES
+    :return: new ApproachStatistics
+    """
+    total = None
+    for stats in statistics:
+        if total is None:
+            total = ApproachStatistics(speed_bin_edges or stats.speed_bin_edges)
+        total.merge(stats)
+    return total if total is not None else ApproachStatistics(speed_bin_edges or DEFAULT_SPEED_BIN_EDGES)
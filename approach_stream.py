@@ -0,0 +1,132 @@
+"""
+approach_stream.py
+-------------------
+
+incremental (online) evaluation of the 441 approach criteria
+
+cycles of one approach event are pushed in as they are decoded, the evaluator only keeps
+the crossing states and a running bitmask of the still valid conditions, so memory does not grow with the event length.
+once the tunnel state is known and all conditions possible for it are falsified the result is final
+and push() returns False, so the caller can stop decoding the event.
+
+the pushed object values have to be aligned to the recording cycles (value of the event object in that cycle),
+results are the same as ApproachAnalyzer441.analyze_events for such events.
+
+
+:author:        Sahajhaksh Hariharan
+
+"""
+# ====================================================================
+# Imports - Local
+# ====================================================================
+from fct.acc.acc_performance.approach_core import SPEED_THRESHOLD, TIMEGAP_THRESHOLD, DIST_EXT, DIST_THRESHOLD
+from fct.acc.acc_performance.approach_rules import default_rule_engine, PRESELECT, OBSTACLE_DETECT, OBSERVED_CLASS
+
+#############################################################################
+
+
+# =============================================================================
+# Class
+# =============================================================================
+class ApproachStreamEvaluator(object):
+    def __init__(self, obj_start_timestamp, speed_threshold=SPEED_THRESHOLD, timegap_threshold=TIMEGAP_THRESHOLD,
+                 dist_ext=DIST_EXT, dist_threshold=DIST_THRESHOLD, rule_engine=None):
+        """ Class initialisation, one evaluator per approach event.
+        @Param obj_start_timestamp:   first timestamp of the event object (applicability check)
+        @Param speed_threshold:   ego speed in [km/h] separating slow and high speed approaches
+        @Param timegap_threshold:   PUD timegap in [s]
+        @Param dist_ext:   distance in [m] the PUD gets extended by
+        @Param dist_threshold:   absolute distance in [m] for high speed approaches
+        @Param rule_engine:   compiled RuleEngine of the conditions, default: A-E of approach_rules
+        """
+        self.__obj_start_timestamp = obj_start_timestamp
+        self.__speed_threshold = speed_threshold / 3.6
+        self.__timegap_threshold = timegap_threshold
+        self.__dist_ext = dist_ext
+        self.__dist_threshold = dist_threshold
+        self.__rules = rule_engine or default_rule_engine()
+
+        self.__cycles = 0
+        self.__high_speed = None
+        self.__ext_pud_crossed = self.__pud_crossed = self.__dist_crossed = False
+        self.__event_applicable = None
+        self.__tunnel_state = None
+        self.__scene_started = False
+        self.__scene_cycles = 0
+        # bitmask of the rules still met by all scene cycles
+        self.__valid = self.__rules.all_mask
+        self.__last_cycle = None
+        self.__done = False
+
+    @property
+    def done(self):
+        """ True once the result can not change anymore """
+        return self.__done
+
+    @property
+    def cycles(self):
+        """ number of pushed cycles """
+        return self.__cycles
+
+    def push(self, timestamp, distx, vego, tunnel_detect, preselect, obstacle_detect, observed_class):
+        """ feed the next cycle of the event
+        :param timestamp: cycle timestamp
+        :param distx: object distance in [m]
+        :param vego: ego speed in [m/s]
+        :param tunnel_detect: TunnelDtct state
+        :param preselect: DTR_ObjPreSelect of the object
+        :param obstacle_detect: DTR_Obj_ObstclDtct of the object
+        :param observed_class: Observed_Class of the object
+        :return: False if no further cycles are needed
+        """
+        if self.__done:
+            return False
+        if self.__cycles == 0:
+            # distinguish slower and high speed approaches by the speed at event start
+            self.__high_speed = vego >= self.__speed_threshold
+        self.__cycles += 1
+
+        if not self.__ext_pud_crossed and distx < self.__timegap_threshold * vego + self.__dist_ext:
+            self.__ext_pud_crossed = True
+            self.__event_applicable = timestamp != self.__obj_start_timestamp
+            self.__tunnel_state = tunnel_detect
+        if not self.__pud_crossed and distx < self.__timegap_threshold * vego:
+            self.__pud_crossed = True
+        if not self.__dist_crossed and distx < self.__dist_threshold:
+            self.__dist_crossed = True
+
+        if not self.__scene_started:
+            # scene starts at PUD, for high speed approaches at the later one of PUD and distance threshold
+            self.__scene_started = self.__pud_crossed and (self.__dist_crossed or not self.__high_speed)
+
+        if self.__scene_started:
+            self._update_criteria(preselect, obstacle_detect, observed_class)
+            self.__done = self.__ext_pud_crossed and \
+                not self.__valid & self.__rules.family_mask(self.__tunnel_state)
+        else:
+            # thresholds not crossed until the end: the last cycle is taken (like the batch analysis)
+            self.__last_cycle = (timestamp, tunnel_detect, preselect, obstacle_detect, observed_class)
+        return not self.__done
+
+    def finish(self):
+        """ end of event (testcase stop), return the result
+        :return: (event_applicable, tunnel_state_of_scene, condition 'A'..'E' or None)
+        """
+        if self.__last_cycle is not None and not self.__ext_pud_crossed:
+            timestamp, tunnel_detect = self.__last_cycle[:2]
+            self.__event_applicable = timestamp != self.__obj_start_timestamp
+            self.__tunnel_state = tunnel_detect
+        if not self.__scene_started and self.__last_cycle is not None:
+            self._update_criteria(*self.__last_cycle[2:])
+        self.__done = True
+
+        condition = None
+        if self.__scene_cycles:
+            condition = self.__rules.first_condition(self.__valid & self.__rules.family_mask(self.__tunnel_state))
+        return self.__event_applicable, self.__tunnel_state, condition
+
+    def _update_criteria(self, preselect, obstacle_detect, observed_class):
+        self.__scene_cycles += 1
+        self.__valid &= self.__rules.lookup_value(PRESELECT, preselect) & \
+            self.__rules.lookup_value(OBSTACLE_DETECT, obstacle_detect) & \
+            self.__rules.lookup_value(OBSERVED_CLASS, observed_class)
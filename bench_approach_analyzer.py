@@ -0,0 +1,457 @@
+"""
+bench_approach_analyzer.py
+-------------------
+
+benchmark suite for ApproachAnalyzer441 on synthetic recordings
+
+the generator builds timestamps, ego speed, TunnelDtct, approach events and their objects
+(DISTX and the DTR enum signals) for a configurable recording length, event count and object lifetime.
+the suite times the hot methods and ProcessData end to end, for numpy array signals and for python list
+signals as delivered by valf. it writes the results as json and compares them against a baseline file:
+a benchmark slower than baseline * (1 + tolerance) fails the run.
+the per event size of the attached results (default, record and legacy attributes) and the memory of several
+components with and without the signal store are reported, not compared.
+
+usage:
+    python bench_approach_analyzer.py --output bench_results.json
+    python bench_approach_analyzer.py --baseline bench_baseline.json --tolerance 0.25
+    python bench_approach_analyzer.py --baseline bench_baseline.json --update-baseline
+
+
+:author:        Sahajhaksh Hariharan
+
+"""
+# ====================================================================
+# Imports
+# ====================================================================
+import os
+import sys
+import json
+import argparse
+import pickle
+import platform
+import subprocess
+import timeit
+
+try:
+    import tracemalloc
+except ImportError:
+    # python 2: no allocation tracing, the signal store memory is not measured
+    tracemalloc = None
+
+import numpy as np
+
+# ====================================================================
+# Imports - Local
+# ====================================================================
+import stk.valf.signal_defs as sd
+
+import fct.acc.common.acc_global_defs as acc_gd
+from fct.acc.acc_performance.approach_core import TIMEGAP_THRESHOLD, DIST_EXT, DIST_THRESHOLD, TimestampIndex
+from fct.acc.acc_performance.acc_approach_analyzer441 import ApproachAnalyzer441, LEGACY_ATTRIBUTES_PORT_NAME, \
+    SIGNAL_STORE_PORT_NAME
+from fct.acc.acc_performance.approach_batch_runner import LocalDataManager
+
+# ====================================================================
+# Global Constant Declarations
+# ====================================================================
+BENCH_BUS_NAME = "Bus#1"
+CYCLE_TIME = 60000  # [us]
+DEFAULT_TOLERANCE = 0.25
+# modules timed on import in a fresh interpreter, numpy as reference for the core
+IMPORT_TIME_MODULES = ("numpy", "fct.acc.acc_performance.approach_core",
+                       "fct.acc.acc_performance.acc_approach_analyzer441")
+
+PRESELECT_VALUES = (acc_gd.DTR_OBJECT_PRESELECT_NOT_SELECTED, acc_gd.DTR_OBJECT_PRESELECT_FIRST_EGO_LANE,
+                    acc_gd.DTR_OBJECT_PRESELECT_FIRST_EGO_LANE, acc_gd.DTR_OBJECT_PRESELECT_FUSION_OBSTACLE)
+OBSTACLE_VALUES = (acc_gd.DTR_OBJ_OBSTCLDETECT_NO_CLASS, acc_gd.DTR_OBJ_OBSTCLDETECT_OBSTACLE,
+                   acc_gd.DTR_OBJ_OBSTCLDETECT_PROBABLY_UNDERDRIVABLE, acc_gd.DTR_OBJ_OBSTCLDETECT_PROBABLY_OVERRIDABLE)
+OBSERVED_CLASS_VALUES = (acc_gd.DTR_OBSERVED_CLASS_NO_CLASS, acc_gd.DTR_OBSERVED_CLASS_NO_CLASS,
+                         acc_gd.DTR_OBSERVED_CLASS_GUARDRAIL, acc_gd.DTR_OBSERVED_CLASS_CURVEENTRY,
+                         acc_gd.DTR_OBSERVED_CLASS_UNKNOWN)
+
+#############################################################################
+
+
+# =============================================================================
+# Synthetic recording
+# =============================================================================
+class SyntheticKinematics(object):
+    def __init__(self, speed):
+        self.__speed = speed
+
+    def GetSpeed(self):
+        return self.__speed
+
+
+class SyntheticEventObject(object):
+    def __init__(self, obj):
+        self.__obj = obj
+
+    def get_object(self):
+        return self.__obj
+
+
+class SyntheticApproachEvent(object):
+    """ provides the part of the valf ACC event interface the analyzer uses """
+    def __init__(self, obj, start_index, stop_index, timestamps, vego,
+                 error_type=acc_gd.TESTCASE_ERROR_TYPES.NONE):
+        self.__obj = obj
+        self.__start_index = start_index
+        self.__stop_index = stop_index
+        self.__stop_time = timestamps[stop_index]
+        self.__vego = vego
+        self.__error_type = error_type
+        self.reset()
+
+    def reset(self):
+        """ undo the analyzer output, so the event can be analyzed again """
+        self.attributes = {}
+        self.__type = acc_gd.EVENT_TYPE_APPROACH_TESTCASE
+        self.__plot_data = {"SignalValueList": [], "SignalsNameList": []}
+
+    def GetRelativeObjectIndexes(self):
+        obj_rel_start = self.__start_index - self.__obj["Index"]
+        obj_rel_end = self.__stop_index - self.__obj["Index"] + 1
+        return obj_rel_start, obj_rel_end, obj_rel_end - obj_rel_start
+
+    def GetEgoKinematics(self):
+        return SyntheticKinematics(self.__vego)
+
+    def GetEventObject(self):
+        return SyntheticEventObject(self.__obj)
+
+    def GetStartIndex(self):
+        return self.__start_index
+
+    def GetStopIndex(self):
+        return self.__stop_index
+
+    def GetStopTime(self):
+        return self.__stop_time
+
+    def GetPlotData(self):
+        return self.__plot_data
+
+    def GetTestcaseErrorType(self):
+        return self.__error_type
+
+    def GetType(self):
+        return self.__type
+
+    def SetType(self, typename):
+        self.__type = typename
+
+    def AddAttribute(self, name, value, unit, type_string):
+        # one generic attribute entry per call, like the valf event
+        self.attributes[name] = (value, unit, type_string)
+
+
+def _enum_signal(rnd, values, length, mean_run_length):
+    """ piecewise constant signal with a few state changes """
+    n_runs = max(1, int(length / mean_run_length))
+    run_starts = np.sort(rnd.choice(np.arange(1, length), min(n_runs - 1, length - 1), replace=False)) \
+        if length > 1 else np.array([], dtype=int)
+    run_values = rnd.choice(values, len(run_starts) + 1)
+    return np.repeat(run_values, np.diff(np.concatenate(([0], run_starts, [length]))))
+
+
+def generate_recording(n_cycles=100000, n_events=200, obj_lifetime=(100, 2000), shared_object_ratio=0.3,
+                       error_ratio=0.05, mean_run_length=200, seed=0, as_lists=False):
+    """ generate the data ports of one synthetic recording
+    :param n_cycles: recording length in cycles
+    :param n_events: number of ACC events
+    :param obj_lifetime: (min, max) object lifetime in cycles
+    :param shared_object_ratio: share of events reusing the object of a previous event
+    :param error_ratio: share of events with testcase error
+    :param mean_run_length: mean number of cycles between enum signal changes
+    :param seed: random seed
+    :param as_lists: signals as python lists instead of numpy arrays
+    :return: dict {port name: value} for the analyzer bus
+    """
+    rnd = np.random.RandomState(seed)
+    convert = (lambda values: values.tolist()) if as_lists else (lambda values: values)
+
+    timestamps = 1000000 + CYCLE_TIME * np.arange(n_cycles, dtype=np.int64)
+    ego_speed = np.clip(25.0 + np.cumsum(rnd.normal(0.0, 0.05, n_cycles)), 3.0, 45.0)  # [m/s]
+    tunnel_detect = _enum_signal(rnd, (0, 0, 0, 1, 2), n_cycles, 5000)
+
+    objects = []
+    events = []
+    for _ in range(n_events):
+        if objects and rnd.rand() < shared_object_ratio:
+            obj = objects[rnd.randint(len(objects))]
+        else:
+            lifetime = rnd.randint(obj_lifetime[0], obj_lifetime[1] + 1)
+            obj_start = rnd.randint(0, n_cycles - lifetime)
+            # approaching object: distance decreasing with a random relative speed
+            distx = np.maximum(rnd.uniform(80.0, 250.0) - np.cumsum(rnd.uniform(0.0, 0.5, lifetime)), 2.0)
+            obj = {"Index": obj_start,
+                   "Timestamp": convert(timestamps[obj_start:obj_start + lifetime]),
+                   sd.OBJ_DISTX: convert(distx),
+                   "DTR_ObjPreSelect": convert(_enum_signal(rnd, PRESELECT_VALUES, lifetime, mean_run_length)),
+                   "DTR_Obj_ObstclDtct": convert(_enum_signal(rnd, OBSTACLE_VALUES, lifetime, mean_run_length)),
+                   "Observed_Class": convert(_enum_signal(rnd, OBSERVED_CLASS_VALUES, lifetime, mean_run_length))}
+            objects.append(obj)
+        lifetime = len(obj["Timestamp"])
+        start_index = obj["Index"] + rnd.randint(0, max(1, lifetime // 3))
+        stop_index = rnd.randint(start_index + 1, obj["Index"] + lifetime)
+        error_type = 1 if rnd.rand() < error_ratio else acc_gd.TESTCASE_ERROR_TYPES.NONE
+        events.append(SyntheticApproachEvent(obj, start_index, stop_index, timestamps,
+                                             convert(ego_speed[start_index:stop_index + 1]), error_type))
+    events.sort(key=lambda ev: ev.GetStartIndex())
+
+    return {sd.TIMESTAMP_PORT_NAME: convert(timestamps), "TunnelDtct": convert(tunnel_detect),
+            sd.ACC_EVENTS_PORT_NAME: events}
+
+
+def setup_analyzer(ports, bus_name=BENCH_BUS_NAME, project_name="bench", config_ports=None):
+    """ analyzer on a LocalDataManager holding the recording ports, initialized and loaded
+    :param ports: recording ports, see generate_recording
+    :param config_ports: optional dict {port name: value} of additional bus ports (analyzer config)
+    :return: (analyzer, data_manager)
+    """
+    data_manager = LocalDataManager()
+    data_manager.SetDataPort(acc_gd.PROJECT_PORT_NAME, project_name)
+    data_manager.SetDataPort(sd.CURRENT_FILE_PORT_NAME, "synthetic.rec")
+    for port_name, port_value in list(ports.items()) + list((config_ports or {}).items()):
+        data_manager.SetDataPort(port_name, port_value, bus_name)
+    analyzer = ApproachAnalyzer441(data_manager, "ApproachAnalyzer441", bus_name)
+    analyzer.Initialize()
+    analyzer.PostInitialize()
+    analyzer.LoadData()
+    return analyzer, data_manager
+
+
+# =============================================================================
+# Benchmarks
+# =============================================================================
+def _best_time(func, repeat, setup=None):
+    """ best wall time of func over repeat runs, setup is called untimed before each run """
+    best = None
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        start = timeit.default_timer()
+        func()
+        elapsed = timeit.default_timer() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def measure_import_time(module_name, repeat=5):
+    """ best wall time in [s] of importing module_name in a fresh interpreter """
+    code = "import timeit; start = timeit.default_timer(); import %s; print(timeit.default_timer() - start)" \
+        % module_name
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(path for path in sys.path if path))
+    return min(float(subprocess.check_output([sys.executable, "-c", code], env=env).strip())
+               for _ in range(repeat))
+
+
+def run_benchmarks(n_cycles=100000, n_events=200, obj_lifetime=(100, 2000), repeat=5, seed=0):
+    """ run all benchmarks on one synthetic recording
+    :return: dict {benchmark name: best time in [s]}
+    """
+    ports = generate_recording(n_cycles, n_events, obj_lifetime, seed=seed)
+    analyzer, _ = setup_analyzer(ports)
+    events = [ev for ev in ports[sd.ACC_EVENTS_PORT_NAME]
+              if ev.GetTestcaseErrorType() == acc_gd.TESTCASE_ERROR_TYPES.NONE]
+    timestamps = ports[sd.TIMESTAMP_PORT_NAME]
+
+    scenes = []
+    for ev in events:
+        obj = ev.GetEventObject().get_object()
+        obj_rel_start, obj_rel_end, _ = ev.GetRelativeObjectIndexes()
+        # mix of tunnel states
+        scenes.append((ev.GetStopIndex() % 3,
+                       obj["DTR_ObjPreSelect"][obj_rel_start:obj_rel_end],
+                       obj["DTR_Obj_ObstclDtct"][obj_rel_start:obj_rel_end],
+                       obj["Observed_Class"][obj_rel_start:obj_rel_end]))
+    scene_lists = [(tunnel, list(preselect), list(obstacle_detect), list(observed_class))
+                   for tunnel, preselect, obstacle_detect, observed_class in scenes]
+    lookup_timestamps = [timestamps[ev.GetStopIndex()] + 7 for ev in events]
+    timestamp_index = TimestampIndex(timestamps)
+
+    def reset_events():
+        for ev in ports[sd.ACC_EVENTS_PORT_NAME]:
+            ev.reset()
+
+    results = {
+        "check_test_criteria": _best_time(
+            lambda: [ApproachAnalyzer441.check_test_criteria(*scene) for scene in scene_lists], repeat),
+        "check_test_criteria_array": _best_time(
+            lambda: [ApproachAnalyzer441.check_test_criteria_array(*scene) for scene in scenes], repeat),
+        "get_timestamp_of_pud": _best_time(
+            lambda: [analyzer.get_timestamp_of_pud(ev, TIMEGAP_THRESHOLD, DIST_EXT) for ev in events], repeat),
+        "get_timestamp_of_dist": _best_time(
+            lambda: [analyzer.get_timestamp_of_dist(ev, DIST_THRESHOLD) for ev in events], repeat),
+        "get_index_relative_to_object_for_ts": _best_time(
+            lambda: [ApproachAnalyzer441.get_index_relative_to_object_for_ts(ev.GetEventObject().get_object(), ts,
+                                                                             timestamp_index)
+                     for ev, ts in zip(events, lookup_timestamps)], repeat),
+        "ProcessData": _best_time(analyzer.ProcessData, repeat, setup=reset_events),
+    }
+
+    # valf delivers the signals as python lists: same recording in list form
+    list_ports = generate_recording(n_cycles, n_events, obj_lifetime, seed=seed, as_lists=True)
+    list_analyzer, _ = setup_analyzer(list_ports)
+    results["ProcessData lists"] = _best_time(list_analyzer.ProcessData, repeat,
+                                              setup=lambda: [ev.reset() for ev in list_ports[sd.ACC_EVENTS_PORT_NAME]])
+    for module_name in IMPORT_TIME_MODULES:
+        results["import %s" % module_name] = measure_import_time(module_name, repeat)
+    return results
+
+
+def _deep_sizeof(obj, seen):
+    """ size in [byte] of obj and the objects it references, objects in seen are not counted again """
+    if id(obj) in seen:
+        return 0
+    seen.add(id(obj))
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        size += sum(_deep_sizeof(key, seen) + _deep_sizeof(value, seen) for key, value in obj.items())
+    elif isinstance(obj, (list, tuple)):
+        size += sum(_deep_sizeof(item, seen) for item in obj)
+    else:
+        size += sum(_deep_sizeof(getattr(obj, slot), seen) for slot in _slot_attributes(type(obj))
+                    if hasattr(obj, slot))
+    return size
+
+
+def _slot_attributes(cls):
+    """ attribute names of the __slots__ of cls and its bases, private slots (__x) resolved to _Cls__x """
+    names = []
+    for klass in cls.__mro__:
+        slots = klass.__dict__.get("__slots__", ())
+        for slot in (slots,) if isinstance(slots, basestring) else slots:
+            if slot.startswith("__") and not slot.endswith("__"):
+                slot = "_%s%s" % (klass.__name__.lstrip("_"), slot)
+            names.append(slot)
+    return names
+
+
+def measure_result_memory(n_cycles=100000, n_events=200, obj_lifetime=(100, 2000), seed=0):
+    """ per event size of the attached approach results: default configuration, compact record and
+    explicitly configured legacy attributes
+    heap size: deep size of the event attributes, shared objects (names, small ints, ...) counted once per run
+    pickle size: pickled attributes of all events (sent back by batch workers / stored with the events)
+    :return: dict {measurement name: bytes per event}
+    """
+    ports = generate_recording(n_cycles, n_events, obj_lifetime, seed=seed)
+    events = ports[sd.ACC_EVENTS_PORT_NAME]
+    results = {}
+    for name, legacy in (("default", None), ("record", False), ("legacy attributes", True)):
+        analyzer, _ = setup_analyzer(ports, config_ports={LEGACY_ATTRIBUTES_PORT_NAME: legacy})
+        for ev in events:
+            ev.reset()
+        analyzer.ProcessData()
+        attributes = [ev.attributes for ev in events]
+        seen = set([id(attributes)])
+        results["heap %s" % name] = float(sum(_deep_sizeof(attrs, seen) for attrs in attributes)) / len(events)
+        results["pickle %s" % name] = float(len(pickle.dumps(attributes, pickle.HIGHEST_PROTOCOL))) / len(events)
+    return results
+
+
+def measure_signal_store_memory(n_cycles=100000, n_events=200, obj_lifetime=(100, 2000), seed=0,
+                                component_counts=(1, 4)):
+    """ memory of several analyzer components on one bus over a list recording (as valf delivers it),
+    without and with the signal store, the recording itself is not counted
+    held: traced memory after LoadData of all components, peak: traced peak until all ran ProcessData
+    :return: dict {measurement name: [byte]}, empty without tracemalloc (python 2)
+    """
+    if tracemalloc is None:
+        return {}
+    ports = generate_recording(n_cycles, n_events, obj_lifetime, seed=seed, as_lists=True)
+    results = {}
+    for name, signal_store in (("no store", None), ("store", True)):
+        for count in component_counts:
+            for ev in ports[sd.ACC_EVENTS_PORT_NAME]:
+                ev.reset()
+            tracemalloc.start()
+            data_manager = LocalDataManager()
+            data_manager.SetDataPort(acc_gd.PROJECT_PORT_NAME, "bench")
+            data_manager.SetDataPort(sd.CURRENT_FILE_PORT_NAME, "synthetic.rec")
+            data_manager.SetDataPort(SIGNAL_STORE_PORT_NAME, signal_store)
+            for port_name, port_value in ports.items():
+                data_manager.SetDataPort(port_name, port_value, BENCH_BUS_NAME)
+            analyzers = [ApproachAnalyzer441(data_manager, "ApproachAnalyzer441_%d" % i, BENCH_BUS_NAME)
+                         for i in range(count)]
+            for analyzer in analyzers:
+                analyzer.Initialize()
+                analyzer.PostInitialize()
+            # every component holds its recording data from LoadData until the next recording
+            for analyzer in analyzers:
+                analyzer.LoadData()
+            results["held %s, %d components" % (name, count)] = tracemalloc.get_traced_memory()[0]
+            for analyzer in analyzers:
+                analyzer.ProcessData()
+            results["peak %s, %d components" % (name, count)] = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            for analyzer in analyzers:
+                analyzer.Terminate()
+    return results
+
+
+def compare_to_baseline(results, baseline, tolerance=DEFAULT_TOLERANCE):
+    """ return list of (name, baseline time, current time) of benchmarks slower than baseline * (1 + tolerance) """
+    regressions = []
+    for name, elapsed in sorted(results.items()):
+        base = baseline.get(name)
+        if base is not None and elapsed > base * (1.0 + tolerance):
+            regressions.append((name, base, elapsed))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="ApproachAnalyzer441 benchmarks on synthetic recordings")
+    parser.add_argument("--cycles", type=int, default=100000, help="recording length in cycles")
+    parser.add_argument("--events", type=int, default=200, help="number of approach events")
+    parser.add_argument("--lifetime", type=int, nargs=2, default=(100, 2000), metavar=("MIN", "MAX"),
+                        help="object lifetime in cycles")
+    parser.add_argument("--repeat", type=int, default=5, help="runs per benchmark, best one counts")
+    parser.add_argument("--seed", type=int, default=0, help="random seed of the generator")
+    parser.add_argument("--output", help="json file for the results")
+    parser.add_argument("--baseline", help="json baseline file to compare against")
+    parser.add_argument("--update-baseline", action="store_true", help="write the results as new baseline")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE,
+                        help="allowed slowdown against the baseline (0.25: 25%%)")
+    args = parser.parse_args(argv)
+
+    params = {"cycles": args.cycles, "events": args.events, "lifetime": list(args.lifetime),
+              "repeat": args.repeat, "seed": args.seed}
+    results = run_benchmarks(args.cycles, args.events, tuple(args.lifetime), args.repeat, args.seed)
+    report = {"params": params, "python": platform.python_version(), "numpy": np.__version__,
+              "results": results}
+    for name, elapsed in sorted(results.items()):
+        sys.stdout.write("%-56s %10.3f ms\n" % (name, elapsed * 1000.0))
+    # sizes are reported only, the baseline compares the times
+    report["memory"] = measure_result_memory(args.cycles, args.events, tuple(args.lifetime), args.seed)
+    for name, size in sorted(report["memory"].items()):
+        sys.stdout.write("%-56s %10.1f byte/event\n" % ("result " + name, size))
+    report["signal_memory"] = measure_signal_store_memory(args.cycles, args.events, tuple(args.lifetime), args.seed)
+    for name, size in sorted(report["signal_memory"].items()):
+        sys.stdout.write("%-56s %10.1f kbyte\n" % ("signal memory " + name, size / 1024.0))
+
+    if args.output:
+        with open(args.output, "w") as out:
+            json.dump(report, out, indent=1, sort_keys=True)
+
+    if args.baseline and args.update_baseline:
+        with open(args.baseline, "w") as out:
+            json.dump(report, out, indent=1, sort_keys=True)
+        return 0
+    if args.baseline:
+        with open(args.baseline) as baseline_file:
+            baseline = json.load(baseline_file)
+        if baseline.get("params") != params:
+            sys.stderr.write("baseline was recorded with different parameters: %s\n" % baseline.get("params"))
+            return 2
+        regressions = compare_to_baseline(results, baseline["results"], args.tolerance)
+        for name, base, elapsed in regressions:
+            sys.stderr.write("REGRESSION %s: %.3f ms -> %.3f ms\n" % (name, base * 1000.0, elapsed * 1000.0))
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,7 +1,13 @@
+import pickle
 import unittest
 
+import numpy as np
+
 from fct.acc.common import acc_global_defs as acc_gd
-from fct.acc.acc_performance.acc_approach_analyzer441 import ApproachAnalyzer441
+from fct.acc.acc_performance.acc_approach_analyzer441 import ApproachAnalyzer441, TimestampIndex, \
+    TimegapThreshold, DistanceThreshold, NOT_CROSSED, LazyPlotSignal, APPROACH_RESULTS_PORT_NAME, CONDITION_NAMES, \
+    DEFAULT_THRESHOLDS, threshold_grid
+from fct.acc.acc_performance.bench_approach_analyzer import generate_recording, setup_analyzer, BENCH_BUS_NAME
 
 
 class ApproachAnalyzerTest(unittest.TestCase):
@@ -148,3 +154,218 @@ class ApproachAnalyzerTest(unittest.TestCase):
         ret = ApproachAnalyzer441.check_test_criteria(tunnel_state_of_scene, preselect_slice,
                                                       obstacle_detect_slice, observed_class_slice)
         self.assertEqual(ret, 'E')
+
+
+class ApproachAnalyzerArrayTest(unittest.TestCase):
+    """ the array based criteria evaluation has to return the same results as the list based one """
+    def _assert_equivalent(self, tunnel_state_of_scene, preselect_slice, obstacle_detect_slice, observed_class_slice):
+        expected = ApproachAnalyzer441.check_test_criteria(tunnel_state_of_scene, preselect_slice,
+                                                           obstacle_detect_slice, observed_class_slice)
+        ret = ApproachAnalyzer441.check_test_criteria_array(tunnel_state_of_scene, np.array(preselect_slice),
+                                                            np.array(obstacle_detect_slice),
+                                                            np.array(observed_class_slice))
+        self.assertEqual(ret, expected)
+        return ret
+
+    def test_empty_slices(self):
+        self.assertEqual(self._assert_equivalent(0, [], [], []), None)
+
+    def test_first_ego(self):
+        ret = self._assert_equivalent(0, [acc_gd.DTR_OBJECT_PRESELECT_FIRST_EGO_LANE]*20, [0, 1, 2, 3, 4]*4,
+                                      [acc_gd.DTR_OBSERVED_CLASS_UNKNOWN]*20)
+        self.assertEqual(ret, 'A')
+
+    def test_first_ego_not(self):
+        preselect_slice = [acc_gd.DTR_OBJECT_PRESELECT_FIRST_EGO_LANE]*20
+        preselect_slice[15] = acc_gd.DTR_OBJECT_PRESELECT_NOT_SELECTED
+        ret = self._assert_equivalent(0, preselect_slice, [0, 1, 2, 3, 4]*4, [acc_gd.DTR_OBSERVED_CLASS_UNKNOWN]*20)
+        self.assertEqual(ret, None)
+
+    def test_cond_b(self):
+        ret = self._assert_equivalent(0, [acc_gd.DTR_OBJECT_PRESELECT_NOT_SELECTED]*20,
+                                      [acc_gd.DTR_OBJ_OBSTCLDETECT_OBSTACLE]*20, [0]*20)
+        self.assertEqual(ret, 'B')
+
+    def test_cond_b_invalid_class(self):
+        for invalid_class in (acc_gd.DTR_OBSERVED_CLASS_GUARDRAIL, acc_gd.DTR_OBSERVED_CLASS_CURVEENTRY,
+                              acc_gd.DTR_OBSERVED_CLASS_UNKNOWN):
+            observed_class_slice = [0]*20
+            observed_class_slice[5] = invalid_class
+            ret = self._assert_equivalent(0, [acc_gd.DTR_OBJECT_PRESELECT_NOT_SELECTED]*20,
+                                          [acc_gd.DTR_OBJ_OBSTCLDETECT_OBSTACLE]*20, observed_class_slice)
+            self.assertEqual(ret, None)
+
+    def test_cond_c(self):
+        obstacle_detect_slice = [acc_gd.DTR_OBJ_OBSTCLDETECT_PROBABLY_OVERRIDABLE]*10
+        obstacle_detect_slice.extend([acc_gd.DTR_OBJ_OBSTCLDETECT_PROBABLY_UNDERDRIVABLE]*10)
+        ret = self._assert_equivalent(0, [acc_gd.DTR_OBJECT_PRESELECT_NOT_SELECTED]*20, obstacle_detect_slice,
+                                      [0]*20)
+        self.assertEqual(ret, 'C')
+
+    def test_cond_d(self):
+        preselect_slice = [acc_gd.DTR_OBJECT_PRESELECT_FUSION_OBSTACLE]*10
+        preselect_slice.extend([acc_gd.DTR_OBJECT_PRESELECT_FIRST_EGO_LANE]*10)
+        obstacle_detect_slice = [acc_gd.DTR_OBJ_OBSTCLDETECT_PROBABLY_OVERRIDABLE]*10
+        obstacle_detect_slice.extend([acc_gd.DTR_OBJ_OBSTCLDETECT_PROBABLY_UNDERDRIVABLE]*10)
+        ret = self._assert_equivalent(2, preselect_slice, obstacle_detect_slice, [0]*20)
+        self.assertEqual(ret, 'D')
+
+    def test_cond_e(self):
+        ret = self._assert_equivalent(2, [acc_gd.DTR_OBJECT_PRESELECT_NOT_SELECTED]*20,
+                                      [acc_gd.DTR_OBJ_OBSTCLDETECT_OBSTACLE]*20, [0]*20)
+        self.assertEqual(ret, 'E')
+
+    def test_random_slices(self):
+        """ random enum combinations over both tunnel states """
+        rnd = np.random.RandomState(441)
+        preselect_values = [acc_gd.DTR_OBJECT_PRESELECT_NOT_SELECTED, acc_gd.DTR_OBJECT_PRESELECT_FIRST_EGO_LANE,
+                            acc_gd.DTR_OBJECT_PRESELECT_FUSION_OBSTACLE]
+        obstacle_values = [acc_gd.DTR_OBJ_OBSTCLDETECT_NO_CLASS, acc_gd.DTR_OBJ_OBSTCLDETECT_OBSTACLE,
+                           acc_gd.DTR_OBJ_OBSTCLDETECT_PROBABLY_UNDERDRIVABLE,
+                           acc_gd.DTR_OBJ_OBSTCLDETECT_PROBABLY_OVERRIDABLE]
+        class_values = [acc_gd.DTR_OBSERVED_CLASS_NO_CLASS, acc_gd.DTR_OBSERVED_CLASS_GUARDRAIL,
+                        acc_gd.DTR_OBSERVED_CLASS_CURVEENTRY, acc_gd.DTR_OBSERVED_CLASS_UNKNOWN]
+        for _ in range(500):
+            length = rnd.randint(1, 8)
+            # restrict each signal to one or two states, otherwise nearly all scenes end up with None
+            preselect_slice = list(rnd.choice(rnd.choice(preselect_values, 2), length))
+            obstacle_detect_slice = list(rnd.choice(rnd.choice(obstacle_values, 2), length))
+            observed_class_slice = list(rnd.choice(rnd.choice(class_values, 2), length))
+            for tunnel_state_of_scene in (0, 1, 2):
+                self._assert_equivalent(tunnel_state_of_scene, preselect_slice, obstacle_detect_slice,
+                                        observed_class_slice)
+
+
+class TimestampIndexTest(unittest.TestCase):
+    def setUp(self):
+        self.timestamps = [1000, 1060, 1120, 1180, 1240]
+
+    def test_index(self):
+        ts_index = TimestampIndex(self.timestamps)
+        for idx, ts in enumerate(self.timestamps):
+            self.assertEqual(ts_index.index(ts), self.timestamps.index(ts))
+        self.assertRaises(ValueError, ts_index.index, 1001)
+
+    def test_nearest_index(self):
+        """ nearest lookup incl. ties (smaller timestamp wins) and values outside of the recording """
+        ts_index = TimestampIndex(self.timestamps)
+        self.assertEqual(ts_index.nearest_index(1061), 1)
+        self.assertEqual(ts_index.nearest_index(1089), 1)
+        self.assertEqual(ts_index.nearest_index(1090), 1)
+        self.assertEqual(ts_index.nearest_index(1091), 2)
+        self.assertEqual(ts_index.nearest_index(0), 0)
+        self.assertEqual(ts_index.nearest_index(99999), 4)
+
+    def test_duplicates(self):
+        """ duplicated timestamps resolve to their first position like list.index """
+        timestamps = [1000, 1060, 1060, 1120]
+        ts_index = TimestampIndex(timestamps)
+        self.assertEqual(ts_index.index(1060), 1)
+        self.assertEqual(ts_index.nearest_index(1070), 1)
+
+    def test_index_relative_to_object(self):
+        obj = {"Index": 2}
+        ts_index = TimestampIndex(self.timestamps)
+        self.assertEqual(ApproachAnalyzer441.get_index_relative_to_object_for_ts(obj, 1181, ts_index), 1)
+        self.assertEqual(ApproachAnalyzer441.get_index_relative_to_object_for_ts(obj, 1181, self.timestamps), 1)
+
+
+class CrossingSearchTest(unittest.TestCase):
+    def test_first_crossings(self):
+        """ timegap, extended timegap and absolute distance crossings in one call """
+        distx = [150.0, 130.0, 110.0, 95.0, 85.0, 70.0, 60.0]
+        vego = [20.0] * 7
+        ret = ApproachAnalyzer441.find_first_crossings(distx, vego, [TimegapThreshold(4.0, 20.0),
+                                                                     TimegapThreshold(4.0, 0.0),
+                                                                     DistanceThreshold(90.0)])
+        self.assertEqual(list(ret), [3, 5, 4])
+
+    def test_never_crossed(self):
+        distx = [150.0, 140.0, 130.0]
+        vego = [20.0] * 3
+        ret = ApproachAnalyzer441.find_first_crossings(distx, vego, [TimegapThreshold(4.0, 0.0),
+                                                                     DistanceThreshold(140.0)])
+        self.assertEqual(list(ret), [NOT_CROSSED, 2])
+
+    def test_empty_event(self):
+        ret = ApproachAnalyzer441.find_first_crossings([], [], [DistanceThreshold(90.0)])
+        self.assertEqual(list(ret), [NOT_CROSSED])
+
+
+class LazyPlotSignalTest(unittest.TestCase):
+    def test_values(self):
+        """ same values as the former gain scaled list slice, built only on first read """
+        source = [0, 1, 2, 3, 4, 5, 6]
+        plot_signal = LazyPlotSignal(source, 10, 2, 5)
+        self.assertFalse(plot_signal.is_materialized)
+        self.assertEqual(len(plot_signal), 3)
+        self.assertFalse(plot_signal.is_materialized)
+        self.assertEqual(list(plot_signal), [10 * v for v in source][2:5])
+        self.assertEqual(plot_signal[-1], 40)
+        self.assertTrue(plot_signal.is_materialized)
+
+    def test_types(self):
+        """ python lists and scalars like the former list slice, also for array sources """
+        source = np.arange(10)
+        plot_signal = LazyPlotSignal(source, 1, 3, 20)
+        self.assertEqual(len(plot_signal), 7)
+        self.assertEqual(plot_signal, list(range(3, 10)))
+        self.assertIs(type(plot_signal.materialize()), list)
+        self.assertIs(type(plot_signal[0]), int)
+        self.assertIs(type(LazyPlotSignal(source.astype(float), 10, 0, 2)[1]), float)
+        self.assertIs(type(plot_signal.tolist()), list)
+
+    def test_pickle(self):
+        """ pickled plot data is a plain list, for every protocol (protocol 0 is the python 2 default) """
+        plot_signal = LazyPlotSignal(np.arange(10), 10, 2, 5)
+        for protocol in range(pickle.HIGHEST_PROTOCOL + 1):
+            values = pickle.loads(pickle.dumps({"SignalValueList": [plot_signal]}, protocol))["SignalValueList"][0]
+            self.assertIs(type(values), list)
+            self.assertEqual(values, [20, 30, 40])
+
+
+class ThresholdSweepTest(unittest.TestCase):
+    def setUp(self):
+        self.ports = generate_recording(n_cycles=20000, n_events=40, obj_lifetime=(100, 800), mean_run_length=100)
+        self.analyzer, self.data_manager = setup_analyzer(self.ports)
+
+    def test_default_thresholds(self):
+        """ sweep point with the module thresholds gives the ProcessData results """
+        grid = threshold_grid(timegap_thresholds=(3.5, 4.5)) + [DEFAULT_THRESHOLDS]
+        sweep = self.analyzer.sweep_thresholds(grid)
+        self.analyzer.ProcessData()
+        results = [res for res in self.data_manager.GetDataPort(APPROACH_RESULTS_PORT_NAME, BENCH_BUS_NAME)
+                   if res.tunnel_state_of_scene is not None]
+
+        self.assertEqual(sweep.condition.shape, (len(results), 3))
+        self.assertEqual(list(sweep.start_index), [res.start_index for res in results])
+        self.assertEqual([(bool(applicable), tunnel, CONDITION_NAMES[cond]) for applicable, tunnel, cond in
+                          zip(sweep.event_applicable[:, 2], sweep.tunnel_state_of_scene[:, 2], sweep.condition[:, 2])],
+                         [(res.event_applicable, res.tunnel_state_of_scene, res.stat_approach_condition)
+                          for res in results])
+
+
+class _RecordingLogger(object):
+    def __init__(self):
+        self.messages = []
+
+    def debug(self, msg="", *args):
+        pass
+
+    def info(self, msg, *args):
+        self.messages.append(msg % args)
+
+    warning = info
+
+
+class EventDiagnosticsTest(unittest.TestCase):
+    def test_default_logging(self):
+        """ per event diagnostics are logged without instrumentation """
+        ports = generate_recording(n_cycles=5000, n_events=10, obj_lifetime=(100, 500), error_ratio=0.0)
+        analyzer, _ = setup_analyzer(ports)
+        analyzer._logger = _RecordingLogger()
+        analyzer.ProcessData()
+        messages = analyzer._logger.messages
+        self.assertIn("number of ACC events: 10", messages)
+        self.assertEqual(len([msg for msg in messages if msg.startswith("Test Result: condition")]), 10)
+        self.assertEqual(len([msg for msg in messages if msg.startswith("tunnel state at begin of scene")]), 10)
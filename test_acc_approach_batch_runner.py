@@ -0,0 +1,83 @@
+import os
+import subprocess
+import sys
+import unittest
+
+from fct.acc.acc_performance import acc_approach_analyzer441
+from fct.acc.acc_performance.approach_batch_runner import ApproachBatchRunner, LocalDataManager, analyze_recordings
+from fct.acc.acc_performance.bench_approach_analyzer import generate_recording, BENCH_BUS_NAME
+
+
+def _load(rec):
+    """ module level: picklable for the worker processes """
+    if rec == "broken":
+        raise IOError("broken file")
+    if rec == "crash":
+        os._exit(1)
+    return generate_recording(n_cycles=3000, n_events=8, obj_lifetime=(100, 400), seed=int(rec))
+
+
+class LocalDataManagerTest(unittest.TestCase):
+    def test_buses(self):
+        data_manager = LocalDataManager()
+        data_manager.SetDataPort("port", 1)
+        data_manager.SetDataPort("port", 2, "bus")
+        self.assertEqual((data_manager.GetDataPort("port"), data_manager.GetDataPort("port", "bus")), (1, 2))
+        data_manager.ClearBus("bus")
+        self.assertFalse(data_manager.ExistsDataPort("port", "bus"))
+        self.assertTrue(data_manager.ExistsDataPort("port"))
+
+    def test_no_pool_import(self):
+        """ LocalDataManager (used by the benchmarks) does not need concurrent.futures (python 2 backport) """
+        code = "import sys\n" \
+               "from fct.acc.acc_performance.approach_batch_runner import LocalDataManager\n" \
+               "sys.exit('concurrent.futures' in sys.modules)"
+        self.assertEqual(subprocess.call([sys.executable, "-c", code]), 0)
+
+
+class ApproachBatchRunnerTest(unittest.TestCase):
+    recordings = ["0", "1", "broken", "2", "3"]
+
+    def _runner(self, **kwargs):
+        return ApproachBatchRunner(_load, "bench", bus_name=BENCH_BUS_NAME, **kwargs)
+
+    def test_order_and_statistics(self):
+        sequential = self._runner(max_workers=0, prefetch_depth=0)
+        parallel = self._runner(max_workers=2, chunk_size=2)
+        results = sequential.run(self.recordings)
+        # tracebacks differ with prefetch
+        self.assertEqual([rec_result.events for rec_result in parallel.run(self.recordings)],
+                         [rec_result.events for rec_result in results])
+        self.assertEqual([rec_result.recording for rec_result in results], self.recordings)
+        self.assertIn("broken file", results[2].error)
+        self.assertTrue(all(rec_result.error is None and rec_result.events
+                            for i, rec_result in enumerate(results) if i != 2))
+
+        # merged statistics: one count per analyzed recording and event
+        self.assertEqual(parallel.statistics, sequential.statistics)
+        self.assertEqual(sequential.statistics.recordings, 4)
+        self.assertEqual(sequential.statistics.events + sequential.statistics.error_events,
+                         sum(len(rec_result.events) for rec_result in results if rec_result.events))
+
+    def test_initialize_failure(self):
+        def initialize(analyzer):
+            raise ValueError("bad config")
+        original = acc_approach_analyzer441.ApproachAnalyzer441.Initialize
+        acc_approach_analyzer441.ApproachAnalyzer441.Initialize = initialize
+        try:
+            results, stats = analyze_recordings(["0", "1"], (_load, "bench", BENCH_BUS_NAME, "Approach", 1))
+        finally:
+            acc_approach_analyzer441.ApproachAnalyzer441.Initialize = original
+        self.assertIsNone(stats)
+        self.assertEqual([rec_result.recording for rec_result in results], ["0", "1"])
+        self.assertTrue(all("bad config" in rec_result.error for rec_result in results))
+
+    def test_worker_crash(self):
+        recordings = ["0", "crash", "1"]
+        results = self._runner(max_workers=2, prefetch_depth=0).run(recordings)
+        self.assertEqual([rec_result.recording for rec_result in results], recordings)
+        self.assertIn("BrokenProcessPool", results[1].error)
+
+
+if __name__ == '__main__':
+    unittest.main()
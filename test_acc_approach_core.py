@@ -0,0 +1,100 @@
+import os
+import pickle
+import shutil
+import subprocess
+import sys
+import tempfile
+import unittest
+
+import numpy as np
+
+import stk.valf.signal_defs as sd
+
+from fct.acc.common import acc_global_defs as acc_gd
+from fct.acc.acc_performance.approach_core import TimestampIndex, TimegapThreshold, DistanceThreshold, \
+    NOT_CROSSED, find_first_crossings, crossing_indexes, scene_begin_timestamps, calc_timegap, \
+    index_relative_to_object, check_test_criteria
+from fct.acc.acc_performance.approach_rules import default_rule_engine
+from fct.acc.acc_performance.acc_approach_analyzer441 import ApproachAnalyzer441, APPROACH_RESULTS_PORT_NAME
+from fct.acc.acc_performance.bench_approach_analyzer import generate_recording, setup_analyzer, BENCH_BUS_NAME
+
+
+class ApproachCoreTest(unittest.TestCase):
+    def test_crossings(self):
+        distx = [120.0, 100.0, 85.0, 70.0, 50.0]
+        vego = [20.0] * 5
+        specs = [TimegapThreshold(4.0, 20.0), TimegapThreshold(4.0, 0.0), DistanceThreshold(90.0),
+                 DistanceThreshold(10.0)]
+        self.assertEqual(find_first_crossings(distx, vego, specs).tolist(), [2, 3, 2, NOT_CROSSED])
+        # never crossed: last cycle, indexes relative to the recording
+        self.assertEqual(crossing_indexes(distx, vego, specs, start_index=100), [102, 103, 102, 104])
+
+    def test_scene_begin(self):
+        """ slow approach: PUD, high speed approach: later one of PUD and distance threshold """
+        begin = scene_begin_timestamps([15.0, 25.0, 25.0], [10, 10, 30], [20, 20, 20])
+        self.assertEqual(begin.tolist(), [10, 20, 30])
+
+    def test_calc_timegap(self):
+        self.assertEqual(calc_timegap(50.0, 25.0), 2.0)
+        self.assertEqual(calc_timegap(50.0, 0.5), 10000)
+
+    def test_index_relative_to_object(self):
+        timestamps = [1000, 1060, 1120, 1180, 1240]
+        self.assertEqual(index_relative_to_object(timestamps, 1, 1125), 1)
+        self.assertEqual(index_relative_to_object(TimestampIndex(timestamps), 1, [1000, 1175, 2000]).tolist(),
+                         [-1, 2, 3])
+
+    def test_check_test_criteria(self):
+        engine = default_rule_engine()
+        preselect = np.array([acc_gd.DTR_OBJECT_PRESELECT_FIRST_EGO_LANE] * 3)
+        self.assertEqual(check_test_criteria(0, preselect, [0] * 3, [0] * 3, engine), 'A')
+        self.assertEqual(check_test_criteria(2, preselect, [0] * 3, [0] * 3, engine), 'D')
+        self.assertIsNone(check_test_criteria(0, [], [], [], engine))
+
+    def test_no_framework_import(self):
+        """ the core and the rule engine with an own rule table do not pull in the valf framework """
+        code = "import sys\n" \
+               "from fct.acc.acc_performance.approach_core import check_test_criteria\n" \
+               "from fct.acc.acc_performance.approach_rules import RuleEngine, Rule, PRESELECT\n" \
+               "engine = RuleEngine([Rule('A', False, {PRESELECT: (1,)}, {})])\n" \
+               "assert check_test_criteria(0, [1, 1], [0, 0], [0, 0], engine) == 'A'\n" \
+               "sys.exit(any(name.split('.')[0] == 'stk' or name.startswith('fct.acc.common') " \
+               "for name in sys.modules))"
+        self.assertEqual(subprocess.call([sys.executable, "-c", code]), 0)
+
+
+class RecordingAnalysisTest(unittest.TestCase):
+    def test_without_framework(self):
+        """ the events of a recording analyzed on plain arrays in a process without the framework,
+        the default rules sent as pickled engine: same results as the valf component
+        """
+        ports = generate_recording(n_cycles=5000, n_events=20, obj_lifetime=(100, 3000), error_ratio=0.0)
+        events = ports[sd.ACC_EVENTS_PORT_NAME]
+        analyzer, data_manager = setup_analyzer(ports)
+        table = ApproachAnalyzer441._event_table(events)
+        analyzer.ProcessData()
+        expected = [tuple(res)[2:] for res in data_manager.GetDataPort(APPROACH_RESULTS_PORT_NAME, BENCH_BUS_NAME)]
+
+        tmp_dir = tempfile.mkdtemp()
+        try:
+            path = os.path.join(tmp_dir, "recording.pkl")
+            with open(path, "wb") as out:
+                pickle.dump((table, ports[sd.TIMESTAMP_PORT_NAME], ports["TunnelDtct"], default_rule_engine()), out)
+            code = "import pickle, sys\n" \
+                   "from fct.acc.acc_performance.approach_core import analyze_approach_events\n" \
+                   "with open(sys.argv[1], 'rb') as inp:\n" \
+                   "    table, timestamps, tunnel_detect, rule_engine = pickle.load(inp)\n" \
+                   "analysis = analyze_approach_events(table, timestamps, tunnel_detect, rule_engine)\n" \
+                   "with open(sys.argv[1], 'wb') as out:\n" \
+                   "    pickle.dump(analysis.results, out)\n" \
+                   "sys.exit(any(name.split('.')[0] == 'stk' or name.startswith('fct.acc.common') " \
+                   "for name in sys.modules))"
+            self.assertEqual(subprocess.call([sys.executable, "-c", code, path]), 0)
+            with open(path, "rb") as inp:
+                self.assertEqual(pickle.load(inp), expected)
+        finally:
+            shutil.rmtree(tmp_dir)
+
+
+if __name__ == '__main__':
+    unittest.main()
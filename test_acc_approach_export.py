@@ -0,0 +1,81 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from fct.acc.acc_performance.approach_export import ApproachResultWriter, open_results, column_path, UNKNOWN
+
+
+class ApproachResultWriterTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmp_dir, "results")
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def _write(self, recording, n_events):
+        writer = ApproachResultWriter(self.path)
+        writer.append(recording, range(n_events), [idx + 10 for idx in range(n_events)],
+                      [1000] * (n_events - 1) + [None], [2] * (n_events - 1) + [None], [True] * (n_events - 1) + [False],
+                      ['D'] * (n_events - 1) + [None])
+        writer.close()
+
+    def test_roundtrip(self):
+        self._write("rec_a.rec", 3)
+        results, meta = open_results(self.path)
+        self.assertEqual(len(results["start_index"]), 3)
+        self.assertEqual(meta["recordings"], ["rec_a.rec"])
+        self.assertEqual(results["stop_index"].tolist(), [10, 11, 12])
+        self.assertEqual(results["scene_begin"].tolist(), [1000, 1000, UNKNOWN])
+        self.assertEqual(results["tunnel_state"].tolist(), [2, 2, UNKNOWN])
+        self.assertEqual(results["applicable"].tolist(), [1, 1, 0])
+        self.assertEqual([meta["condition_names"][code] for code in results["condition"]], ['D', 'D', None])
+
+    def test_append(self):
+        """ a second writer continues the file and its recording ids """
+        self._write("rec_a.rec", 2)
+        self._write("rec_b.rec", 3)
+        self._write("rec_a.rec", 1)
+        results, meta = open_results(self.path)
+        self.assertEqual(meta["recordings"], ["rec_a.rec", "rec_b.rec"])
+        self.assertEqual(results["recording_id"].tolist(), [0, 0, 1, 1, 1, 0])
+
+    def test_partial_record(self):
+        """ a record cut off by an interrupted run is dropped on reopening """
+        self._write("rec_a.rec", 2)
+        with open(column_path(self.path, "recording_id"), "ab") as column_file:
+            column_file.write(b"\0" * 4)
+        with open(column_path(self.path, "start_index"), "ab") as column_file:
+            column_file.write(b"\0" * 5)
+        self.assertEqual(len(open_results(self.path)[0]["start_index"]), 2)
+        self._write("rec_b.rec", 1)
+        results, _ = open_results(self.path)
+        self.assertEqual(results["recording_id"].tolist(), [0, 0, 1])
+        self.assertEqual(results["start_index"].tolist(), [0, 1, 0])
+
+    def test_not_closed(self):
+        """ recordings of a writer that is dropped without close keep their ids on reopening """
+        writer = ApproachResultWriter(self.path)
+        writer.append("rec_a.rec", [0], [10], [1000], [0], [True], ['A'])
+        writer.append("rec_b.rec", [5], [15], [2000], [2], [True], ['D'])
+        # no close: the buffered records reach the files when the writer is garbage collected
+        del writer
+        self._write("rec_c.rec", 1)
+        results, meta = open_results(self.path)
+        self.assertEqual(meta["recordings"], ["rec_a.rec", "rec_b.rec", "rec_c.rec"])
+        self.assertEqual(results["recording_id"].tolist(), [0, 1, 2])
+
+    def test_columns(self):
+        """ one contiguous file per column """
+        self._write("rec_a.rec", 4)
+        self.assertEqual(os.path.getsize(column_path(self.path, "condition")), 4)
+        self.assertEqual(os.path.getsize(column_path(self.path, "start_index")), 4 * 8)
+
+    def test_condition_mismatch(self):
+        self._write("rec_a.rec", 1)
+        self.assertRaises(ValueError, ApproachResultWriter, self.path, (None, 'A', 'F'))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,74 @@
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+
+from fct.acc.acc_performance.approach_instrumentation import Instrumentation, NullInstrumentation, nbytes
+
+
+class InstrumentationTest(unittest.TestCase):
+    def test_timers(self):
+        instr = Instrumentation()
+        for _ in range(3):
+            with instr.timer("ProcessData"):
+                pass
+        timers = instr.summary()["timers"]
+        self.assertEqual(timers["ProcessData"]["calls"], 3)
+        self.assertAlmostEqual(timers["ProcessData"]["mean_s"] * 3, timers["ProcessData"]["total_s"])
+        self.assertEqual(instr.total_time("ProcessData"), timers["ProcessData"]["total_s"])
+        self.assertEqual(instr.total_time("LoadData"), 0.0)
+
+    def test_timer_exception(self):
+        """ the block is timed and the exception passed on """
+        instr = Instrumentation()
+        with self.assertRaises(ValueError):
+            with instr.timer("phase"):
+                raise ValueError()
+        self.assertEqual(instr.summary()["timers"]["phase"]["calls"], 1)
+
+    def test_counters(self):
+        instr = Instrumentation()
+        instr.count("events", 5)
+        instr.count("events")
+        instr.maximum("deviation", 2.0)
+        instr.maximum("deviation", 1.0)
+        instr.maximum("negative", -3.0)
+        self.assertEqual(instr.summary()["counters"], {"events": 6, "deviation": 2.0, "negative": -3.0})
+        self.assertIsNone(instr.summary()["events_per_second"])
+
+    def test_export(self):
+        instr = Instrumentation()
+        with instr.timer("ProcessData"):
+            instr.count("events", 10)
+        out_dir = tempfile.mkdtemp()
+        try:
+            path = os.path.join(out_dir, "instr.json")
+            instr.export(path)
+            with open(path) as instr_file:
+                summary = json.load(instr_file)
+        finally:
+            shutil.rmtree(out_dir)
+        self.assertEqual(summary["counters"], {"events": 10})
+        self.assertEqual(summary["timers"]["ProcessData"]["calls"], 1)
+
+    def test_null(self):
+        instr = NullInstrumentation()
+        self.assertFalse(instr.enabled)
+        with instr.timer("ProcessData"):
+            instr.count("events")
+            instr.maximum("deviation", 1.0)
+        self.assertEqual(instr.summary(), {})
+        path = os.path.join(tempfile.gettempdir(), "null_instr_%d.json" % os.getpid())
+        instr.export(path)
+        self.assertFalse(os.path.exists(path))
+
+    def test_nbytes(self):
+        self.assertEqual(nbytes(np.zeros(4, dtype=np.int16)), 8)
+        self.assertEqual(nbytes([1, 2, 3]), 24)
+
+
+if __name__ == '__main__':
+    unittest.main()
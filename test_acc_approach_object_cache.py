@@ -0,0 +1,58 @@
+import unittest
+
+import numpy as np
+
+from fct.acc.acc_performance.approach_object_cache import ObjectCache, first_below_table, value_nbytes
+
+
+class ObjectCacheTest(unittest.TestCase):
+    def test_memoization(self):
+        cache = ObjectCache()
+        obj = {"Index": 10, "DistX": [5.0, 4.0]}
+        builds = []
+
+        def build():
+            builds.append(1)
+            return np.asarray(obj["DistX"])
+
+        first = cache.get(obj, "distx", build)
+        self.assertIs(cache.get(obj, "distx", build), first)
+        self.assertEqual(len(builds), 1)
+        self.assertTrue(cache.has(obj, "distx"))
+        # equal content, other object: own entry
+        self.assertFalse(cache.has(dict(obj), "distx"))
+        stats = cache.stats()
+        self.assertEqual((stats["hits"], stats["misses"], stats["hit_rate"]), (1, 1, 0.5))
+        cache.clear()
+        self.assertEqual((len(cache), cache.size), (0, 0))
+        self.assertEqual(cache.stats()["hits"], 1)
+
+    def test_eviction(self):
+        """ least recently used objects are dropped above the size limit """
+        cache = ObjectCache(max_size=2 * 800)
+        objects = [{"Index": idx} for idx in range(3)]
+        cache.get(objects[0], "values", lambda: np.zeros(100))
+        cache.get(objects[1], "values", lambda: np.zeros(100))
+        cache.get(objects[0], "values", lambda: np.zeros(100))
+        cache.get(objects[2], "values", lambda: np.zeros(100))
+        self.assertEqual(cache.evictions, 1)
+        self.assertFalse(cache.has(objects[1], "values"))
+        self.assertTrue(cache.has(objects[0], "values"))
+        self.assertEqual(cache.size, 2 * 800)
+
+    def test_value_nbytes(self):
+        """ arrays by their buffer, lists by their item references without visiting the items """
+        self.assertEqual(value_nbytes(np.zeros(10)), 80)
+        self.assertEqual(value_nbytes([1.0] * 1000), 8000)
+        self.assertEqual(value_nbytes((np.zeros(10), np.zeros(10))), 16)
+        self.assertEqual(value_nbytes(True), 8)
+
+    def test_first_below_table(self):
+        distx = np.array([100.0, 95.0, 85.0, 92.0, 80.0])
+        table = first_below_table(distx, 90.0)
+        self.assertEqual(table.tolist(), [2, 2, 2, 4, 4])
+        self.assertEqual(first_below_table(distx, 50.0).tolist(), [5] * 5)
+
+
+if __name__ == '__main__':
+    unittest.main()
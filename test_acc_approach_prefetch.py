@@ -0,0 +1,56 @@
+import threading
+import unittest
+
+from fct.acc.acc_performance.approach_prefetch import RecordingPrefetcher, PrefetchError
+
+
+class RecordingPrefetcherTest(unittest.TestCase):
+    def setUp(self):
+        self.loaded = []
+        self.lock = threading.Lock()
+
+    def _loader(self, rec):
+        if rec == "broken":
+            raise IOError("broken file")
+        with self.lock:
+            self.loaded.append(rec)
+        return {"Timestamp": [rec]}
+
+    def test_order(self):
+        recordings = ["a", "b", "c", "d"]
+        with RecordingPrefetcher(self._loader, recordings, depth=2) as prefetcher:
+            self.assertEqual([prefetcher.load(rec)["Timestamp"] for rec in recordings], [[rec] for rec in recordings])
+            self.assertEqual(prefetcher.remaining, 0)
+            self.assertRaises(PrefetchError, prefetcher.load)
+
+    def test_materialize(self):
+        materialized = []
+        with RecordingPrefetcher(self._loader, ["a", "b"], materialize=materialized.append) as prefetcher:
+            ports = [item.ports for item in prefetcher]
+        self.assertEqual(materialized, ports)
+
+    def test_error(self):
+        """ a failing recording is reported on load, the following recordings are still delivered """
+        with RecordingPrefetcher(self._loader, ["a", "broken", "c"]) as prefetcher:
+            prefetcher.load("a")
+            self.assertRaisesRegexp(PrefetchError, "broken file", prefetcher.load, "broken")
+            self.assertEqual(prefetcher.load("c"), {"Timestamp": ["c"]})
+
+    def test_out_of_order(self):
+        with RecordingPrefetcher(self._loader, ["a", "b"]) as prefetcher:
+            self.assertRaises(PrefetchError, prefetcher.load, "b")
+
+    def test_bounded_cancel(self):
+        """ with a full buffer the thread stops loading, cancel ends it and drops the buffer """
+        prefetcher = RecordingPrefetcher(self._loader, range(100), depth=1)
+        prefetcher.start()
+        prefetcher.next()
+        prefetcher.cancel()
+        self.assertTrue(prefetcher.cancelled)
+        # consumed + buffered + the one loaded while the buffer was full
+        self.assertLessEqual(len(self.loaded), 4)
+        self.assertRaises(PrefetchError, prefetcher.next)
+
+
+if __name__ == '__main__':
+    unittest.main()
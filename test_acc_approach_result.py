@@ -0,0 +1,76 @@
+import pickle
+import unittest
+
+import stk.valf.signal_defs as sd
+
+from fct.acc.acc_performance.acc_approach_analyzer441 import LEGACY_ATTRIBUTES_PORT_NAME
+from fct.acc.acc_performance.approach_result import ApproachResult, ERROR_RESULT, RESULT_ATTRIBUTE_NAME, \
+    CONDITION_B, attach_result
+from fct.acc.acc_performance.bench_approach_analyzer import generate_recording, setup_analyzer
+
+
+class _Event(object):
+    def __init__(self):
+        self.attributes = []
+
+    def AddAttribute(self, name, value, unit, type_string):
+        self.attributes.append((name, value, unit, type_string))
+
+
+class ApproachResultTest(unittest.TestCase):
+    def test_legacy_access(self):
+        result = ApproachResult(True, 2, 'B')
+        self.assertEqual(result.condition_code, CONDITION_B)
+        self.assertEqual(result.condition, 'B')
+        self.assertEqual(result['stat_approach_condition'], 'B')
+        self.assertEqual(result['tunnel_state_of_scene'], 2)
+        self.assertIs(result.get('event_applicable'), True)
+        self.assertIsNone(result.get('unknown'))
+        self.assertRaises(KeyError, result.__getitem__, 'unknown')
+        self.assertEqual(result.to_tuple(), (True, 2, 'B'))
+        self.assertFalse(hasattr(result, '__dict__'))
+        self.assertRaises(KeyError, ApproachResult, True, 0, 'X')
+
+    def test_pickle(self):
+        for protocol in range(pickle.HIGHEST_PROTOCOL + 1):
+            self.assertEqual(pickle.loads(pickle.dumps(ApproachResult(False, 0, 'E'), protocol)),
+                             ApproachResult(False, 0, 'E'))
+        self.assertEqual(ERROR_RESULT.to_tuple(), (False, None, None))
+
+    def test_attach(self):
+        result = ApproachResult(True, 0, 'A')
+        event = _Event()
+        attach_result(event, result)
+        self.assertEqual(event.attributes, [('event_applicable', True, '', 'boolean'),
+                                            ('tunnel_state_of_scene', 0, '', 'int'),
+                                            ('stat_approach_condition', 'A', '', 'string')])
+
+        event = _Event()
+        attach_result(event, result, legacy_attributes=False)
+        self.assertEqual(event.attributes, [(RESULT_ATTRIBUTE_NAME, result, '', 'object')])
+
+
+class AnalyzerResultAttributesTest(unittest.TestCase):
+    def _attributes(self, config_ports=None):
+        ports = generate_recording(n_cycles=3000, n_events=10, obj_lifetime=(100, 400), error_ratio=0.2)
+        analyzer, _ = setup_analyzer(ports, config_ports=config_ports)
+        analyzer.ProcessData()
+        return [ev.attributes for ev in ports[sd.ACC_EVENTS_PORT_NAME]]
+
+    def test_default_legacy_attributes(self):
+        """ without configuration the events get the three legacy attributes only, as before """
+        for attributes in self._attributes():
+            self.assertEqual(sorted(attributes), ['event_applicable', 'stat_approach_condition',
+                                                  'tunnel_state_of_scene'])
+
+    def test_record_only(self):
+        """ same values in the record as in the legacy attributes """
+        legacy = self._attributes()
+        for attributes, legacy_attributes in zip(self._attributes({LEGACY_ATTRIBUTES_PORT_NAME: False}), legacy):
+            self.assertEqual(list(attributes), [RESULT_ATTRIBUTE_NAME])
+            for name, value, unit, type_string in attributes[RESULT_ATTRIBUTE_NAME][0].attributes():
+                self.assertEqual(legacy_attributes[name], (value, unit, type_string))
+
+
+if __name__ == '__main__':
+    unittest.main()
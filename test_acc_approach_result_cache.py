@@ -0,0 +1,81 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+import stk.valf.signal_defs as sd
+
+from fct.acc.acc_performance.approach_result_cache import ApproachResultCache
+from fct.acc.acc_performance.approach_rules import RuleEngine, default_rules
+from fct.acc.acc_performance.bench_approach_analyzer import generate_recording, setup_analyzer
+
+
+class ApproachResultCacheTest(unittest.TestCase):
+    def setUp(self):
+        self.cache_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.cache_dir)
+
+    def test_hit_miss(self):
+        cache = ApproachResultCache(self.cache_dir)
+        self.assertEqual(cache.get("abc"), None)
+        cache.put("abc", [(True, 0, 'A'), None, (False, None, None)])
+        self.assertEqual(cache.get("abc"), [(True, 0, 'A'), None, (False, None, None)])
+        self.assertEqual((cache.hits, cache.misses), (1, 1))
+
+    def test_persistent(self):
+        """ entries of a previous run are found again """
+        ApproachResultCache(self.cache_dir).put("abc", [(True, 2, 'D')])
+        cache = ApproachResultCache(self.cache_dir)
+        self.assertEqual(cache.get("abc"), [(True, 2, 'D')])
+
+    def test_lru_eviction(self):
+        """ least recently used entry gets evicted when the size limit is exceeded """
+        cache = ApproachResultCache(self.cache_dir)
+        cache.put("first", [None] * 100)
+        entry_size = cache.size
+        cache = ApproachResultCache(self.cache_dir, max_size=2 * entry_size)
+        cache.put("second", [None] * 100)
+        cache.get("first")
+        cache.put("third", [None] * 100)
+        self.assertTrue("first" in cache)
+        self.assertFalse("second" in cache)
+        self.assertTrue("third" in cache)
+        self.assertEqual(cache.evictions, 1)
+        self.assertEqual(len([f for f in os.listdir(self.cache_dir)]), 2)
+
+    def test_lru_order_after_reopen(self):
+        """ the order of use survives a restart, by file modification time """
+        cache = ApproachResultCache(self.cache_dir)
+        for key in ("old", "used", "new"):
+            cache.put(key, [None] * 100)
+        entry_size = cache.size // 3
+        for mtime, key in enumerate(("old", "new", "used")):
+            os.utime(os.path.join(self.cache_dir, key + ".pkl"), (1000000 + mtime, 1000000 + mtime))
+
+        cache = ApproachResultCache(self.cache_dir, max_size=3 * entry_size)
+        cache.get("old")
+        cache.put("newest", [None] * 100)
+        self.assertEqual(cache.evictions, 1)
+        self.assertFalse("new" in cache)
+        for key in ("old", "used", "newest"):
+            self.assertTrue(key in cache)
+
+        # the hit on "old" is persistent as well
+        cache = ApproachResultCache(self.cache_dir, max_size=3 * entry_size)
+        cache.put("latest", [None] * 100)
+        self.assertFalse("used" in cache)
+        self.assertTrue("old" in cache)
+
+
+class ResultCacheKeyTest(unittest.TestCase):
+    def test_rules_in_key(self):
+        """ a testcase variant with other rules does not replay the results of the default rules """
+        ports = generate_recording(n_cycles=3000, n_events=8, obj_lifetime=(100, 400))
+        analyzer, _ = setup_analyzer(ports)
+        events = ports[sd.ACC_EVENTS_PORT_NAME]
+        key = analyzer.get_result_cache_key(events)
+        self.assertEqual(analyzer.get_result_cache_key(events), key)
+        analyzer.rule_engine = RuleEngine(default_rules()[:-1])
+        self.assertNotEqual(analyzer.get_result_cache_key(events), key)
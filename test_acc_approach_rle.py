@@ -0,0 +1,52 @@
+import unittest
+
+import numpy as np
+
+from fct.acc.common import acc_global_defs as acc_gd
+from fct.acc.acc_performance.approach_rle import RleSignal
+from fct.acc.acc_performance.approach_rules import default_rule_engine
+
+
+class RleSignalTest(unittest.TestCase):
+    def setUp(self):
+        self.dense = [0, 0, 0, 1, 1, 5, 5, 5, 5, 1]
+        self.rle = RleSignal.from_dense(self.dense)
+
+    def test_encoding(self):
+        self.assertEqual(len(self.rle), 10)
+        self.assertEqual(self.rle.run_starts.tolist(), [0, 3, 5, 9])
+        self.assertEqual(self.rle.run_values.tolist(), [0, 1, 5, 1])
+        self.assertEqual(self.rle.run_lengths.tolist(), [3, 2, 4, 1])
+        self.assertEqual(list(self.rle.iterruns()), [(0, 3, 0), (3, 5, 1), (5, 9, 5), (9, 10, 1)])
+        self.assertEqual(self.rle.tolist(), self.dense)
+        self.assertIs(RleSignal.from_dense(self.rle), self.rle)
+        self.assertEqual(len(RleSignal.from_dense([])), 0)
+
+    def test_getitem(self):
+        for idx in range(-10, 10):
+            self.assertEqual(self.rle[idx], self.dense[idx])
+        self.assertRaises(IndexError, self.rle.__getitem__, 10)
+
+    def test_slice(self):
+        for begin in range(-3, 12):
+            for end in range(-3, 12):
+                self.assertEqual(self.rle[begin:end].tolist(), self.dense[begin:end])
+        self.assertEqual(self.rle[4:8], RleSignal.from_dense(self.dense[4:8]))
+        self.assertRaises(ValueError, self.rle.__getitem__, slice(0, 10, 2))
+
+    def test_criteria_over_runs(self):
+        """ rule engine gives the same result for encoded and dense slices """
+        engine = default_rule_engine()
+        preselect = [acc_gd.DTR_OBJECT_PRESELECT_FIRST_EGO_LANE] * 6 + [acc_gd.DTR_OBJECT_PRESELECT_FUSION_OBSTACLE] * 4
+        obstacle_detect = [acc_gd.DTR_OBJ_OBSTCLDETECT_OBSTACLE] * 10
+        observed_class = [acc_gd.DTR_OBSERVED_CLASS_NO_CLASS] * 9 + [acc_gd.DTR_OBSERVED_CLASS_UNKNOWN]
+        encoded = [RleSignal.from_dense(np.array(signal)) for signal in (preselect, obstacle_detect, observed_class)]
+        for tunnel in (0, 2):
+            for begin, end in ((0, 6), (0, 9), (0, 10), (5, 10), (6, 9)):
+                self.assertEqual(engine.evaluate(tunnel, *[signal[begin:end] for signal in encoded]),
+                                 engine.evaluate(tunnel, preselect[begin:end], obstacle_detect[begin:end],
+                                                 observed_class[begin:end]))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,77 @@
+import unittest
+
+import numpy as np
+
+from fct.acc.common import acc_global_defs as acc_gd
+from fct.acc.acc_performance.acc_approach_analyzer441 import ApproachAnalyzer441
+from fct.acc.acc_performance.approach_rules import RuleEngine, Rule, default_rules, default_rule_engine, \
+    OBSTACLE_DETECT, PRESELECT, OBSERVED_CLASS
+
+
+class RuleEngineTest(unittest.TestCase):
+    def test_default_rules_equivalent(self):
+        """ compiled default rules give the results of check_test_criteria """
+        engine = default_rule_engine()
+        rnd = np.random.RandomState(12)
+        preselect_values = [acc_gd.DTR_OBJECT_PRESELECT_NOT_SELECTED, acc_gd.DTR_OBJECT_PRESELECT_FIRST_EGO_LANE,
+                            acc_gd.DTR_OBJECT_PRESELECT_FUSION_OBSTACLE, 99]
+        obstacle_values = [acc_gd.DTR_OBJ_OBSTCLDETECT_NO_CLASS, acc_gd.DTR_OBJ_OBSTCLDETECT_OBSTACLE,
+                           acc_gd.DTR_OBJ_OBSTCLDETECT_PROBABLY_UNDERDRIVABLE,
+                           acc_gd.DTR_OBJ_OBSTCLDETECT_PROBABLY_OVERRIDABLE, -1]
+        class_values = [acc_gd.DTR_OBSERVED_CLASS_NO_CLASS, acc_gd.DTR_OBSERVED_CLASS_GUARDRAIL,
+                        acc_gd.DTR_OBSERVED_CLASS_CURVEENTRY, acc_gd.DTR_OBSERVED_CLASS_UNKNOWN, 99]
+        for _ in range(500):
+            length = rnd.randint(1, 8)
+            preselect = list(rnd.choice(rnd.choice(preselect_values, 2), length))
+            obstacle_detect = list(rnd.choice(rnd.choice(obstacle_values, 2), length))
+            observed_class = list(rnd.choice(rnd.choice(class_values, 2), length))
+            for tunnel in (0, 1, 2):
+                self.assertEqual(engine.evaluate(tunnel, np.array(preselect), np.array(obstacle_detect),
+                                                 np.array(observed_class)),
+                                 ApproachAnalyzer441.check_test_criteria(tunnel, preselect, obstacle_detect,
+                                                                         observed_class))
+
+    def test_non_integral_values(self):
+        """ float values match an enum value only if integral, like the list comparison """
+        engine = default_rule_engine()
+        first_ego = float(acc_gd.DTR_OBJECT_PRESELECT_FIRST_EGO_LANE)
+        obstacle_detect = [acc_gd.DTR_OBJ_OBSTCLDETECT_NO_CLASS] * 3
+        observed_class = [acc_gd.DTR_OBSERVED_CLASS_NO_CLASS] * 3
+        for preselect in ([first_ego] * 3, [first_ego + 0.5] * 3, [first_ego, float('nan'), first_ego]):
+            self.assertEqual(engine.evaluate(0, np.array(preselect), obstacle_detect, observed_class),
+                             ApproachAnalyzer441.check_test_criteria(0, preselect, obstacle_detect, observed_class))
+        self.assertEqual(engine.evaluate(0, np.array([first_ego] * 3), obstacle_detect, observed_class), 'A')
+        self.assertEqual(engine.lookup_value(PRESELECT, first_ego + 0.5),
+                         engine.lookup_value(PRESELECT, 1000))
+
+    def test_empty_scene(self):
+        self.assertEqual(default_rule_engine().evaluate(0, [], [], []), None)
+
+    def test_cycle_masks(self):
+        """ per cycle bitmask, bit order is the rule order """
+        engine = default_rule_engine()
+        masks = engine.cycle_masks([acc_gd.DTR_OBJECT_PRESELECT_FIRST_EGO_LANE],
+                                   [acc_gd.DTR_OBJ_OBSTCLDETECT_OBSTACLE],
+                                   [acc_gd.DTR_OBSERVED_CLASS_NO_CLASS])
+        # A, B, D and E hold, C does not
+        self.assertEqual(int(masks[0]), 0b11011)
+
+    def test_additional_rule(self):
+        """ new condition added as data """
+        rules = default_rules() + [Rule('F', True, {OBSTACLE_DETECT: (acc_gd.DTR_OBJ_OBSTCLDETECT_NO_CLASS,)},
+                                        {OBSERVED_CLASS: (acc_gd.DTR_OBSERVED_CLASS_GUARDRAIL,)})]
+        engine = RuleEngine(rules)
+        preselect = [acc_gd.DTR_OBJECT_PRESELECT_NOT_SELECTED] * 3
+        obstacle_detect = [acc_gd.DTR_OBJ_OBSTCLDETECT_NO_CLASS] * 3
+        self.assertEqual(engine.evaluate(2, preselect, obstacle_detect, [acc_gd.DTR_OBSERVED_CLASS_NO_CLASS] * 3),
+                         'F')
+        self.assertEqual(engine.evaluate(2, preselect, obstacle_detect, [acc_gd.DTR_OBSERVED_CLASS_GUARDRAIL] * 3),
+                         None)
+        self.assertEqual(engine.evaluate(0, preselect, obstacle_detect, [acc_gd.DTR_OBSERVED_CLASS_NO_CLASS] * 3),
+                         None)
+
+    def test_priority(self):
+        """ overlapping rules of the same tunnel case: the first one wins """
+        engine = RuleEngine([Rule('X', False, {PRESELECT: (1, 2)}, {}), Rule('Y', False, {PRESELECT: (1,)}, {})])
+        self.assertEqual(engine.evaluate(0, [1, 1], [0, 0], [0, 0]), 'X')
+        self.assertEqual(engine.evaluate(0, [1, 3], [0, 0], [0, 0]), None)
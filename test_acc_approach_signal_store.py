@@ -0,0 +1,114 @@
+import os
+import unittest
+
+import numpy as np
+
+import stk.valf.signal_defs as sd
+
+import fct.acc.common.acc_global_defs as acc_gd
+from fct.acc.acc_performance.acc_approach_analyzer441 import ApproachAnalyzer441, APPROACH_RESULTS_PORT_NAME, \
+    SIGNAL_STORE_PORT_NAME
+from fct.acc.acc_performance.approach_batch_runner import LocalDataManager
+from fct.acc.acc_performance.approach_signal_store import SignalStore, SignalStoreError, BACKEND_LOCAL, BACKEND_FILE
+from fct.acc.acc_performance.bench_approach_analyzer import generate_recording, setup_analyzer
+
+
+class SignalStoreTest(unittest.TestCase):
+    def test_load_once(self):
+        store = SignalStore()
+        loads = []
+
+        def load():
+            loads.append(1)
+            return [1.0, 2.0, 3.0]
+
+        first = store.get("rec1", ("bus", "Timestamp"), load)
+        self.assertIs(store.get("rec1", ("bus", "Timestamp"), load), first)
+        self.assertEqual(len(loads), 1)
+        self.assertFalse(first.flags.writeable)
+        self.assertEqual(store.backend, BACKEND_LOCAL)
+        self.assertRaises(SignalStoreError, store.descriptor)
+        # other bus: own entry
+        self.assertEqual(store.get("rec1", ("bus2", "Timestamp"), lambda: [4.0]).tolist(), [4.0])
+
+        # other recording: buffers of rec1 released
+        store.get("rec2", ("bus", "TunnelDtct"), lambda: [0, 2])
+        self.assertNotIn(("bus", "Timestamp"), store)
+        self.assertEqual(store.stats()["loads"], 3)
+        self.assertEqual(store.stats()["hits"], 1)
+
+    def test_port_array_stays_writeable(self):
+        """ array ports are held without copy, only the store's view is read-only """
+        port_values = np.arange(4.0)
+        values = SignalStore().get("rec1", ("bus", "Timestamp"), lambda: port_values)
+        self.assertTrue(np.shares_memory(values, port_values))
+        self.assertFalse(values.flags.writeable)
+        port_values[0] = 10.0
+        self.assertEqual(values[0], 10.0)
+
+    def test_shared(self):
+        store = SignalStore(shared=True)
+        self.assertEqual(store.backend, BACKEND_FILE)
+        values = store.get("rec1", ("bus", "Timestamp"), lambda: np.arange(5, dtype=np.int64))
+        descriptor = store.descriptor()
+        attached = SignalStore.attach(descriptor)
+        view = attached.get("rec1", ("bus", "Timestamp"), lambda: self.fail("attached port loaded again"))
+        np.testing.assert_array_equal(view, values)
+        self.assertFalse(view.flags.writeable)
+        # ports the owner does not hold are kept locally
+        np.testing.assert_array_equal(attached.get("rec1", ("bus", "TunnelDtct"), lambda: [2]), [2])
+        self.assertRaises(SignalStoreError, attached.get, "rec2", ("bus", "Timestamp"), lambda: [])
+        del view, values
+        attached.close()
+
+        # the owner removes its files and directory
+        segment_file = descriptor["ports"][("bus", "Timestamp")][0]
+        store.get("rec2", ("bus", "Timestamp"), lambda: np.arange(3))
+        self.assertFalse(os.path.exists(segment_file))
+        store.close()
+        self.assertEqual(store.nbytes, 0)
+        self.assertFalse(os.path.exists(os.path.dirname(segment_file)))
+
+
+class AnalyzerSignalStoreTest(unittest.TestCase):
+    def test_buses(self):
+        """ two buses over one store: every bus gets its own timestamps / TunnelDtct """
+        bus_ports = {"Bus#1": generate_recording(n_cycles=4000, n_events=10, obj_lifetime=(100, 500), seed=1),
+                     "Bus#2": generate_recording(n_cycles=3000, n_events=10, obj_lifetime=(100, 500), seed=2)}
+        expected = {}
+        for bus_name, ports in bus_ports.items():
+            analyzer, data_manager = setup_analyzer(ports, bus_name)
+            analyzer.ProcessData()
+            expected[bus_name] = data_manager.GetDataPort(APPROACH_RESULTS_PORT_NAME, bus_name)
+
+        for ports in bus_ports.values():
+            for ev in ports[sd.ACC_EVENTS_PORT_NAME]:
+                ev.reset()
+        data_manager = LocalDataManager()
+        data_manager.SetDataPort(acc_gd.PROJECT_PORT_NAME, "bench")
+        data_manager.SetDataPort(sd.CURRENT_FILE_PORT_NAME, "synthetic.rec")
+        data_manager.SetDataPort(SIGNAL_STORE_PORT_NAME, True)
+        analyzers = []
+        for bus_name, ports in sorted(bus_ports.items()):
+            for port_name, port_value in ports.items():
+                data_manager.SetDataPort(port_name, port_value, bus_name)
+            analyzer = ApproachAnalyzer441(data_manager, "ApproachAnalyzer441", bus_name)
+            analyzer.Initialize()
+            analyzers.append(analyzer)
+        store = data_manager.GetDataPort(SIGNAL_STORE_PORT_NAME)
+        self.assertIsInstance(store, SignalStore)
+
+        for analyzer in analyzers:
+            analyzer.PostInitialize()
+            analyzer.LoadData()
+            analyzer.ProcessData()
+        for bus_name in bus_ports:
+            self.assertEqual(data_manager.GetDataPort(APPROACH_RESULTS_PORT_NAME, bus_name), expected[bus_name])
+            self.assertIn((bus_name, "TunnelDtct"), store)
+        for analyzer in analyzers:
+            analyzer.Terminate()
+        self.assertEqual(store.stats()["ports"], 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,45 @@
+import unittest
+
+from fct.acc.acc_performance.approach_stats import ApproachStatistics, StatisticsKey, merge_statistics
+
+
+class ApproachStatisticsTest(unittest.TestCase):
+    def _stats(self, vego, results, error_events=0):
+        stats = ApproachStatistics()
+        stats.add_recording(error_events)
+        stats.update(vego, results)
+        return stats
+
+    def setUp(self):
+        self.stats_a = self._stats([10.0, 25.0, 25.0], [(True, 0, 'A'), (True, 2, None), (False, 0, 'B')], 1)
+        self.stats_b = self._stats([25.0], [(True, 2, 'D')])
+        self.stats_c = self._stats([5.0, 10.0], [(True, 0, 'A'), (True, 0, None)], 2)
+
+    def test_update(self):
+        # 10 m/s = 36 km/h: bin 30-50, 25 m/s = 90 km/h: bin 90-110
+        self.assertEqual(self.stats_a.speed_bin(10.0), 1)
+        self.assertEqual(self.stats_a.speed_bin(25.0), 4)
+        self.assertEqual(self.stats_a.counts[StatisticsKey('A', 1, 0, True)], 1)
+        self.assertEqual(self.stats_a.events, 3)
+        self.assertEqual(self.stats_a.count(applicable=True), 2)
+        self.assertEqual(self.stats_a.table('tunnel_state'), {0: 2, 2: 1})
+        self.assertEqual(self.stats_a.pass_rate(), 0.5)
+        self.assertIsNone(self.stats_a.pass_rate(speed_bin=0))
+
+    def test_merge_associative(self):
+        left = (self.stats_a + self.stats_b) + self.stats_c
+        right = self.stats_a + (self.stats_b + self.stats_c)
+        self.assertEqual(left, right)
+        self.assertEqual(merge_statistics([self.stats_c, self.stats_a, self.stats_b]), left)
+        self.assertEqual((left.recordings, left.error_events, left.events), (3, 3, 6))
+        self.assertEqual(left.count(condition='A'), 2)
+        self.assertEqual(merge_statistics([]).events, 0)
+        self.assertRaises(ValueError, left.merge, ApproachStatistics((0.0, 50.0)))
+
+    def test_serialization(self):
+        total = merge_statistics([self.stats_a, self.stats_b, self.stats_c])
+        self.assertEqual(ApproachStatistics.from_dict(total.to_dict()), total)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,54 @@
+import unittest
+
+from fct.acc.common import acc_global_defs as acc_gd
+from fct.acc.acc_performance.approach_stream import ApproachStreamEvaluator
+
+
+class ApproachStreamEvaluatorTest(unittest.TestCase):
+    def _run(self, evaluator, distx, vego, tunnel, preselect, obstacle_detect, observed_class):
+        pushed = 0
+        for i, dist in enumerate(distx):
+            pushed += 1
+            if not evaluator.push(1000 + i, dist, vego, tunnel, preselect[i], obstacle_detect[i], observed_class[i]):
+                break
+        return pushed, evaluator.finish()
+
+    def test_cond_a(self):
+        """ slow approach (20 m/s = 72 km/h is high speed, 15 m/s slow): scene starts at PUD (60 m) """
+        distx = [100.0, 90.0, 80.0, 70.0, 59.0, 50.0, 40.0]
+        preselect = [acc_gd.DTR_OBJECT_PRESELECT_NOT_SELECTED] * 4 + [acc_gd.DTR_OBJECT_PRESELECT_FIRST_EGO_LANE] * 3
+        evaluator = ApproachStreamEvaluator(obj_start_timestamp=900)
+        _, result = self._run(evaluator, distx, 15.0, 0, preselect, [0] * 7, [0] * 7)
+        self.assertEqual(result, (True, 0, 'A'))
+
+    def test_cond_d_tunnel(self):
+        """ tunnel state is taken at the extended PUD """
+        distx = [100.0, 90.0, 79.0, 70.0, 59.0, 50.0]
+        preselect = [acc_gd.DTR_OBJECT_PRESELECT_FUSION_OBSTACLE] * 6
+        evaluator = ApproachStreamEvaluator(obj_start_timestamp=900)
+        for i, dist in enumerate(distx):
+            evaluator.push(1000 + i, dist, 15.0, 2 if i == 2 else 0, preselect[i], 0, 0)
+        self.assertEqual(evaluator.finish(), (True, 2, 'D'))
+
+    def test_early_exit(self):
+        """ all conditions falsified in the first scene cycle -> no further cycles needed """
+        distx = [100.0, 59.0, 50.0, 40.0, 30.0]
+        evaluator = ApproachStreamEvaluator(obj_start_timestamp=900)
+        pushed, result = self._run(evaluator, distx, 15.0, 0, [acc_gd.DTR_OBJECT_PRESELECT_NOT_SELECTED] * 5,
+                                   [acc_gd.DTR_OBJ_OBSTCLDETECT_NO_CLASS] * 5, [0] * 5)
+        self.assertEqual(pushed, 2)
+        self.assertEqual(result, (True, 0, None))
+
+    def test_not_applicable(self):
+        """ object already below extended PUD at its first cycle """
+        evaluator = ApproachStreamEvaluator(obj_start_timestamp=1000)
+        _, result = self._run(evaluator, [50.0, 40.0], 15.0, 0, [acc_gd.DTR_OBJECT_PRESELECT_FIRST_EGO_LANE] * 2,
+                              [0] * 2, [0] * 2)
+        self.assertEqual(result, (False, 0, 'A'))
+
+    def test_never_crossed(self):
+        """ thresholds never crossed -> last cycle is evaluated """
+        evaluator = ApproachStreamEvaluator(obj_start_timestamp=900)
+        _, result = self._run(evaluator, [200.0, 190.0], 15.0, 1, [0, acc_gd.DTR_OBJECT_PRESELECT_FIRST_EGO_LANE],
+                              [0] * 2, [0] * 2)
+        self.assertEqual(result, (True, 1, 'A'))